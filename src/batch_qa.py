@@ -0,0 +1,250 @@
+"""
+Offline batch question answering: questions JSONL in, answers JSONL out.
+
+Each input line is {"id": ..., "question": ...} (id defaults to the line
+number). Questions are processed in batches; within a batch
+
+    1. rewrites run concurrently (bounded by --concurrency); questions the
+       rule parser understands skip the LLM (query_router),
+    2. all rewritten queries are encoded in one encoder call and searched
+       with one FAISS call per distinct filter set (search_many), with the
+       same filters → priority only → pure semantic relaxation as the chat,
+    3. answer calls run concurrently, limited by --concurrency, the
+       client's own in-flight cap / 429 backoff and optionally --rps,
+
+and every result is appended to the output as soon as it is ready:
+
+    {"id", "question", "rewritten_query", "answer", "cited_ids",
+     "timings": {"rewrite", "encode", "search", "context", "llm", "total"}}
+
+encode / search are the batch's wall time divided by its size. Questions
+are answered independently (no chat history) by the passage-RAG path.
+Rerunning with --resume skips ids already answered in the output file;
+lines with an "error" are dropped from it and retried, as is a line torn
+by an interrupted run.
+
+    python -m src.batch_qa questions.jsonl --out answers.jsonl --concurrency 8 --resume
+"""
+from __future__ import annotations
+import argparse, json, re, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from .config        import LLM_MAX_CONCURRENCY
+from .query_router  import QueryRouter, default_router
+from .retrieval     import PassageRetriever
+from .pipeline      import RAGPipeline, force_sdg_filter
+from .llm_clients   import chat
+
+BATCH_SIZE = 64
+NO_ANSWER  = "I don’t have enough information in the provided patents."
+
+_PID = re.compile(r"\b(?:EP\s*)?0*(\d{5,})")
+
+
+class RateLimiter:
+    """At most <rps> acquisitions per second across threads (0 = no limit)."""
+
+    def __init__(self, rps: float = 0.0):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait, self._next = self._next - now, max(self._next, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def read_questions(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        for n, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            question = item.get("question") or item.get("query") or item.get("message")
+            if question:
+                yield {"id": str(item.get("id", n)), "question": str(question)}
+
+
+def _answered(path: Path) -> Dict[str, str]:
+    """id → last answered line of <path>; error lines and a torn last line
+    from an interrupted run are skipped."""
+    done: Dict[str, str] = {}
+    if path.exists():
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if "error" not in rec:
+                    done[str(rec["id"])] = line.rstrip("\n")
+    return done
+
+
+def answered_ids(path: Path) -> set:
+    """Ids already answered in <path> (the checkpoint)."""
+    return set(_answered(path))
+
+
+def compact_checkpoint(path: Path) -> set:
+    """Rewrite <path> with one answered record per id, dropping error lines
+    (they are retried) and a torn last line, so resumed runs append after
+    a clean newline. Returns the answered ids."""
+    done = _answered(path)
+    if path.exists():
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text("".join(line + "\n" for line in done.values()), encoding="utf-8")
+        tmp.replace(path)
+    return set(done)
+
+
+def cited_ids(answer: str, passages: List[Dict[str, Any]]) -> List[str]:
+    """Retrieved publication numbers the answer mentions, in answer order."""
+    known = {str(p["publication_number"]).lstrip("0"): str(p["publication_number"])
+             for p in passages}
+    out = []
+    for num in _PID.findall(answer):
+        pid = known.get(num)
+        if pid and pid not in out:
+            out.append(pid)
+    return out
+
+
+class BatchRunner:
+    def __init__(self, retriever: PassageRetriever,
+                 concurrency: int = LLM_MAX_CONCURRENCY, rps: float = 0.0,
+                 router: QueryRouter | None = None):
+        self.retriever   = retriever
+        self.router      = router or default_router()
+        self.concurrency = max(1, concurrency)
+        self.limiter     = RateLimiter(rps)
+
+    def _rewrite(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        self.router.turn()
+        try:
+            rw = self.router.spec([], item["question"])
+        except Exception as e:                # answer with the raw question
+            rw = {}
+            item["rewrite_error"] = repr(e)
+        filters = [f for f in rw.get("filters", []) if isinstance(f, dict)]
+        item.update(rq=rw.get("rewritten_query") or item["question"],
+                    filters=force_sdg_filter(item["question"], filters),
+                    cols=rw.get("column_priority", []))
+        item["timings"] = {"rewrite": time.perf_counter() - t0}
+        return item
+
+    def _retrieve(self, items: List[Dict[str, Any]]):
+        """Batched encode + search, relaxing filters for queries without hits."""
+        t0 = time.perf_counter()
+        self.retriever.encode_many([it["rq"] for it in items])
+        t_enc = time.perf_counter()
+
+        pending = items
+        for stage in ("filters", "priority", "semantic"):
+            hits = self.retriever.search_many(
+                [it["rq"] for it in pending],
+                max_passages  = 400,
+                filters       = [it["filters"] if stage == "filters" else [] for it in pending],
+                column_orders = [it["cols"] if stage != "semantic" else [] for it in pending],
+                top_k_return  = 60,
+            )
+            for it, passages in zip(pending, hits):
+                it["passages"] = passages
+            pending = [it for it in pending if not it["passages"]]
+            if not pending:
+                break
+
+        t_end = time.perf_counter()
+        for it in items:
+            it["timings"]["encode"] = (t_enc - t0) / len(items)
+            it["timings"]["search"] = (t_end - t_enc) / len(items)
+
+    def _answer(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        timings = item["timings"]
+        rec = {"id": item["id"], "question": item["question"],
+               "rewritten_query": item["rq"]}
+        try:
+            if not item["passages"]:
+                answer, cited = NO_ANSWER, []
+            else:
+                t0 = time.perf_counter()
+                messages = RAGPipeline(self.retriever).answer_messages(
+                    item["question"], item["rq"], item["passages"])
+                t1 = time.perf_counter()
+                self.limiter.acquire()
+                answer = chat(messages, temperature=0.0, max_tokens=512)
+                timings["context"] = t1 - t0
+                timings["llm"]     = time.perf_counter() - t1
+                cited = cited_ids(answer, item["passages"])
+            rec.update(answer=answer, cited_ids=cited)
+        except Exception as e:                # recorded, retried on --resume
+            rec["error"] = repr(e)
+        if "rewrite_error" in item:
+            rec["rewrite_error"] = item["rewrite_error"]
+        timings["total"] = time.perf_counter() - item["t_start"]
+        rec["timings"] = {k: round(v, 4) for k, v in timings.items()}
+        return rec
+
+    def run(self, questions: Path, out: Path, resume: bool = False,
+            batch_size: int = BATCH_SIZE, limit: int | None = None) -> Dict[str, int]:
+        done  = compact_checkpoint(out) if resume else set()
+        items = [q for q in read_questions(questions) if q["id"] not in done]
+        if limit is not None:
+            items = items[:limit]
+        print(f"🧭 {len(items)} questions to answer ({len(done)} already in {out})")
+
+        stats = {"answered": 0, "errors": 0}
+        with open(out, "a" if resume else "w", encoding="utf-8") as fh, \
+                ThreadPoolExecutor(max_workers=self.concurrency,
+                                   thread_name_prefix="batch-qa") as pool:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                t_start = time.perf_counter()
+                for it in batch:
+                    it["t_start"] = t_start
+                batch = list(pool.map(self._rewrite, batch))
+                self._retrieve(batch)
+                for fut in as_completed([pool.submit(self._answer, it) for it in batch]):
+                    rec = fut.result()
+                    fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    fh.flush()                # the output file is the checkpoint
+                    stats["errors" if "error" in rec else "answered"] += 1
+                print(f"✅ {min(start + batch_size, len(items))}/{len(items)} "
+                      f"({stats['errors']} errors)")
+        return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.batch_qa", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("questions", type=Path, help="JSONL with id / question per line")
+    ap.add_argument("--out", type=Path, required=True, help="answers JSONL")
+    ap.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY,
+                    help="concurrent rewrite / answer calls")
+    ap.add_argument("--rps", type=float, default=0.0,
+                    help="max answer calls started per second (0 = unlimited)")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                    help="questions encoded and searched together")
+    ap.add_argument("--limit", type=int, default=None, help="answer at most N questions")
+    ap.add_argument("--resume", action="store_true",
+                    help="append to --out, skipping ids already answered there")
+    args = ap.parse_args()
+
+    runner = BatchRunner(PassageRetriever(), args.concurrency, args.rps)
+    t0 = time.perf_counter()
+    stats = runner.run(args.questions, args.out, args.resume, args.batch_size, args.limit)
+    print(f"⏱️  {stats['answered']} answered, {stats['errors']} errors "
+          f"in {time.perf_counter() - t0:.1f} s → {args.out}")
+    print(f"🧭 rewrite routing: {runner.router.stats()}")
+
+
+if __name__ == "__main__":
+    main()
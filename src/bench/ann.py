@@ -0,0 +1,144 @@
+"""
+Recall / latency benchmark for the FAISS index types in embed_build.
+
+Vectors come from the flat index in embeddings/ (or a synthetic clustered
+set), queries are perturbed copies of random corpus vectors, and every
+approximate index is scored against exact flat search. Quantised types
+(sq8, pq, ivfpq) are also run with exact re-ranking of a --rerank times
+deeper shortlist from float16 vectors, as PassageRetriever does; "x_mem"
+is how many times smaller the index is than flat float32 (the float16
+copy lives on disk, memory-mapped):
+
+    python -m src.bench.ann --k 10 --nprobe 1,8,32 --ef 16,64,256
+    python -m src.bench.ann --synthetic 200000 --dim 768 --types flat,sq8,pq,ivfpq --rerank 0,4,8
+"""
+import argparse, json, time
+import faiss, numpy as np
+
+from ..config import EMB_DIR
+from ..embed_build import COMPRESSED_TYPES, INDEX_TYPES, index_spec, make_index
+from ..vector_store import RERANK_FACTOR, rerank
+
+
+def load_vectors(index_name: str = "faiss_chunks.idx") -> np.ndarray:
+    index = faiss.read_index(str(EMB_DIR / index_name))
+    base  = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if not isinstance(base, faiss.IndexFlat):
+        raise SystemExit("Benchmark needs a flat index – rebuild with --index-type flat")
+    return base.reconstruct_n(0, base.ntotal)
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng     = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype("float32")
+    labels  = rng.integers(0, clusters, size=n)
+    return centres[labels] + 0.3 * rng.normal(size=(n, dim)).astype("float32")
+
+
+def make_queries(xb: np.ndarray, nq: int, seed: int = 1) -> np.ndarray:
+    rng   = np.random.default_rng(seed)
+    picks = xb[rng.choice(len(xb), size=min(nq, len(xb)), replace=False)]
+    noise = rng.normal(scale=xb.std() * 0.1, size=picks.shape)
+    return (picks + noise).astype("float32")
+
+
+def time_queries(index, xq: np.ndarray, k: int, vectors: np.ndarray | None = None,
+                 factor: int = 0):
+    """Search one query at a time; return (ids, per-query latencies in ms).
+    With <vectors> the top k·<factor> are re-ranked exactly from them."""
+    ids, lat = np.empty((len(xq), k), dtype="int64"), []
+    for i in range(len(xq)):
+        t0 = time.perf_counter()
+        if factor:
+            _, I = index.search(xq[i : i + 1], k * factor)
+            _, I = rerank(vectors, xq[i : i + 1], I, k)
+        else:
+            _, I = index.search(xq[i : i + 1], k)
+        lat.append((time.perf_counter() - t0) * 1e3)
+        ids[i] = I[0]
+    return ids, np.array(lat)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def run(xb, xq, k=10, types=INDEX_TYPES, nprobes=(1, 8, 32), efs=(16, 64, 256),
+        reranks=(0, RERANK_FACTOR)):
+    truth_index = faiss.IndexFlatL2(xb.shape[1])
+    truth_index.add(xb)
+    _, truth = truth_index.search(xq, k)
+    flat_bytes = xb.nbytes
+    xb16 = xb.astype(np.float16)
+
+    results = []
+    ps = faiss.ParameterSpace()
+    for itype in types:
+        t0    = time.perf_counter()
+        index = make_index(xb, itype)
+        build = time.perf_counter() - t0
+        size  = len(faiss.serialize_index(index))
+
+        knob   = {"ivf": "nprobe", "ivfpq": "nprobe", "hnsw": "efSearch"}.get(itype)
+        values = {"nprobe": nprobes, "efSearch": efs}.get(knob, (None,))
+        factors = reranks if itype in COMPRESSED_TYPES else (0,)
+        for val in values:
+            if val is not None:
+                ps.set_index_parameter(index, knob, val)
+            for factor in factors:
+                found, lat = time_queries(index, xq, k, xb16, factor)
+                results.append({
+                    "index":     index_spec(itype, xb.shape[1], len(xb)),
+                    "param":     " ".join(p for p in (f"{knob}={val}" if val is not None else "",
+                                                      f"rerank×{factor}" if factor else "") if p),
+                    "build_s":   round(build, 3),
+                    "bytes":     size,
+                    "x_mem":     round(flat_bytes / size, 1),
+                    f"recall@{k}": round(recall_at_k(found, truth), 4),
+                    "p50_ms":    round(float(np.percentile(lat, 50)), 4),
+                    "p99_ms":    round(float(np.percentile(lat, 99)), 4),
+                })
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.ann", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--index", default="faiss_chunks.idx",
+                    help="flat index in embeddings/ to take vectors from")
+    ap.add_argument("--synthetic", type=int, default=0,
+                    help="use N synthetic clustered vectors instead")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--types", default=",".join(INDEX_TYPES))
+    ap.add_argument("--nprobe", default="1,8,32")
+    ap.add_argument("--ef", default="16,64,256")
+    ap.add_argument("--rerank", default=f"0,{RERANK_FACTOR}",
+                    help="shortlist factors for exact re-ranking of quantised types (0 = off)")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    xb = (synthetic_vectors(args.synthetic, args.dim) if args.synthetic
+          else load_vectors(args.index))
+    xq = make_queries(xb, args.queries)
+    print(f"📏  {len(xb):,} vectors × {xb.shape[1]} dims, {len(xq)} queries, k={args.k}")
+
+    ints = lambda s: tuple(int(v) for v in s.split(",") if v)
+    results = run(xb, xq, args.k, args.types.split(","), ints(args.nprobe), ints(args.ef),
+                  ints(args.rerank))
+
+    cols = list(results[0])
+    print("  ".join(f"{c:>24}" if c == "index" else f"{c:>12}" for c in cols))
+    for r in results:
+        print("  ".join(f"{str(r[c]):>24}" if c == "index" else f"{str(r[c]):>12}"
+                        for c in cols))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved → {args.json}")
+
+
+if __name__ == "__main__":
+    main()
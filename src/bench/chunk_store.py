@@ -0,0 +1,80 @@
+"""
+Startup time and memory of meta.pkl vs. the memory-mapped ChunkStore.
+
+Each variant runs in a fresh process that loads the chunk metadata and then
+reads <hits> random chunks (as one search would), reporting wall time and
+the peak Python heap (tracemalloc) plus max RSS where the OS exposes it:
+
+    python -m src.bench.chunk_store --hits 400
+"""
+import argparse, multiprocessing as mp, pickle, tempfile, time, tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from ..config import EMB_DIR
+from ..chunk_store import ChunkStore, open_store
+
+
+def _max_rss_mb():
+    try:
+        import resource, sys
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+    except ImportError:           # Windows
+        return float("nan")
+
+
+def _measure(kind: str, path: str, hits: int, out):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if kind == "pickle":
+        with open(path, "rb") as f:
+            meta = pickle.load(f)
+    else:
+        meta = ChunkStore.open(Path(path))
+    t_load = time.perf_counter() - t0
+
+    ids = np.random.default_rng(0).integers(0, len(meta), size=hits)
+    t0 = time.perf_counter()
+    n_chars = sum(len(m["chunk_text"]) for m in (meta[int(i)] for i in ids) if m)
+    t_hits = time.perf_counter() - t0
+
+    _, peak = tracemalloc.get_traced_memory()
+    out.put({"variant": kind, "load_ms": t_load * 1e3, "hits_ms": t_hits * 1e3,
+             "heap_mb": peak / 1024 ** 2, "max_rss_mb": _max_rss_mb(), "chars": n_chars})
+
+
+def run_variant(kind: str, path, hits: int) -> dict:
+    ctx = mp.get_context("spawn")
+    q   = ctx.Queue()
+    p   = ctx.Process(target=_measure, args=(kind, str(path), hits, q))
+    p.start()
+    res = q.get()
+    p.join()
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.chunk_store", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hits", type=int, default=400)
+    args = ap.parse_args()
+
+    store = open_store(EMB_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl = Path(tmp) / "meta.pkl"
+        with open(pkl, "wb") as f:
+            pickle.dump(list(store), f)
+        print(f"📏  {len(store):,} chunks, meta.pkl {pkl.stat().st_size / 1024 ** 2:.1f} MB")
+        rows = [run_variant("pickle", pkl, args.hits),
+                run_variant("chunk_store", EMB_DIR, args.hits)]
+
+    print(f"{'variant':>12} {'load ms':>9} {'hits ms':>9} {'heap MB':>9} {'max RSS MB':>11}")
+    for r in rows:
+        print(f"{r['variant']:>12} {r['load_ms']:>9.1f} {r['hits_ms']:>9.2f} "
+              f"{r['heap_mb']:>9.1f} {r['max_rss_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Diff two bench.suite result files and flag regressions.
+
+Metrics are matched by (bench, scale, metric). Names ending in _ms / _s
+are times (lower is better), _per_s are rates (higher is better); other
+metrics (counts) are shown but never flagged. A metric regresses when
+it is worse than the base by more than --threshold (1.2 = 20 %).
+Exits with status 1 if anything regressed, so it can gate CI:
+
+    python -m src.bench.compare bench-main.json bench-branch.json --threshold 1.25
+"""
+import argparse, json, sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+Key = Tuple[str, float, str]
+
+
+def load(path: Path) -> Dict[Key, float]:
+    report = json.loads(Path(path).read_text())
+    return {(r["bench"], float(r["scale"]), m): float(v)
+            for r in report["results"] for m, v in r["metrics"].items()}
+
+
+def direction(metric: str) -> int:
+    """+1 higher is better, -1 lower is better, 0 not a performance metric."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_s")):
+        return -1
+    return 0
+
+
+def compare(base: Dict[Key, float], new: Dict[Key, float], threshold: float = 1.2):
+    """Rows of (key, base, new, ratio, status) for metrics in both files;
+    ratio > 1 always means "new is worse"."""
+    rows = []
+    for key in sorted(base.keys() & new.keys()):
+        b, n, d = base[key], new[key], direction(key[2])
+        if d == 0 or min(b, n) <= 0:
+            rows.append((key, b, n, None, ""))
+            continue
+        ratio = n / b if d < 0 else b / n
+        status = "REGRESSION" if ratio > threshold else \
+                 "improved" if ratio < 1 / threshold else ""
+        rows.append((key, b, n, ratio, status))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.compare", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("base", type=Path)
+    ap.add_argument("new", type=Path)
+    ap.add_argument("--threshold", type=float, default=1.2,
+                    help="worse-than-base factor that counts as a regression")
+    args = ap.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    rows = compare(base, new, args.threshold)
+    print(f"{'bench':<22}{'scale':>7}  {'metric':<14}{'base':>12}{'new':>12}{'x worse':>9}")
+    for (bench, scale, metric), b, n, ratio, status in rows:
+        shown = f"{ratio:9.2f}" if ratio is not None else " " * 9
+        print(f"{bench:<22}{scale:>7g}  {metric:<14}{b:>12g}{n:>12g}{shown}  {status}")
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f"⚠️  only in {'base' if key in base else 'new'}: {key}")
+
+    regressions = sum(status == "REGRESSION" for *_, status in rows)
+    if regressions:
+        print(f"❌ {regressions} regression(s) beyond x{args.threshold:g}")
+        sys.exit(1)
+    print(f"✅ no regressions beyond x{args.threshold:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Row-wise apply_filter vs. vectorised FilterEngine on the patent table.
+
+Replays representative filter specs (as produced by query_rewrite) through
+the old iterrows path and the compiled masks, checks both select the same
+rows and reports the speedup:
+
+    python -m src.bench.filters final_dataset.csv --scale 10
+"""
+import argparse, time
+import numpy as np, pandas as pd
+
+from ..filter_ops import apply_filter, FilterEngine
+
+SPECS = {
+    "sdg eq":          [{"column": "sdg_number", "op": "eq", "value": 7}],
+    "sdg + contains":  [{"column": "sdg_number", "op": "eq", "value": 3},
+                        {"column": "ipc_technologies", "op": "contains", "value": "medical"}],
+    "date between":    [{"column": "publication_date", "op": "between",
+                         "value": ["2015-01-01", "2020-12-31"]}],
+    "date gte":        [{"column": "publication_date", "op": "gte", "value": "2021-01-01"}],
+    "country in":      [{"column": "applicant_countries", "op": "in", "value": ["US", "JP"]}],
+    "kind startswith": [{"column": "publication_kind", "op": "startswith", "value": "b"}],
+    "count lte":       [{"column": "inventor_count", "op": "lte", "value": 2}],
+}
+
+
+def rowwise_mask(df: pd.DataFrame, filters) -> np.ndarray:
+    """The pre-FilterEngine RAGPipeline._filter_df loop."""
+    mask = []
+    for _, row in df.iterrows():
+        ok = True
+        for f in filters:
+            ok &= apply_filter(row.get(f["column"], ""), f["op"], f["value"])
+        mask.append(ok)
+    return np.array(mask, dtype=bool)
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.filters", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("csv_path")
+    ap.add_argument("--scale", type=int, default=1, help="replicate the table N times")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.csv_path)
+    df = pd.concat([df] * args.scale, ignore_index=True)
+    print(f"📏  {len(df):,} rows")
+
+    t0 = time.perf_counter()
+    engine = FilterEngine(df)
+    print(f"🔨  FilterEngine load (date parsing): {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    print(f"{'spec':>16} {'rows':>7} {'row-wise ms':>12} {'first ms':>9} {'warm ms':>8} {'speedup':>8}")
+    for name, spec in SPECS.items():
+        t0 = time.perf_counter(); old = rowwise_mask(df, spec); t_old = time.perf_counter() - t0
+        engine = FilterEngine(df)
+        t0 = time.perf_counter(); new = engine.mask(spec); t_first = time.perf_counter() - t0
+        t0 = time.perf_counter(); engine.mask(spec); t_warm = time.perf_counter() - t0
+        if not np.array_equal(old, new):
+            raise SystemExit(f"❌ mask mismatch for {name!r}: {old.sum()} vs {new.sum()} rows")
+        print(f"{name:>16} {int(new.sum()):>7} {t_old * 1e3:>12.1f} {t_first * 1e3:>9.2f} "
+              f"{t_warm * 1e3:>8.2f} {t_old / t_warm:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Load test: concurrent chat sessions against one shared PassageRetriever.
+
+Virtual users replay scripted multi-turn conversations through their own
+RAGPipeline (as the HTTP server's sessions do), all sharing one retriever
+and one LLM client pointed at the local mock (src.mock_llm) with a fixed
+latency and injected 429s. The scripts cover the SDG-filtered passage
+search, aggregation, per-year counts, prior art, family, claims, latest
+and plain passage-RAG branches; turns the router sends to the LLM rewrite
+get a canned spec from the mock.
+
+Each --users level runs for --duration seconds and reports turn
+throughput and p50 / p95 / p99 latency per branch (pipeline.last_branch).
+With --slo-p95 the largest level whose overall p95 stays under it (and
+has no failed turns) is reported as sustainable:
+
+    python -m src.bench.loadtest --users 1,8,32 --duration 30 --llm-latency 0.5 --rate-429 0.05
+    python -m src.bench.loadtest --synthetic 10 --users 4,16,64 --slo-p95 3 --out load.json
+"""
+import argparse, contextlib, io, json, random, tempfile, threading, time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ..llm_clients import MistralClient, enable_cache, set_default_client
+from ..mock_llm import start_mock_server
+from ..pipeline import RAGPipeline
+from ..query_router import QueryRouter
+from ..retrieval import PassageRetriever
+
+# {cited} / {family} are filled with patents that have prior art / a family
+SCRIPTS: List[List[Dict[str, Any]]] = [
+    [
+        {"say": "Show me SDG 7 patents about hydrogen storage"},
+        {"say": "What are the top technologies in this category?",
+         "spec": {"rewritten_query": "technology themes", "column_priority": ["ipc_technologies"],
+                  "filters": [], "aggregation": {"group_by": "ipc_technologies", "top_k": 5}}},
+        {"say": "How were SDG 7 patents filed each year?"},
+    ],
+    [
+        {"say": "What is the prior art cited by {cited}?"},
+        {"say": "Show the patent family of {family}"},
+        {"say": "Summarise the claims of {cited}"},
+    ],
+    [
+        {"say": "What are the latest SDG 3 patents?"},
+        {"say": "Which membrane technologies purify drinking water?"},
+        {"say": "What are the most common applicant countries for SDG 6 patents?",
+         "spec": {"rewritten_query": "applicant countries",
+                  "column_priority": ["sdg_number", "applicant_countries"],
+                  "filters": [{"column": "sdg_number", "op": "eq", "value": 6}],
+                  "aggregation": {"group_by": "applicant_countries", "top_k": 10}}},
+    ],
+]
+
+
+def script_ids(retriever: PassageRetriever) -> Dict[str, str]:
+    """A patent with prior art and one with a family in the loaded corpus."""
+    ids = {}
+    for pid in retriever.df["publication_number"].astype(str):
+        if "cited" not in ids and retriever.graph.cites(pid):
+            ids["cited"] = pid
+        if "family" not in ids and retriever.graph.family(pid):
+            ids["family"] = pid
+        if len(ids) == 2:
+            return ids
+    first = str(retriever.df["publication_number"].iloc[0])
+    return {"cited": ids.get("cited", first), "family": ids.get("family", first)}
+
+
+def scripted_responder(scripts):
+    """Mock reply: the turn's canned spec for rewrite prompts that have one,
+    otherwise the usual echo."""
+    specs = {t["say"]: json.dumps(t["spec"]) for s in scripts for t in s if "spec" in t}
+
+    def respond(messages):
+        last = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        is_rewrite = "STRICT JSON spec" in (messages[0].get("content") or "")
+        if is_rewrite and last in specs:
+            return specs[last]
+        return f"[mock] {last[:200]}"
+    return respond
+
+
+def percentiles(values) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if values else (0.0, 0.0, 0.0)
+    return {"p50_ms": round(p50 * 1e3, 1), "p95_ms": round(p95 * 1e3, 1),
+            "p99_ms": round(p99 * 1e3, 1)}
+
+
+class VirtualUser(threading.Thread):
+    """Replays conversations (fresh chat history each) until <deadline>."""
+
+    def __init__(self, uid: int, retriever, router, scripts, deadline: float,
+                 think: float, records: list, seed: int = 0):
+        super().__init__(name=f"vu-{uid}", daemon=True)
+        self.uid, self.retriever, self.router = uid, retriever, router
+        self.scripts, self.deadline, self.think = scripts, deadline, think
+        self.records = records
+        self.rng = random.Random(seed * 10_007 + uid)
+
+    def run(self):
+        k = self.uid
+        while time.perf_counter() < self.deadline:
+            pipeline = RAGPipeline(self.retriever, router=self.router)
+            for turn in self.scripts[k % len(self.scripts)]:
+                if self.think:
+                    time.sleep(self.rng.expovariate(1 / self.think))
+                if time.perf_counter() >= self.deadline:
+                    return
+                t0, error = time.perf_counter(), None
+                try:
+                    pipeline.ask(turn["text"])
+                except Exception as e:          # counted, conversation goes on
+                    error = repr(e)
+                # list.append is atomic; no lock needed
+                self.records.append((pipeline.last_branch or "none",
+                                     time.perf_counter() - t0, error))
+            k += 1
+
+
+def run_level(users: int, retriever, router, scripts, duration: float, think: float,
+              srv, seed: int = 0) -> Dict[str, Any]:
+    records: list = []
+    counts0 = dict(srv.counts)
+    srv.max_in_flight = 0
+    t0 = time.perf_counter()
+    vus = [VirtualUser(u, retriever, router, scripts, t0 + duration, think, records, seed)
+           for u in range(users)]
+    for vu in vus:
+        vu.start()
+    for vu in vus:
+        vu.join()
+    elapsed = time.perf_counter() - t0
+
+    by_branch = defaultdict(list)
+    for branch, secs, error in records:
+        if error is None:
+            by_branch[branch].append(secs)
+    errors = [e for *_, e in records if e is not None]
+    return {
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "turns": len(records),
+        "errors": len(errors),
+        "turns_per_s": round(len(records) / elapsed, 2),
+        "overall": percentiles([s for _, s, e in records if e is None]),
+        "branches": {b: {"turns": len(v), **percentiles(v)} for b, v in sorted(by_branch.items())},
+        "llm": {k: srv.counts[k] - counts0[k] for k in srv.counts} |
+               {"max_in_flight": srv.max_in_flight},
+        "sample_errors": sorted(set(errors))[:3],
+    }
+
+
+def print_level(res: Dict[str, Any]):
+    llm = res["llm"]
+    print(f"👥 {res['users']} users: {res['turns']} turns in {res['seconds']} s "
+          f"→ {res['turns_per_s']} turns/s, {res['errors']} errors | "
+          f"LLM {llm['requests']} calls, {llm['429']}× 429, max {llm['max_in_flight']} in flight")
+    rows = [("all", {"turns": res["turns"] - res["errors"], **res["overall"]})]
+    rows += list(res["branches"].items())
+    for branch, s in rows:
+        print(f"   {branch:<14} n={s['turns']:<6} p50 {s['p50_ms']:>8} ms   "
+              f"p95 {s['p95_ms']:>8} ms   p99 {s['p99_ms']:>8} ms")
+    for e in res["sample_errors"]:
+        print(f"   ⚠️ {e}")
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.loadtest", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", default="1,4,16", help="concurrent virtual users per level")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    ap.add_argument("--think", type=float, default=0.0, help="mean think time between turns (s)")
+    ap.add_argument("--llm-latency", type=float, default=0.3, help="mock seconds per LLM call")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="fraction of calls answered 429")
+    ap.add_argument("--retry-after", type=float, default=0.1)
+    ap.add_argument("--llm-concurrency", type=int, default=None,
+                    help="client in-flight cap (default: LLM_MAX_CONCURRENCY)")
+    ap.add_argument("--synthetic", type=float, default=None,
+                    help="index a synthetic corpus of this scale instead of embeddings/")
+    ap.add_argument("--no-rules", action="store_true", help="send every turn to the LLM rewrite")
+    ap.add_argument("--slo-p95", type=float, default=None, help="p95 turn latency target (s)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, default=None, help="write the results as JSON")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ragload-") as tmp:
+        if args.synthetic:
+            from ..embed_build import build_index
+            from .synth import HashEncoder, make_corpus
+            df, enc = make_corpus(args.synthetic, args.seed), HashEncoder()
+            print(f"🔨 Indexing {len(df):,} synthetic patents …")
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                build_index(df, encoder=enc, emb_dir=Path(tmp))
+            retriever = PassageRetriever(df=df, emb_dir=Path(tmp), encoder=enc)
+        else:
+            retriever = PassageRetriever()
+
+        ids     = script_ids(retriever)
+        scripts = [[{**t, "text": t["say"].format(**ids)} for t in s] for s in SCRIPTS]
+        srv = start_mock_server(latency=args.llm_latency, rate_429=args.rate_429,
+                                retry_after=args.retry_after, seed=args.seed,
+                                responder=scripted_responder(SCRIPTS))
+        client = {"max_concurrency": args.llm_concurrency} if args.llm_concurrency else {}
+        set_default_client(MistralClient(endpoint=srv.url, verbose=False, **client))
+        enable_cache(None)                          # every turn really calls the stub
+        router = QueryRouter(use_rules=not args.no_rules)
+        try:
+            # warm-up: encoder, lazily built masks, connection pool
+            for s in scripts:
+                pipeline = RAGPipeline(retriever, router=router)
+                for t in s:
+                    pipeline.ask(t["text"])
+            levels = []
+            for users in (int(u) for u in args.users.split(",")):
+                res = run_level(users, retriever, router, scripts, args.duration,
+                                args.think, srv, args.seed)
+                print_level(res)
+                levels.append(res)
+        finally:
+            set_default_client(None)
+            srv.shutdown()
+
+    ok = [r["users"] for r in levels
+          if args.slo_p95 and not r["errors"] and r["overall"]["p95_ms"] <= args.slo_p95 * 1e3]
+    if args.slo_p95:
+        print(f"✅ sustainable at p95 ≤ {args.slo_p95:g} s: {max(ok)} users" if ok
+              else f"⚠️ no level met p95 ≤ {args.slo_p95:g} s")
+    print(f"🧭 rewrite routing: {router.stats()}")
+    if args.out:
+        args.out.write_text(json.dumps({
+            "settings": vars(args) | {"out": str(args.out)},
+            "levels": levels, "router": router.stats(),
+            "sustainable_users": max(ok) if ok else None}, indent=2))
+        print(f"✅ results → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Publication-number lookups: full-table scan vs. PatentStore.
+
+Times the pipeline's old `df[df["publication_number"].astype(str) == pid]`
+pattern against PatentStore.row / rows (with column projection) for
+random known and unknown ids:
+
+    python -m src.bench.lookup final_dataset.csv --scale 10
+"""
+import argparse, random, time
+import pandas as pd
+
+from ..patent_store import PatentStore
+
+COLS = ["title_en", "claims"]
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.lookup", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("csv_path")
+    ap.add_argument("--scale", type=int, default=1, help="replicate the table N times")
+    ap.add_argument("--lookups", type=int, default=200)
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.csv_path)
+    if args.scale > 1:     # distinct ids per copy
+        df = pd.concat([df.assign(publication_number=df["publication_number"] * 10 + k)
+                        for k in range(args.scale)], ignore_index=True)
+    rng  = random.Random(0)
+    pids = [str(p) for p in rng.sample(df["publication_number"].tolist(),
+                                       min(args.lookups, len(df)))]
+    pids += ["999999999"] * (len(pids) // 10)         # some misses
+    print(f"📏  {len(df):,} rows, {len(pids)} lookups")
+
+    t0 = time.perf_counter()
+    store = PatentStore(df)
+    store.rows(pids[:1], COLS)                         # materialise projected columns
+    print(f"🔨  PatentStore build: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    t0 = time.perf_counter()
+    old = []
+    for pid in pids:
+        row = df[df["publication_number"].astype(str) == pid]
+        old.append(None if row.empty else row.iloc[0]["title_en"])
+    t_scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new = [None if r is None else r["title_en"] for r in (store.row(p, COLS) for p in pids)]
+    t_row = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = store.rows(pids, COLS)
+    t_rows = time.perf_counter() - t0
+
+    if old != new or new != [None if r is None else r["title_en"] for r in batch]:
+        raise SystemExit("❌ lookup results differ")
+    per = lambda t: t / len(pids) * 1e6
+    print(f"{'method':>14} {'µs/lookup':>10} {'speedup':>8}")
+    print(f"{'scan':>14} {per(t_scan):>10.1f} {1:>7.0f}x")
+    print(f"{'store.row':>14} {per(t_row):>10.2f} {t_scan / t_row:>7.0f}x")
+    print(f"{'store.rows':>14} {per(t_rows):>10.2f} {t_scan / t_rows:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Component microbenchmarks on synthetic corpora, fully offline.
+
+For every --scales factor a synthetic corpus (bench.synth, 250 rows per
+1x) is generated and indexed with the deterministic HashEncoder into a
+scratch directory, and the hot paths are timed:
+
+    iter_chunks            chunking the whole corpus
+    build_index            encode + FAISS + chunk store + side indexes
+    search                 PassageRetriever.search, caches off (p50 / p95)
+    filter_df              RAGPipeline._filter_df over bench.filters specs
+    top_k_group            per FACET_GROUP_COLS column
+    group_by_year          publication_date histogram
+    map_reduce_summarise   against the mock LLM (fixed latency per call)
+    count_tokens           per-text loop (cold / memoised) vs. count_tokens_batch
+                           (--tiktoken only)
+
+Token counts use the character estimate (token_utils.set_approx) unless
+--tiktoken is given, which needs tiktoken's BPE table cached or a network.
+
+Results go to a JSON file that bench.compare diffs between commits:
+
+    python -m src.bench.suite --scales 1,10,100 --out bench-$(git rev-parse --short HEAD).json
+    python -m src.bench.compare bench-old.json bench-new.json
+"""
+import argparse, contextlib, io, json, os, platform, statistics, subprocess, sys
+import tempfile, time
+from pathlib import Path
+
+import numpy as np
+
+from ..embed_build import build_index, iter_corpus_chunks
+from ..filter_ops import FilterEngine, FACET_COLS
+from ..llm_clients import MistralClient, set_default_client
+from ..mock_llm import start_mock_server
+from ..pipeline import RAGPipeline
+from ..retrieval import PassageRetriever
+from ..stats_engine import FACET_GROUP_COLS, group_by_year, top_k_group
+from ..summarise import map_reduce_summarise
+from .. import token_utils
+from ..token_utils import count_tokens, count_tokens_batch
+from .filters import SPECS
+from .synth import HashEncoder, make_corpus
+
+QUERIES = [
+    ("solar cell hydrogen battery", []),
+    ("membrane water purification", [{"column": "sdg_number", "op": "eq", "value": 6}]),
+    ("patient therapy implant", [{"column": "publication_date", "op": "gte",
+                                  "value": "2015-01-01"}]),
+    ("carbon capture catalyst", [{"column": "ipc_technologies", "op": "contains",
+                                  "value": "chemical"}]),
+]
+
+
+def timed(fn, repeats: int = 1):
+    """(median seconds over <repeats> runs, last result)."""
+    times, out = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), out
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1e3, 3)
+
+
+def bench_scale(scale: float, work: Path, repeats: int = 3, llm_latency: float = 0.02,
+                seed: int = 0, tiktoken: bool = False) -> list:
+    df  = make_corpus(scale, seed)
+    enc = HashEncoder()
+    out = []
+
+    def record(bench, **metrics):
+        out.append({"bench": bench, "scale": scale, "rows": len(df), "metrics": metrics})
+        shown = "  ".join(f"{k}={v}" for k, v in metrics.items())
+        print(f"   {bench:<22} {shown}")
+
+    print(f"📏  scale {scale:g}x: {len(df):,} rows")
+    t, n_chunks = timed(lambda: sum(1 for _ in iter_corpus_chunks(df)), repeats)
+    record("iter_chunks", total_ms=_ms(t), chunks=n_chunks,
+           chunks_per_s=round(n_chunks / t, 1))
+
+    emb_dir = work / f"x{scale:g}"
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        t, stats = timed(lambda: build_index(df, encoder=enc, emb_dir=emb_dir))
+    record("build_index", total_s=round(t, 3), chunks=stats["chunks"],
+           chunks_per_s=round(stats["chunks"] / t, 1))
+
+    retriever = PassageRetriever(df=df, emb_dir=emb_dir, encoder=enc, cache_size=0)
+    for q, _ in QUERIES:                               # warm filters / lexical masks
+        retriever.search(q)
+    lat = []
+    for _ in range(repeats):
+        for q, f in QUERIES:
+            t, _ = timed(lambda: retriever.search(q, filters=f, column_order=["title_en"]))
+            lat.append(t)
+    record("search", p50_ms=_ms(np.percentile(lat, 50)), p95_ms=_ms(np.percentile(lat, 95)))
+
+    pipeline = RAGPipeline(retriever)
+    cold = warm = 0.0
+    for spec in SPECS.values():
+        retriever.filters = FilterEngine(df, facet_cols=FACET_COLS, lexical=retriever.lexical)
+        t, _ = timed(lambda: pipeline._filter_df(df, spec))
+        cold += t
+        t, _ = timed(lambda: pipeline._filter_df(df, spec), repeats)
+        warm += t
+    record("filter_df", cold_ms=_ms(cold), warm_ms=_ms(warm), specs=len(SPECS))
+
+    t, _ = timed(lambda: [top_k_group(df, c) for c in FACET_GROUP_COLS if c in df.columns],
+                 repeats)
+    record("top_k_group", total_ms=_ms(t))
+    t, _ = timed(lambda: group_by_year(df, "publication_date"), repeats)
+    record("group_by_year", total_ms=_ms(t))
+
+    srv = start_mock_server(latency=llm_latency)
+    set_default_client(MistralClient(endpoint=srv.url, verbose=False))
+    try:
+        passages = [f"[{pid}] \"{title}\" || {text}" for pid, title, text in
+                    zip(df["publication_number"][:24], df["title_en"][:24], df["claims"][:24])]
+        t, _ = timed(lambda: map_reduce_summarise("solar hydrogen", passages, max_ctx=2_000))
+        record("map_reduce_summarise", total_s=round(t, 3), llm_calls=srv.counts["requests"],
+               passages=len(passages))
+    finally:
+        set_default_client(None)
+        srv.shutdown()
+
+    if not tiktoken:
+        return out
+    texts = [c for *_, c in iter_corpus_chunks(df.head(500))]
+    token_utils._counts.clear()
+    t_cold, _ = timed(lambda: [count_tokens(x) for x in texts])
+    t_warm, _ = timed(lambda: [count_tokens(x) for x in texts], repeats)
+    t_batch, _ = timed(lambda: count_tokens_batch(texts, memo=False), repeats)
+    record("count_tokens", cold_ms=_ms(t_cold), warm_ms=_ms(t_warm), batch_ms=_ms(t_batch),
+           texts=len(texts))
+    return out
+
+
+def environment() -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        rev = ""
+    import faiss
+    return {"commit": rev, "python": sys.version.split()[0], "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": np.__version__,
+            "faiss": getattr(faiss, "__version__", ""),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.suite", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", default="1,10,100", help="corpus sizes, x 250 rows")
+    ap.add_argument("--repeats", type=int, default=3, help="runs per timing (median)")
+    ap.add_argument("--llm-latency", type=float, default=0.02, help="mock seconds per call")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--tiktoken", action="store_true",
+                    help="count tokens with tiktoken (and time it) instead of the estimate")
+    ap.add_argument("--work-dir", type=Path, default=None,
+                    help="keep the built indexes here (default: a temp dir)")
+    ap.add_argument("--out", type=Path, default=Path("bench.json"))
+    args = ap.parse_args()
+
+    token_utils.set_approx(not args.tiktoken)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="ragbench-") as tmp:
+        work = args.work_dir or Path(tmp)
+        work.mkdir(parents=True, exist_ok=True)
+        for scale in (float(s) for s in args.scales.split(",")):
+            results += bench_scale(scale, work, args.repeats, args.llm_latency, args.seed,
+                                   args.tiktoken)
+
+    report = {"environment": environment(),
+              "settings": {"scales": args.scales, "repeats": args.repeats,
+                           "llm_latency": args.llm_latency, "seed": args.seed,
+                           "tiktoken": args.tiktoken},
+              "results": results}
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"✅ {len(results)} results → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
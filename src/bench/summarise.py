@@ -0,0 +1,62 @@
+"""
+Latency of map_reduce_summarise: serial vs. concurrent map phase.
+
+Runs against the local mock LLM (src.mock_llm) with a fixed per-call
+latency, on synthetic passages large enough to exceed the context window.
+A small --max-ctx forces the tree reduce as well:
+
+    python -m src.bench.summarise --passages 60 --latency 0.3 --parallelism 1,4,8
+    python -m src.bench.summarise --max-ctx 2000
+"""
+import argparse, random, time
+
+from ..llm_clients import MistralClient, set_default_client
+from ..mock_llm import start_mock_server
+from ..summarise import summarise_context, MAX_CTX
+
+WORDS = ("solar hydrogen membrane catalyst battery water purification sensor "
+         "turbine polymer electrode filter carbon capture irrigation vaccine").split()
+
+
+def make_passages(n: int, words: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [f"[{1000000 + i}] \"Synthetic patent {i}\" || "
+            + " ".join(rng.choice(WORDS) for _ in range(words)) for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.summarise", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--passages", type=int, default=60)
+    ap.add_argument("--words", type=int, default=1500, help="words per passage")
+    ap.add_argument("--latency", type=float, default=0.3, help="mock seconds per LLM call")
+    ap.add_argument("--parallelism", default="1,4,8")
+    ap.add_argument("--max-ctx", type=int, default=MAX_CTX)
+    args = ap.parse_args()
+
+    levels   = [int(p) for p in args.parallelism.split(",")]
+    passages = make_passages(args.passages, args.words)
+    srv = start_mock_server(latency=args.latency)
+    set_default_client(MistralClient(endpoint=srv.url, max_concurrency=max(levels),
+                                     verbose=False))
+    try:
+        print(f"📏  {len(passages)} passages × {args.words} words, "
+              f"{args.latency * 1e3:.0f} ms per mock call, max_ctx {args.max_ctx:,}")
+        print(f"{'parallelism':>11} {'LLM calls':>10} {'wall s':>8} {'speedup':>8}")
+        base = None
+        for p in levels:
+            before = srv.counts["requests"]
+            t0 = time.perf_counter()
+            summarise_context("water purification", passages,
+                              parallelism=p, max_ctx=args.max_ctx)
+            wall  = time.perf_counter() - t0
+            base  = base or wall
+            print(f"{p:>11} {srv.counts['requests'] - before:>10} {wall:>8.2f} "
+                  f"{base / wall:>7.1f}x")
+    finally:
+        set_default_client(None)
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
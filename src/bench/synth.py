@@ -0,0 +1,151 @@
+"""
+Synthetic patent corpus with the schema of final_dataset.csv, plus a tiny
+deterministic encoder, so benchmarks run offline at any scale.
+
+Texts are drawn from a fixed Zipf-distributed vocabulary mixed with
+topic words tied to each patent's SDG and technology, at roughly the
+real column lengths (claims ≈ 550 words, description ≈ 300). Citation,
+family and country columns use the same cell formats as the real file.
+Same seed → same corpus.
+
+    python -m src.bench.synth --scale 10 --out synthetic_10x.csv
+"""
+import argparse, zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_ROWS = 250          # rows in final_dataset.csv (= scale 1)
+
+TOPICS = {
+    "2":  ("Food & Beverage Processing", "crop yield soil fertiliser harvest"),
+    "3":  ("Medical & Healthcare", "patient therapy implant diagnostic dose"),
+    "6":  ("Water Treatment", "water membrane filtration purification desalination"),
+    "7":  ("Energy Generation", "solar cell hydrogen battery turbine photovoltaic"),
+    "9":  ("Manufacturing & Processing", "robotic assembly machining conveyor sensor"),
+    "12": ("Chemical Processes", "recycling catalyst polymer solvent waste"),
+    "13": ("Environmental Protection", "carbon capture emission sequestration co2 climate"),
+}
+FIELDS    = ("Human Necessities", "Chemistry & Metallurgy", "Physics", "Electricity",
+             "Performing Operations & Transport")
+COUNTRIES = ("US", "JP", "DE", "CH", "IT", "KR", "GB", "CN", "FR", "SE")
+KINDS     = ("B1", "B1", "B1", "B2")
+WORD_LENS = {"title_en": 7, "claims": 550, "description_text": 300,
+             "analysis_explanation": 35}
+
+
+def _vocab(n: int, rng: np.random.Generator) -> np.ndarray:
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    lens = rng.integers(3, 11, size=n)
+    return np.array(["".join(rng.choice(letters, size=k)) for k in lens])
+
+
+def make_corpus(scale: float = 1, seed: int = 0, vocab_size: int = 20_000) -> pd.DataFrame:
+    """A DataFrame of round(BASE_ROWS * scale) synthetic patents."""
+    rng   = np.random.default_rng(seed)
+    n     = max(1, int(round(BASE_ROWS * scale)))
+    vocab = _vocab(vocab_size, rng)
+    cdf   = np.cumsum(1.0 / np.arange(1, vocab_size + 1))
+    cdf  /= cdf[-1]
+
+    pids  = rng.choice(np.arange(1_000_000, 4_500_000), size=n, replace=False)
+    sdgs  = rng.choice(list(TOPICS), size=n, p=[.07, .58, .03, .12, .05, .06, .09])
+    dates = (rng.integers(1981, 2026, size=n) * 10_000
+             + rng.integers(1, 13, size=n) * 100 + rng.integers(1, 29, size=n))
+
+    def text(n_words: int, sdg: str) -> str:
+        size  = max(1, int(rng.normal(n_words, n_words / 4)))
+        words = vocab[np.minimum(np.searchsorted(cdf, rng.random(size)), vocab_size - 1)]
+        topic = TOPICS[sdg][1].split()
+        mix   = rng.random(len(words)) < 0.05
+        words[mix] = rng.choice(topic, size=int(mix.sum()))
+        return " ".join(words)
+
+    def refs(k: int) -> str:
+        docs = [f"EP {rng.choice(pids):07d} A1" if rng.random() < 0.3
+                else f"US {rng.integers(4_000_000, 9_999_999)} B2" for _ in range(k)]
+        return str([{"document": d} for d in docs])
+
+    def countries() -> str:
+        return ", ".join(sorted(set(rng.choice(COUNTRIES, size=rng.integers(1, 3)))))
+
+    rows = []
+    for i in range(n):
+        sdg    = str(sdgs[i])
+        family = rng.random() < 0.15
+        rows.append({
+            "publication_number": int(pids[i]),
+            "publication_kind": rng.choice(KINDS),
+            "publication_date": int(dates[i]),
+            "ipc": "A61B5/00, G06F19/00",
+            "cpc": "[]",
+            "title_en": text(WORD_LENS["title_en"], sdg).upper(),
+            "claims": text(WORD_LENS["claims"], sdg),
+            "abstract_text": np.nan,
+            "description_text": text(WORD_LENS["description_text"], sdg),
+            "prior_art": refs(int(rng.integers(0, 8))),
+            "reference": refs(int(rng.integers(0, 3))),
+            "parent": str([{"document": f"EP {rng.choice(pids)} A1"}]) if family else "[]",
+            "pct_publication_number": np.nan,
+            "designated_states_contracting": "['DE', 'FR', 'GB']",
+            "designated_states_extension": "[]",
+            "designated_states_validation": "[]",
+            "sdg_number": sdg,
+            "analysis_explanation": f"– Goal {sdg}: " + text(WORD_LENS["analysis_explanation"], sdg),
+            "ipc_tech_field": rng.choice(FIELDS),
+            "ipc_technologies": TOPICS[sdg][0],
+            "applicant_names": f"APPLICANT {i % 97}",
+            "applicant_countries": countries(),
+            "applicant_count": 1,
+            "inventor_names": f"Inventor, {i % 311}",
+            "inventor_countries": countries(),
+            "inventor_count": int(rng.integers(1, 6)),
+            "parent_publication_number": str(rng.choice(pids)) if family else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+
+class HashEncoder:
+    """
+    Deterministic stand-in for the SentenceTransformer: L2-normalised
+    hashed bag of words (crc32 buckets), same encode() signature. Fast
+    enough to embed a 100x corpus; similar texts get similar vectors.
+    """
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self._bucket = {}
+
+    def _b(self, word: str) -> int:
+        b = self._bucket.get(word)
+        if b is None:
+            b = self._bucket[word] = zlib.crc32(word.encode("utf-8")) % self.dim
+        return b
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kw):
+        single = isinstance(texts, str)
+        texts  = [texts] if single else list(texts)
+        out    = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, t in enumerate(texts):
+            b = [self._b(w) for w in t.lower().split()]
+            if b:
+                out[i] = np.bincount(b, minlength=self.dim)
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-9)
+        return out[0] if single else out
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.synth", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", type=float, default=1, help="x final_dataset.csv (250 rows)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, required=True)
+    args = ap.parse_args()
+    df = make_corpus(args.scale, args.seed)
+    df.to_csv(args.out, index=False)
+    print(f"✅ {len(df):,} synthetic patents → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Token counting on the patent corpus: per-string vs. batched vs. memoised
+vs. approximate.
+
+Counts every patent's concatenated text and every index chunk (as
+text_stats and the context budget do), and reports wall time plus the
+error of the character-based estimate against tiktoken:
+
+    python -m src.bench.tokens final_dataset.csv
+"""
+import argparse, time
+import numpy as np, pandas as pd
+
+from ..data_ingest import concat_text, TEXT_COLS
+from ..embed_build import iter_corpus_chunks
+from .. import token_utils as tu
+
+
+def _time(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.bench.tokens", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("csv_path")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.csv_path)
+    corpora = {
+        "patents": [concat_text(r, TEXT_COLS) for r in df.to_dict("records")],
+        "chunks":  [c for *_, c in iter_corpus_chunks(df)],
+    }
+    tu.warm_up()
+    enc = tu._get_enc()
+
+    print(f"{'corpus':>8} {'texts':>7} {'loop ms':>9} {'batch ms':>9} {'memo ms':>8} "
+          f"{'approx ms':>10} {'approx err':>11} {'under':>6}")
+    for name, texts in corpora.items():
+        exact, t_loop = _time(lambda: [len(enc.encode(t)) for t in texts])
+        tu._counts.clear()
+        batch, t_batch = _time(lambda: tu.count_tokens_batch(texts))
+        _, t_memo      = _time(lambda: tu.count_tokens_batch(texts))   # second turn
+        approx, t_apx  = _time(lambda: tu.count_tokens_batch(texts, approx=True))
+        if batch != exact:
+            raise SystemExit(f"❌ batched counts differ from per-string counts ({name})")
+        e, a = np.array(exact, dtype=float), np.array(approx, dtype=float)
+        ok   = e > 0
+        err  = np.mean(np.abs(a[ok] - e[ok]) / e[ok]) if ok.any() else 0.0
+        under = np.mean(a[ok] < e[ok]) if ok.any() else 0.0
+        print(f"{name:>8} {len(texts):>7,} {t_loop * 1e3:>9.1f} {t_batch * 1e3:>9.1f} "
+              f"{t_memo * 1e3:>8.1f} {t_apx * 1e3:>10.2f} {err:>10.1%} {under:>6.0%}")
+    print(f"📏  approx = ceil(chars / {tu.APPROX_CHARS_PER_TOKEN}); "
+          f"'under' = share of texts the estimate undercounts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Columnar, memory-mapped chunk metadata (replaces meta.pkl).
+
+Layout under <EMB_DIR>/chunks/, one entry per FAISS id:
+
+    row_idx.npy    int64   DataFrame row of the chunk (-1 = deleted id)
+    chunk_id.npy   int32   position of the chunk within its patent
+    pub_num.npy    S<w>    publication_number as bytes
+    text_off.npy   int64   n+1 byte offsets into text.bin
+    text.bin       utf-8 chunk texts, back to back
+    n_tokens.npy   int32   token count of each chunk (-1 = unknown; optional)
+
+Arrays are opened with mmap_mode="r", so startup cost and RSS no longer
+scale with the corpus; a hit only touches its own slice of text.bin.
+"""
+from __future__ import annotations
+import pickle, sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+STORE_DIR = "chunks"
+
+
+class ChunkStore:
+    """Sequence of chunk records indexed by FAISS id; store[i] returns the
+    same dict meta.pkl held ({row_idx, chunk_id, publication_number,
+    chunk_text}, plus n_tokens when known) or None for a deleted id."""
+
+    def __init__(self, row_idx, chunk_id, pub_num, text_off, text, n_tokens=None):
+        self.row_idx  = row_idx
+        self.chunk_id = chunk_id
+        self.pub_num  = pub_num
+        self.text_off = text_off
+        self._text    = text
+        self.n_tokens = n_tokens
+
+    # ---- construction ----------------------------------------------------
+    @classmethod
+    def open(cls, emb_dir: Path) -> "ChunkStore":
+        d = Path(emb_dir) / STORE_DIR
+        # plain ndarray views of the maps: slicing np.memmap objects is slow
+        load = lambda name: np.load(d / f"{name}.npy", mmap_mode="r").view(np.ndarray)
+        blob = d / "text.bin"
+        text = (np.memmap(blob, dtype=np.uint8, mode="r").view(np.ndarray)
+                if blob.stat().st_size else np.empty(0, dtype=np.uint8))
+        n_tokens = load("n_tokens") if (d / "n_tokens.npy").exists() else None
+        return cls(load("row_idx"), load("chunk_id"), load("pub_num"),
+                   load("text_off"), text, n_tokens)
+
+    @classmethod
+    def from_records(cls, meta: Sequence[Dict[str, Any] | None]) -> "ChunkStore":
+        """In-memory store from a meta.pkl-style list (None = deleted)."""
+        cols = _columns(meta)
+        return cls(*cols[:4], np.frombuffer(cols[4], dtype=np.uint8), cols[5])
+
+    @staticmethod
+    def exists(emb_dir: Path) -> bool:
+        return (Path(emb_dir) / STORE_DIR / "text_off.npy").exists()
+
+    # ---- persistence -----------------------------------------------------
+    @staticmethod
+    def write(emb_dir: Path, meta: Sequence[Dict[str, Any] | None]) -> Path:
+        d = Path(emb_dir) / STORE_DIR
+        d.mkdir(parents=True, exist_ok=True)
+        row_idx, chunk_id, pub_num, text_off, blob, n_tokens = _columns(meta)
+        (d / "text.bin").write_bytes(blob)
+        for name, arr in (("row_idx", row_idx), ("chunk_id", chunk_id),
+                          ("pub_num", pub_num), ("text_off", text_off),
+                          ("n_tokens", n_tokens)):
+            np.save(d / f"{name}.npy", arr)
+        return d
+
+    @staticmethod
+    def append(emb_dir: Path, row_idx: np.ndarray,
+               new: Sequence[Dict[str, Any]]) -> None:
+        """
+        Incremental write: replace the row_idx column with <row_idx> (which
+        already covers the appended ids) and append <new> records, in id
+        order, to the other columns. Existing text bytes are not rewritten.
+        """
+        d   = Path(emb_dir) / STORE_DIR
+        old = ChunkStore.open(emb_dir)
+        _, chunk_id, pub_num, text_off, blob, n_tokens = _columns(new)
+        base = int(old.text_off[-1])
+        old_tokens = (old.n_tokens if old.n_tokens is not None
+                      else np.full(len(old), -1, dtype=np.int32))
+        merged = {
+            "n_tokens": np.concatenate([old_tokens, n_tokens]),
+            "chunk_id": np.concatenate([old.chunk_id, chunk_id]),
+            "pub_num":  np.concatenate([old.pub_num, pub_num]),
+            "text_off": np.concatenate([old.text_off, text_off[1:] + base]),
+            "row_idx":  np.asarray(row_idx, dtype=np.int64),
+        }
+        del old                                  # release the mmaps first
+        with open(d / "text.bin", "ab") as f:
+            f.write(blob)
+        for name, arr in merged.items():
+            np.save(d / f"{name}.npy", arr)
+
+    # ---- access ----------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.row_idx)
+
+    def text(self, i: int) -> str:
+        a, b = self.text_off[i : i + 2]
+        return self._text[a:b].tobytes().decode("utf-8")
+
+    def __getitem__(self, i: int) -> Dict[str, Any] | None:
+        if i < 0:
+            i += len(self)
+        row = int(self.row_idx[i])
+        if row < 0:
+            return None
+        return {
+            "row_idx": row,
+            "chunk_id": int(self.chunk_id[i]),
+            "publication_number": self.pub_num[i].decode("utf-8"),
+            "chunk_text": self.text(i),
+            **({"n_tokens": int(self.n_tokens[i])}
+               if self.n_tokens is not None and self.n_tokens[i] >= 0 else {}),
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def _columns(meta: Iterable[Dict[str, Any] | None]):
+    rows, cids, pids, offs, texts, ntoks = [], [], [], [0], [], []
+    for m in meta:
+        if m is None:
+            rows.append(-1); cids.append(0); pids.append(b""); ntoks.append(-1)
+            offs.append(offs[-1])
+            continue
+        raw = m["chunk_text"].encode("utf-8")
+        rows.append(m["row_idx"]); cids.append(m["chunk_id"])
+        ntoks.append(m.get("n_tokens", -1))
+        pids.append(str(m["publication_number"]).encode("utf-8"))
+        texts.append(raw)
+        offs.append(offs[-1] + len(raw))
+    return (np.array(rows, dtype=np.int64), np.array(cids, dtype=np.int32),
+            np.array(pids, dtype=bytes) if pids else np.array([], dtype="S1"),
+            np.array(offs, dtype=np.int64), b"".join(texts),
+            np.array(ntoks, dtype=np.int32))
+
+
+def migrate(emb_dir: Path) -> Path:
+    """Convert a legacy meta.pkl in <emb_dir> into the columnar store."""
+    with open(Path(emb_dir) / "meta.pkl", "rb") as f:
+        meta = pickle.load(f)
+    out = ChunkStore.write(emb_dir, meta)
+    print(f"✅ Migrated {len(meta):,} chunks from meta.pkl → {out}")
+    return out
+
+
+def open_store(emb_dir: Path) -> ChunkStore:
+    """Open the columnar store, migrating meta.pkl on first use."""
+    if not ChunkStore.exists(emb_dir):
+        if not (Path(emb_dir) / "meta.pkl").exists():
+            raise FileNotFoundError(f"No chunk metadata in {emb_dir} – please run embed_build.py")
+        migrate(emb_dir)
+    return ChunkStore.open(emb_dir)
+
+
+if __name__ == "__main__":
+    from .config import EMB_DIR
+    if len(sys.argv) != 2 or sys.argv[1] != "migrate":
+        print("Usage: python -m src.chunk_store migrate")
+        sys.exit(1)
+    migrate(EMB_DIR)
@@ -0,0 +1,213 @@
+"""
+Citation / family graph over the patent table, in CSR form.
+
+Built once from `prior_art` + `reference` (citation edges) and `parent` +
+`parent_publication_number` (family edges). Nodes are normalised document
+numbers (patent_store.normalise_pid), covering both corpus patents and
+the external documents they point to, so two patents citing the same
+outside document are two hops apart. Non-patent literature is skipped.
+
+Each edge type is kept forward and backward as (indptr, indices) arrays:
+
+    cites      patent → documents it cites      cited_by   the reverse
+    parents    patent → its parent applications children   the reverse
+
+Persisted as <EMB_DIR>/graph.npz next to the FAISS index and reloaded
+unless the table has changed since.
+"""
+from __future__ import annotations
+import ast, hashlib, re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .patent_store import KEY_COL, normalise_pid
+
+GRAPH_NAME = "graph.npz"
+CITE_COLS  = ("prior_art", "reference")
+PARENT_COLS = ("parent", "parent_publication_number")
+MAX_HOPS   = 4
+
+_PATENT_DOC = re.compile(r"^(?:[A-Z]{2})?\s*\d")      # "EP 0885587 A1", "3739829"
+_EDGES      = ("cites", "cited_by", "parents", "children")
+
+
+def parse_refs(cell: Any) -> List[str]:
+    """Document numbers in one cell: a stringified list of dicts
+    ("[{'document': 'EP 0885587 A1'}]"), a ";"-separated string or NaN."""
+    if cell is None or (isinstance(cell, float) and np.isnan(cell)):
+        return []
+    text = str(cell).strip()
+    if text.startswith("["):
+        try:
+            items = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            items = []
+        out = []
+        for it in items:
+            if isinstance(it, dict):
+                out += [str(v) for v in it.values()]
+            else:
+                out.append(str(it))
+        return [d.strip() for d in out if _PATENT_DOC.match(d.strip().upper())]
+    return [d.strip() for d in re.split(r"[;,]", text)
+            if d.strip() and _PATENT_DOC.match(d.strip().upper())]
+
+
+def _fingerprint(df: pd.DataFrame) -> str:
+    cols = [KEY_COL] + [c for c in CITE_COLS + PARENT_COLS if c in df.columns]
+    h = hashlib.sha1(str(len(df)).encode())
+    for c in cols:
+        h.update(pd.util.hash_pandas_object(df[c].astype(str), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def _csr(n: int, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order   = np.lexsort((dst, src))
+    src, dst = src[order], dst[order]
+    keep    = np.ones(len(src), dtype=bool)          # drop duplicate edges
+    keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    src, dst = src[keep], dst[keep]
+    indptr  = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(indptr, src + 1, 1)
+    return np.cumsum(indptr), dst.astype(np.int32)
+
+
+class CitationGraph:
+    def __init__(self, keys: np.ndarray, labels: np.ndarray, node_row: np.ndarray,
+                 adj: Dict[str, Tuple[np.ndarray, np.ndarray]], fingerprint: str = ""):
+        self.keys        = keys            # normalised document number per node
+        self.labels      = labels          # first raw spelling seen, for display
+        self.node_row    = node_row        # DataFrame row of the node (-1 = external)
+        self.adj         = adj
+        self.fingerprint = fingerprint
+        self._node = {k: i for i, k in enumerate(keys.tolist())}
+
+    # ---- construction ----------------------------------------------------
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "CitationGraph":
+        node: Dict[str, int] = {}
+        labels: List[str]   = []
+        rows:   List[int]   = []
+
+        def node_of(doc, row=-1):
+            key = normalise_pid(doc)
+            i = node.get(key)
+            if i is None:
+                i = node[key] = len(labels)
+                labels.append(str(doc).strip())
+                rows.append(row)
+            elif row >= 0 and rows[i] < 0:
+                rows[i] = row
+            return i
+
+        pids  = df[KEY_COL].tolist()
+        own   = [node_of(pid, r) for r, pid in enumerate(pids)]
+        edges = {"cites": ([], []), "parents": ([], [])}
+        for kind, cols in (("cites", CITE_COLS), ("parents", PARENT_COLS)):
+            src, dst = edges[kind]
+            for col in cols:
+                if col not in df.columns:
+                    continue
+                for r, cell in enumerate(df[col].tolist()):
+                    for doc in parse_refs(cell):
+                        j = node_of(doc)
+                        if j != own[r]:
+                            src.append(own[r]); dst.append(j)
+
+        n, adj = len(labels), {}
+        for kind, rev in (("cites", "cited_by"), ("parents", "children")):
+            src = np.array(edges[kind][0], dtype=np.int64)
+            dst = np.array(edges[kind][1], dtype=np.int64)
+            adj[kind] = _csr(n, src, dst)
+            adj[rev]  = _csr(n, dst, src)
+        return cls(np.array(list(node), dtype=str), np.array(labels, dtype=str),
+                   np.array(rows, dtype=np.int32), adj, _fingerprint(df))
+
+    def save(self, emb_dir: Path) -> Path:
+        path = Path(emb_dir) / GRAPH_NAME
+        arrays = {f"{k}_{part}": arr for k, (ptr, idx) in self.adj.items()
+                  for part, arr in (("indptr", ptr), ("indices", idx))}
+        np.savez(path, keys=self.keys, labels=self.labels, node_row=self.node_row,
+                 fingerprint=np.array(self.fingerprint), **arrays)
+        return path
+
+    @classmethod
+    def load(cls, emb_dir: Path) -> "CitationGraph":
+        with np.load(Path(emb_dir) / GRAPH_NAME) as z:
+            adj = {k: (z[f"{k}_indptr"], z[f"{k}_indices"]) for k in _EDGES}
+            return cls(z["keys"], z["labels"], z["node_row"], adj, str(z["fingerprint"]))
+
+    # ---- queries ---------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def n_edges(self) -> int:
+        return int(len(self.adj["cites"][1]) + len(self.adj["parents"][1]))
+
+    def node(self, pid: Any) -> int | None:
+        return self._node.get(normalise_pid(pid))
+
+    def _step(self, frontier: np.ndarray, kinds: Sequence[str]) -> np.ndarray:
+        parts = []
+        for kind in kinds:
+            indptr, indices = self.adj[kind]
+            parts += [indices[indptr[i]:indptr[i + 1]] for i in frontier]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int32)
+
+    def traverse(self, pid: Any, kinds: Sequence[str], hops: int = 1,
+                 limit: int | None = None) -> Dict[int, int]:
+        """Breadth-first walk from <pid> along <kinds> edges for up to
+        <hops> steps (capped at MAX_HOPS); returns {node: distance},
+        excluding the start, in BFS order."""
+        start = self.node(pid)
+        if start is None:
+            return {}
+        seen = np.zeros(len(self.keys), dtype=bool)
+        seen[start] = True
+        out, frontier = {}, np.array([start])
+        for d in range(1, min(hops, MAX_HOPS) + 1):
+            nxt = self._step(frontier, kinds)
+            nxt = nxt[~seen[nxt]]
+            if not len(nxt):
+                break
+            seen[nxt] = True
+            for i in nxt.tolist():
+                out[i] = d
+                if limit is not None and len(out) >= limit:
+                    return out
+            frontier = nxt
+        return out
+
+    def describe(self, nodes: Iterable[int]) -> List[Dict[str, Any]]:
+        """[{node, key, label, row}] with row = DataFrame position or None."""
+        return [{"node": i, "key": str(self.keys[i]), "label": str(self.labels[i]),
+                 "row": int(self.node_row[i]) if self.node_row[i] >= 0 else None}
+                for i in nodes]
+
+    def cites(self, pid: Any, hops: int = 1, limit: int | None = None):
+        return self.describe(self.traverse(pid, ("cites",), hops, limit))
+
+    def cited_by(self, pid: Any, hops: int = 1, limit: int | None = None):
+        return self.describe(self.traverse(pid, ("cited_by",), hops, limit))
+
+    def family(self, pid: Any, hops: int = 2, limit: int | None = None):
+        """Parents, children and (at 2 hops) siblings sharing a parent."""
+        return self.describe(self.traverse(pid, ("parents", "children"), hops, limit))
+
+
+def load_graph(emb_dir: Path, df: pd.DataFrame, save: bool = False) -> CitationGraph:
+    """Persisted graph if it matches <df>, else a fresh build (saved when
+    <save> is set)."""
+    path = Path(emb_dir) / GRAPH_NAME
+    if path.exists():
+        graph = CitationGraph.load(emb_dir)
+        if graph.fingerprint == _fingerprint(df):
+            return graph
+    graph = CitationGraph.build(df)
+    if save:
+        graph.save(emb_dir)
+    return graph
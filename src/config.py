@@ -9,10 +9,30 @@ EMB_DIR  = BASE_DIR / "embeddings"
 load_dotenv()
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-MISTRAL_ENDPOINT = "https://api.mistral.ai/v1/chat/completions"  # :contentReference[oaicite:0]{index=0}
+MISTRAL_ENDPOINT = os.getenv("MISTRAL_ENDPOINT",
+                             "https://api.mistral.ai/v1/chat/completions")  # :contentReference[oaicite:0]{index=0}
+
+# HTTP client: concurrent in-flight requests and retries after the first attempt
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES     = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# concurrent map-phase calls in summarise.map_reduce_summarise
+SUMMARY_PARALLELISM = int(os.getenv("SUMMARY_PARALLELISM", str(LLM_MAX_CONCURRENCY)))
 
 # Mixtral model names (update if you have access to a newer suffix)
 MIXTRAL_MODEL = "open-mixtral-8x22b"
 
+# fuse BM25 keyword hits into passage search (reciprocal rank fusion);
+# opt-in until its ranking has been evaluated against vector-only search
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "0") == "1"
+
 # embedding model
 EMB_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+# opt-in on-disk LLM response cache (unset LLM_CACHE_PATH → disabled)
+LLM_CACHE_PATH        = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_ALLOW_NONZERO_TEMP = os.getenv("LLM_CACHE_ALLOW_NONZERO_TEMP", "0") == "1"
+
+# per-turn tracing sinks, e.g. "jsonl,ring,prometheus" (unset → tracing off)
+TRACING    = os.getenv("TRACING", "")
+TRACE_PATH = os.getenv("TRACE_PATH", "traces.jsonl")
@@ -23,14 +23,20 @@ def concat_text(row, cols=TEXT_COLS, sep="\n\n"):
     return sep.join(str(row[c] or "") for c in cols if pd.notna(row[c]))
 
 # --- simple token/word count utility -------------------------
-from .token_utils import count_tokens, count_words
+from .token_utils import count_tokens_batch, count_words
 
-def text_stats(df: pd.DataFrame, cols=TEXT_COLS):
-    """Print avg / max token and word counts across selected columns."""
+STATS_BATCH = 256   # texts per tiktoken batch call
+
+def text_stats(df: pd.DataFrame, cols=TEXT_COLS, approx: bool = False):
+    """Print avg / max token and word counts across selected columns.
+    approx=True uses the character-based estimate instead of tiktoken."""
+    texts = [concat_text(row, cols) for row in df.to_dict("records")]
     token_counts, word_counts = [], []
-    for _, row in tqdm(df.iterrows(), total=len(df)):
-        txt = concat_text(row, cols)
-        token_counts.append(count_tokens(txt))
-        word_counts.append(count_words(txt))
+    with tqdm(total=len(texts)) as bar:
+        for i in range(0, len(texts), STATS_BATCH):
+            batch = texts[i : i + STATS_BATCH]
+            token_counts += count_tokens_batch(batch, approx=approx, memo=False)
+            word_counts  += [count_words(t) for t in batch]
+            bar.update(len(batch))
     print(f"Avg tokens/patent: {sum(token_counts)//len(token_counts)}")
     print(f"Max tokens: {max(token_counts)}, 90th-pct: {int(pd.Series(token_counts).quantile(0.9))}")
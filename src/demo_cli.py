@@ -1,19 +1,54 @@
 #!/usr/bin/env python
-import sys
+import argparse, time
+_t_start = time.perf_counter()
 from .retrieval import PassageRetriever
 from .pipeline  import RAGPipeline
+_t_imports = time.perf_counter() - _t_start
+
+
+def print_profile(timings, pending=False):
+    print("⏱️  startup profile")
+    for phase, secs in timings.items():
+        print(f"   {phase:<30} {secs * 1e3:9.1f} ms")
+    if pending:
+        print(f"   {'(encoder still loading in background)':<30}")
+
 
 def main():
-    # no CSV argument needed
-    retriever = PassageRetriever()             # will auto-load parquet + index
+    ap = argparse.ArgumentParser(prog="python -m src.demo_cli")
+    ap.add_argument("--startup-profile", action="store_true",
+                    help="print a per-phase startup timing breakdown")
+    ap.add_argument("--no-stream", action="store_true",
+                    help="print each answer only once it is complete")
+    args = ap.parse_args()
+
+    # no CSV argument needed; index is memory-mapped and the encoder warms
+    # up in the background while the user types the first question
+    retriever = PassageRetriever(background=True)   # will auto-load parquet + index
     pipeline  = RAGPipeline(retriever, debug=True)
+    timings   = {"imports": _t_imports, **retriever.timings()}
+
+    if args.startup_profile:
+        print_profile(timings, pending=not retriever.ready)
+        print(f"   {'time to prompt':<30} {(time.perf_counter() - _t_start) * 1e3:9.1f} ms")
+    profiled = retriever.ready
 
-    print("🔎 RAG chatbot ready. Type 'exit' to quit.")
+    print("🔎 RAG chatbot ready. Type 'exit' to quit.")
     while True:
         q = input("👉  ").strip()
         if not q or q.lower() in ("exit","quit"):
             break
-        print(pipeline.ask(q))
+        if args.no_stream:
+            print(pipeline.ask(q))
+        else:
+            # render LLM answers token by token as they arrive
+            for piece in pipeline.ask_stream(q):
+                print(piece, end="", flush=True)
+            print()
+        if args.startup_profile and not profiled and retriever.ready:
+            print_profile({k: v for k, v in retriever.timings().items()
+                           if k not in timings})
+            profiled = True
 
 if __name__ == "__main__":
     main()
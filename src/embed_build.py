@@ -1,14 +1,26 @@
 # Updated src/embed_build.py to gracefully handle missing parquet engine
 
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
-import faiss, pickle, numpy as np, pandas as pd
+import faiss, numpy as np, pandas as pd
 from tqdm import tqdm
-import sys
+import argparse, hashlib, itertools, json, multiprocessing as mp, os, time
 
 from .config import EMB_MODEL_NAME, EMB_DIR
+from .chunk_store import ChunkStore, open_store
+from .citation_graph import CitationGraph
+from .lexical import LexicalIndex, ALL
 from .data_ingest import concat_text, TEXT_COLS
-from .token_utils import count_tokens
+from .token_utils import count_tokens_batch
+from .vector_store import VECTORS_NAME, append_vectors, n_vectors, write_vectors
+
+ENCODE_BATCH  = 256              # chunks per model.encode call
+MANIFEST_NAME = "manifest.json"  # per-patent / per-chunk content hashes
+INDEX_TYPES   = ("flat", "ivf", "hnsw", "sq8", "pq", "ivfpq")
+# quantised types: built with a float16 copy of the vectors (vector_store)
+# so search can re-rank their shortlist exactly
+COMPRESSED_TYPES = ("sq8", "pq", "ivfpq")
+TRAIN_SIZE    = 50_000           # max vectors sampled to train IVF / PQ
+
 
 def iter_chunks(text: str, max_tokens: int = 512, overlap: int = 64):
     words = text.split()
@@ -16,68 +28,394 @@ def iter_chunks(text: str, max_tokens: int = 512, overlap: int = 64):
     for i in range(0, len(words), step):
         yield " ".join(words[i : i + max_tokens])
 
-def build_index(df: pd.DataFrame,
-                cols       = None,
-                index_name = "faiss_chunks.idx"):
+
+def iter_corpus_chunks(df: pd.DataFrame, cols=None):
     """
-    Build FAISS index on text chunks (for fine-grained recall),
-    and persist both the index and the original DataFrame.
+    Lazily yield (row_idx, chunk_id, publication_number, chunk) for every
+    non-empty patent; row_idx is the positional index used by df.iloc.
     """
-    model   = SentenceTransformer(EMB_MODEL_NAME)
-    all_embs, meta = [], []
-
-    print("🔨  Encoding chunks …")
-    for row_idx, row in tqdm(df.iterrows(), total=len(df)):
-        use_cols  = cols or TEXT_COLS
+    use_cols = cols or TEXT_COLS
+    for row_idx, row in enumerate(df.to_dict("records")):
         full_text = concat_text(row, cols=use_cols)
         if not full_text.strip():  # skip empty
             continue
         for chunk_id, chunk in enumerate(iter_chunks(full_text)):
-            emb = model.encode(chunk, convert_to_numpy=True)
-            all_embs.append(emb)
-            meta.append({
-                "row_idx": row_idx,
-                "chunk_id": chunk_id,
-                "publication_number": row["publication_number"],
-                "chunk_text": chunk
-            })
-
-    if not all_embs:
-        raise ValueError("No text found to index -- check column names!")
+            yield row_idx, chunk_id, row["publication_number"], chunk
+
+
+def _batched(iterable, n: int):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, n)):
+        yield batch
+
+
+# ─── worker side: one SentenceTransformer per process ────────────────────
+_worker_model = None
+
+def _init_worker(model_name: str, n_threads: int):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(n_threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def _encode_shard(args):
+    texts, batch_size = args
+    return _worker_model.encode(texts, batch_size=batch_size,
+                                convert_to_numpy=True).astype("float32")
+
+
+def encode_chunks(batches, batch_size: int = ENCODE_BATCH, workers: int = 1,
+                  model_name: str = EMB_MODEL_NAME, encoder=None):
+    """
+    Encode an iterable of chunk-text batches, yielding one float32 array per
+    batch in input order. With workers > 1 the batches are fanned out over a
+    process pool whose workers each hold their own encoder. A ready
+    <encoder> (anything with SentenceTransformer's encode) runs in-process.
+    """
+    if encoder is not None or workers <= 1:
+        if encoder is None:
+            from sentence_transformers import SentenceTransformer
+            encoder = SentenceTransformer(model_name)
+        model = encoder
+        for texts in batches:
+            yield model.encode(texts, batch_size=batch_size,
+                               convert_to_numpy=True).astype("float32")
+        return
+
+    n_threads = max(1, (os.cpu_count() or workers) // workers)
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(model_name, n_threads)) as pool:
+        jobs = ((texts, batch_size) for texts in batches)
+        yield from pool.imap(_encode_shard, jobs)
+
+
+def index_spec(index_type: str, dim: int, n: int, hnsw_m: int = 32) -> str:
+    """
+    faiss.index_factory string for <index_type> sized for n vectors of
+    width dim; always ID-mapped so update_index can address vectors by id.
+    """
+    nlist = int(min(max(1, 4 * np.sqrt(n)), max(1, n // 39)))
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "ivf":
+        return f"IDMap2,IVF{nlist},Flat"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{hnsw_m}"
+    if index_type == "sq8":
+        return "IDMap2,SQ8"
+    # ~8 dims per sub-quantiser; fewer centroids on small corpora
+    m     = max(d for d in range(1, dim // 8 + 1) if dim % d == 0)
+    nbits = 8 if n >= 256 * 39 else 4
+    if index_type == "pq":           # one list = exhaustive PQ scan that takes IDSelectors
+        return f"IDMap2,IVF1,PQ{m}x{nbits}"
+    if index_type == "ivfpq":
+        return f"IDMap2,IVF{nlist},PQ{m}x{nbits}"
+    raise ValueError(f"Unknown index type {index_type!r} (choose from {INDEX_TYPES})")
+
+
+def make_index(embs: np.ndarray, index_type: str = "flat",
+               ids: np.ndarray | None = None, train_size: int = TRAIN_SIZE):
+    """Create an index of <index_type>, train it on a random sample of
+    <embs> if needed and add all vectors under <ids> (default 0..n-1)."""
+    n, dim = embs.shape
+    index  = faiss.index_factory(dim, index_spec(index_type, dim, n))
+    if not index.is_trained:
+        rng    = np.random.default_rng(0)
+        sample = embs[rng.choice(n, size=min(n, train_size), replace=False)]
+        index.train(sample)
+    if ids is None:
+        ids = np.arange(n, dtype="int64")
+    index.add_with_ids(embs, ids)
+    return index
+
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _manifest_from_meta(meta, index_type: str = "flat") -> dict:
+    """
+    Manifest = {next_id, index_type, patents: {publication_number: {hash, chunks}}}
+    where chunks is the ordered list of [chunk_hash, faiss_id] and the
+    patent hash is the hash over its chunk hashes.
+    """
+    by_pid = {}
+    for cid, m in enumerate(meta):
+        if m is None:        # tombstone left by update_index
+            continue
+        by_pid.setdefault(str(m["publication_number"]), []).append(
+            (m["chunk_id"], _sha1(m["chunk_text"]), cid))
+    patents = {}
+    for pid, chunks in by_pid.items():
+        chunks.sort()
+        patents[pid] = {
+            "hash":   _sha1("".join(h for _, h, _ in chunks)),
+            "chunks": [[h, cid] for _, h, cid in chunks],
+        }
+    return {"next_id": len(meta), "index_type": index_type, "patents": patents}
 
-    embs_np = np.vstack(all_embs).astype("float32")
-    dim     = embs_np.shape[1]
-    index   = faiss.IndexFlatL2(dim)
-    index.add(embs_np)
 
+def _save_artifacts(index, manifest, df, index_name, emb_dir: Path = EMB_DIR):
+    """Persist index, manifest, DataFrame, citation graph and lexical index
+    (chunk metadata is written separately via ChunkStore)."""
     # ensure directory exists
-    EMB_DIR.mkdir(exist_ok=True)
+    emb_dir.mkdir(exist_ok=True)
 
     # 1) save FAISS index
-    idx_path = EMB_DIR / index_name
+    idx_path = emb_dir / index_name
     faiss.write_index(index, str(idx_path))
 
-    # 2) save the metadata for each chunk
-    with open(EMB_DIR / "meta.pkl", "wb") as f:
-        pickle.dump(meta, f)
+    # 2) save the content-hash manifest; chunks/ supersedes meta.pkl
+    with open(emb_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    (emb_dir / "meta.pkl").unlink(missing_ok=True)
 
     # 3) persist the full patent DataFrame once, fallback to pickle if parquet unavailable
     try:
-        df.to_parquet(EMB_DIR / "patents.parquet", index=False)
-        print(f"✅ Full DataFrame saved → {EMB_DIR/'patents.parquet'}")
+        df.to_parquet(emb_dir / "patents.parquet", index=False)
+        print(f"✅ Full DataFrame saved → {emb_dir/'patents.parquet'}")
     except (ImportError, ValueError):
         print("⚠️  pyarrow/fastparquet not available, saving DataFrame as pickle instead")
-    df.to_pickle(EMB_DIR / "patents.pkl")
-    print(f"✅ Full DataFrame saved → {EMB_DIR/'patents.pkl'}")
+    df.to_pickle(emb_dir / "patents.pkl")
+    print(f"✅ Full DataFrame saved → {emb_dir/'patents.pkl'}")
+
+    # 4) citation / family graph for the prior-art and family branches
+    graph = CitationGraph.build(df)
+    print(f"✅ Citation graph saved ({len(graph):,} nodes, {graph.n_edges:,} edges) "
+          f"→ {graph.save(emb_dir)}")
+
+    # 5) inverted index over the text columns (BM25 + contains / priority)
+    lexical = LexicalIndex.build(df)
+    print(f"✅ Lexical index saved ({len(lexical.fields[ALL][0]):,} terms) "
+          f"→ {lexical.save(emb_dir)}")
+
+    print(f"✅ FAISS index saved ({index.ntotal:,} chunks) → {idx_path}")
+
+
+def build_index(df: pd.DataFrame,
+                cols       = None,
+                index_name = "faiss_chunks.idx",
+                batch_size = ENCODE_BATCH,
+                workers    = 1,
+                index_type = "flat",
+                encoder    = None,
+                emb_dir: Path = EMB_DIR):
+    """
+    Build FAISS index on text chunks (for fine-grained recall),
+    and persist both the index and the original DataFrame.
+
+    Chunks are produced lazily, encoded `batch_size` at a time and, when
+    `workers` > 1, across a pool of encoder processes. For a flat index each
+    encoded shard is added as it arrives; approximate types (ivf, hnsw,
+    ivfpq) are trained on a sample once all vectors are encoded. Vectors are
+    stored under explicit ids (= position in the chunk store) so update_index can
+    later remove them. <encoder> replaces the SentenceTransformer and
+    <emb_dir> the output directory (both for benchmarks). Returns
+    throughput stats.
+    """
+    meta   = []
+    index  = None
+    shards = []
+
+    def texts_of(batches):
+        # record metadata (incl. token counts for the context budget) in
+        # the parent, ship only the texts to encoders
+        for batch in batches:
+            texts = [chunk for *_, chunk in batch]
+            for (row_idx, chunk_id, pid, chunk), n_tok in zip(
+                    batch, count_tokens_batch(texts, memo=False)):
+                meta.append({
+                    "row_idx": row_idx,
+                    "chunk_id": chunk_id,
+                    "publication_number": pid,
+                    "chunk_text": chunk,
+                    "n_tokens": n_tok
+                })
+            yield texts
+
+    print(f"🔨  Encoding chunks (batch={batch_size}, workers={workers}) …")
+    t0 = time.perf_counter()
+    batches = _batched(iter_corpus_chunks(df, cols), batch_size)
+    with tqdm(unit="chunk") as bar:
+        for embs in encode_chunks(texts_of(batches), batch_size, workers, encoder=encoder):
+            if index_type != "flat":
+                shards.append(embs)
+            else:
+                if index is None:
+                    index = faiss.IndexIDMap2(faiss.IndexFlatL2(embs.shape[1]))
+                start = index.ntotal
+                index.add_with_ids(embs, np.arange(start, start + len(embs), dtype="int64"))
+            bar.update(len(embs))
+    elapsed = time.perf_counter() - t0
+
+    if shards:
+        print(f"🧭  Training {index_type} index …")
+        embs  = np.vstack(shards)
+        index = make_index(embs, index_type)
+
+    if index is None:
+        raise ValueError("No text found to index -- check column names!")
+
+    rate = index.ntotal / elapsed if elapsed else float("inf")
+    print(f"⚡  Encoded {index.ntotal:,} chunks in {elapsed:.1f}s "
+          f"({rate:,.1f} chunks/s)")
+
+    emb_dir.mkdir(exist_ok=True)
+    out = ChunkStore.write(emb_dir, meta)
+    print(f"✅ Chunk metadata saved → {out}")
+    if index_type in COMPRESSED_TYPES:
+        out = write_vectors(emb_dir, embs)
+        print(f"✅ Float16 vectors for exact re-ranking saved "
+              f"({out.stat().st_size / 2**20:,.1f} MiB) → {out}")
+    else:                    # a stale copy would re-rank a full-precision index
+        (emb_dir / VECTORS_NAME).unlink(missing_ok=True)
+    _save_artifacts(index, _manifest_from_meta(meta, index_type), df, index_name, emb_dir)
+    return {"chunks": index.ntotal, "seconds": elapsed, "chunks_per_sec": rate}
+
+
+def update_index(df: pd.DataFrame,
+                 cols       = None,
+                 index_name = "faiss_chunks.idx",
+                 batch_size = ENCODE_BATCH,
+                 workers    = 1,
+                 index_type = None,
+                 encoder    = None,
+                 emb_dir: Path = EMB_DIR):
+    """
+    Bring the persisted index in line with <df> without a full re-embed.
+
+    Patents whose content hash matches the manifest are kept as-is; for
+    changed patents only chunks whose hash differs are re-encoded; vectors
+    of deleted patents/chunks are removed by id and left as None
+    tombstones (row_idx -1) in the chunk store. New vectors get fresh ids appended after the
+    existing ones (and to the float16 store of compressed index types).
+    Falls back to build_index if no ID-mapped index exists, the index
+    type cannot remove vectors (HNSW) or the float16 store is out of step.
+    <index_type> defaults to the manifest's; a different one raises
+    ValueError, since switching types needs a full build.
+    """
+    idx_path = emb_dir / index_name
+    man_path = emb_dir / MANIFEST_NAME
+    index = faiss.read_index(str(idx_path)) if idx_path.exists() else None
+    if index is None or not man_path.exists() or not isinstance(index, faiss.IndexIDMap):
+        print("⚠️  No ID-mapped index + manifest found – running a full build instead")
+        return build_index(df, cols, index_name, batch_size, workers, index_type or "flat",
+                           encoder=encoder, emb_dir=emb_dir)
+
+    t0 = time.perf_counter()
+    store = open_store(emb_dir)
+    rows  = np.array(store.row_idx)          # writable copy; -1 = deleted
+    with open(man_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    old, next_id = manifest["patents"], manifest["next_id"]
+    if index_type not in (None, manifest.get("index_type", "flat")):
+        raise ValueError(f"{idx_path} is a {manifest.get('index_type', 'flat')} index; "
+                         f"run a full build (without --incremental) to switch to {index_type}")
+    index_type   = manifest.get("index_type", "flat")
+    first_new    = next_id
+    if index_type in COMPRESSED_TYPES and n_vectors(emb_dir, index.d) != first_new:
+        print("⚠️  Float16 vectors do not match the index – running a full build instead")
+        return build_index(df, cols, index_name, batch_size, workers, index_type,
+                           encoder=encoder, emb_dir=emb_dir)
+
+    patents, removed, pending = {}, [], []   # pending: (faiss_id, chunk tuple)
+    for row_idx, group in itertools.groupby(iter_corpus_chunks(df, cols),
+                                            key=lambda c: c[0]):
+        group  = list(group)
+        pid    = str(group[0][2])
+        hashes = [_sha1(c[3]) for c in group]
+        phash  = _sha1("".join(hashes))
+        prev   = old.get(pid, {"hash": None, "chunks": []})
+
+        if prev["hash"] == phash:
+            entries = prev["chunks"]
+        else:
+            entries = []
+            for i, (chunk, h) in enumerate(zip(group, hashes)):
+                if i < len(prev["chunks"]) and prev["chunks"][i][0] == h:
+                    entries.append(prev["chunks"][i])      # unchanged chunk
+                else:
+                    entries.append([h, next_id])
+                    pending.append((next_id, chunk))
+                    next_id += 1
+            kept = {cid for _, cid in entries}
+            removed += [cid for _, cid in prev["chunks"] if cid not in kept]
+
+        # row positions shift whenever the DataFrame changes
+        for _, cid in entries:
+            if cid < len(rows) and rows[cid] >= 0:
+                rows[cid] = row_idx
+        patents[pid] = {"hash": phash, "chunks": entries}
+
+    removed += [cid for pid, p in old.items() if pid not in patents
+                for _, cid in p["chunks"]]
+
+    if removed:
+        try:
+            index.remove_ids(np.array(removed, dtype="int64"))
+        except RuntimeError:
+            print(f"⚠️  {index_type} index cannot remove vectors – running a full build instead")
+            return build_index(df, cols, index_name, batch_size, workers, index_type,
+                               encoder=encoder, emb_dir=emb_dir)
+        rows[removed] = -1
+
+    n_toks = count_tokens_batch((chunk for _, (*_, chunk) in pending), memo=False)
+    new = [{"row_idx": row_idx, "chunk_id": chunk_id,
+            "publication_number": pid, "chunk_text": chunk, "n_tokens": n_tok}
+           for (_, (row_idx, chunk_id, pid, chunk)), n_tok in zip(pending, n_toks)]
+    rows = np.concatenate([rows, np.array([m["row_idx"] for m in new], dtype="int64")])
+    if pending:
+        print(f"🔨  Encoding {len(pending):,} new/changed chunks …")
+        batches = list(_batched(pending, batch_size))
+        texts   = ([chunk for _, (*_, chunk) in b] for b in batches)
+        for embs, b in zip(encode_chunks(texts, batch_size, workers, encoder=encoder), batches):
+            index.add_with_ids(embs, np.array([cid for cid, _ in b], dtype="int64"))
+            if index_type in COMPRESSED_TYPES:
+                append_vectors(emb_dir, embs, b[0][0])   # ids are consecutive
+    elapsed = time.perf_counter() - t0
+
+    n_reused = sum(len(p["chunks"]) for p in patents.values()) - len(pending)
+    print(f"♻️  Reused {n_reused:,} chunks, encoded {len(pending):,}, "
+          f"removed {len(removed):,} in {elapsed:.1f}s")
+
+    del store                                # release mmaps before rewriting
+    ChunkStore.append(emb_dir, rows, new)
+    manifest = {"next_id": next_id, "index_type": index_type, "patents": patents}
+    _save_artifacts(index, manifest, df, index_name, emb_dir)
+    return {"reused": n_reused, "encoded": len(pending),
+            "removed": len(removed), "seconds": elapsed}
 
-    print(f"✅ FAISS index saved ({len(meta):,} chunks) → {idx_path}")
-    print(f"✅ Metadata saved → {EMB_DIR/'meta.pkl'}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python -m src.embed_build <path/to/final_dataset.csv>")
-        sys.exit(1)
-    csv_path = sys.argv[1]
-    print(f"Loading CSV from {csv_path} …")
-    df = pd.read_csv(csv_path)
-    build_index(df)
+    ap = argparse.ArgumentParser(
+        prog="python -m src.embed_build",
+        description="Embed patent chunks and build the FAISS index.")
+    ap.add_argument("csv_path", help="path/to/final_dataset.csv")
+    ap.add_argument("--batch-size", type=int, default=ENCODE_BATCH,
+                    help="chunks per encoder call")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="encoder processes (each loads its own model)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="only encode new/changed patents (see manifest.json)")
+    ap.add_argument("--index-type", choices=INDEX_TYPES,
+                    help="FAISS index family, default flat (sq8 / pq / ivfpq also save "
+                         "float16 vectors for exact re-ranking); --incremental keeps "
+                         "the existing index's type and rejects a different one")
+    args = ap.parse_args()
+
+    print(f"Loading CSV from {args.csv_path} …")
+    df = pd.read_csv(args.csv_path)
+    if args.incremental:
+        try:
+            update_index(df, batch_size=args.batch_size, workers=args.workers,
+                         index_type=args.index_type)
+        except ValueError as e:
+            ap.error(str(e))
+    else:
+        build_index(df, batch_size=args.batch_size, workers=args.workers,
+                    index_type=args.index_type or "flat")
@@ -7,19 +7,43 @@ Supported ops:  eq, neq, contains, startswith, in, gte, lte, between
 """
 from __future__ import annotations
 from datetime import datetime
-from typing import Any, Sequence
-import numbers
+from typing import Any, Dict, List, Sequence
+import numbers, threading
 
-__all__ = ["apply_filter"]
+import numpy as np
+import pandas as pd
+
+from .tracing import count, traced
+
+__all__ = ["apply_filter", "FilterEngine"]
+
+DATE_COLS  = ("publication_date",)
+# low-cardinality columns whose eq-masks are materialised at load time
+FACET_COLS = ("sdg_number", "publication_kind", "applicant_countries",
+              "inventor_countries")
+MASK_CACHE = 512          # memoised per-filter masks
+_DATE_FMTS = ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y")
+# all-digit dates by length: strptime("%Y%m%d") would read "202112" as 2021-01-02
+_DIGIT_FMTS = {8: "%Y%m%d", 6: "%Y%m", 4: "%Y"}
 
 
 # ───────────────────── helpers ───────────────────────────────────────────
 def _to_date(val: str | datetime):
     if isinstance(val, datetime):
         return val
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y"):
+    if isinstance(val, numbers.Number):
+        if val != val:                       # NaN
+            return None
+        if float(val).is_integer():          # 20250416 / 20250416.0 / 2021
+            val = int(val)
+    txt = str(val).strip()[:10]
+    if txt.isdigit():
+        fmts = [_DIGIT_FMTS[len(txt)]] if len(txt) in _DIGIT_FMTS else []
+    else:
+        fmts = _DATE_FMTS
+    for fmt in fmts:
         try:
-            return datetime.strptime(str(val)[: len(fmt)], fmt)
+            return datetime.strptime(txt, fmt)
         except ValueError:
             continue
     return None
@@ -63,3 +87,160 @@ def apply_filter(row_val: Any, op: str, value: Any) -> bool:
 
     # unknown op → do not filter out
     return True
+
+
+# ───────────────────── vectorised engine ─────────────────────────────────
+class FilterEngine:
+    """
+    Evaluate filter specs as vectorised boolean masks over one DataFrame,
+    with the same per-op semantics as apply_filter.
+
+    Per-column views (str / lower-case text, numeric values, parsed dates)
+    are built once and reused by every query; DATE_COLS are parsed to
+    datetime64 up front. Single-filter masks are memoised, and eq-masks for
+    every value of the low-cardinality `facet_cols` are materialised at load
+    so common SDG / kind / country filters are a lookup. Given a
+    LexicalIndex, `contains` on its text columns reads posting lists
+    instead of scanning the column.
+    """
+
+    def __init__(self, df: pd.DataFrame,
+                 date_cols: Sequence[str] = DATE_COLS,
+                 facet_cols: Sequence[str] = (),
+                 max_facet_values: int = 256,
+                 lexical=None):
+        self.df    = df
+        self.lexical = lexical                # LexicalIndex: `contains` via postings
+        self._str: Dict[str, pd.Series]    = {}
+        self._lower: Dict[str, pd.Series]  = {}
+        self._num: Dict[str, tuple]        = {}
+        self._dates: Dict[str, np.ndarray] = {}
+        self._masks: Dict[tuple, np.ndarray]  = {}
+        self._facets: Dict[tuple, np.ndarray] = {}
+        self._lock = threading.Lock()         # shared across server sessions
+        for col in date_cols:
+            if col in df.columns:
+                self.dates(col)
+        for col in facet_cols:
+            if col in df.columns:
+                values = pd.unique(self.text(col))
+                if len(values) <= max_facet_values:
+                    for v in values:
+                        self._facets[(col, "eq", v)] = (self.text(col) == v).to_numpy(bool)
+
+    # ---- cached column views --------------------------------------------
+    def _column(self, col: str) -> pd.Series:
+        if col in self.df.columns:
+            return self.df[col]
+        return pd.Series("", index=self.df.index, dtype=object)   # row.get(col, "")
+
+    def text(self, col: str) -> pd.Series:
+        """str(cell) for every row (NaN → 'nan', as apply_filter sees it)."""
+        if col not in self._str:
+            self._str[col] = self._column(col).map(str).astype(object)
+        return self._str[col]
+
+    def lower(self, col: str) -> pd.Series:
+        if col not in self._lower:
+            self._lower[col] = self.text(col).str.lower()
+        return self._lower[col]
+
+    def numeric(self, col: str):
+        """(is_number mask, float values) for the numeric comparison path."""
+        if col not in self._num:
+            ser = self._column(col)
+            if pd.api.types.is_numeric_dtype(ser) and not pd.api.types.is_bool_dtype(ser):
+                is_num = np.ones(len(ser), dtype=bool)
+            else:
+                is_num = ser.map(lambda v: isinstance(v, numbers.Number)).to_numpy(bool)
+            vals = pd.to_numeric(ser.where(is_num), errors="coerce").to_numpy(float)
+            self._num[col] = (is_num, vals)
+        return self._num[col]
+
+    def dates(self, col: str) -> np.ndarray:
+        """Cells parsed with _to_date, once per distinct value → datetime64."""
+        if col not in self._dates:
+            ser    = self._column(col)
+            lookup = {v: _to_date(v) for v in pd.unique(ser)}
+            self._dates[col] = pd.to_datetime(ser.map(lookup), errors="coerce").to_numpy()
+        return self._dates[col]
+
+    # ---- compilation -----------------------------------------------------
+    def _mask_one(self, col: str, op: str, value: Any) -> np.ndarray:
+        n = len(self.df)
+        if op == "eq":
+            return (self.text(col) == str(value)).to_numpy(bool)
+        if op == "neq":
+            return (self.text(col) != str(value)).to_numpy(bool)
+        if op == "contains":
+            if self.lexical is not None and col in self.lexical:
+                return self.lexical.contains_mask(col, value)
+            return self.lower(col).str.contains(str(value).lower(), regex=False).to_numpy(bool)
+        if op == "startswith":
+            return self.lower(col).str.startswith(str(value).lower()).to_numpy(bool)
+        if op == "in":
+            low = self.lower(col)
+            if isinstance(value, Sequence):
+                vals = {str(v).lower() for v in value}
+                mask = low.isin(vals).to_numpy(bool)
+                for v in vals:
+                    mask = mask | low.str.contains(v, regex=False).to_numpy(bool)
+                return mask
+            return low.str.contains(str(value).lower(), regex=False).to_numpy(bool)
+
+        if op in {"gte", "lte", "between"}:
+            dates = self.dates(col)
+            if op == "between" and isinstance(value, Sequence) and len(value) == 2:
+                start, end = map(_to_date, value)
+                if not (start and end):
+                    by_date = np.zeros(n, dtype=bool)
+                else:
+                    by_date = (dates >= np.datetime64(start)) & (dates <= np.datetime64(end))
+            else:
+                cmp_date = _to_date(value)
+                if not cmp_date:
+                    by_date = np.zeros(n, dtype=bool)
+                elif op == "gte":
+                    by_date = dates >= np.datetime64(cmp_date)
+                else:
+                    by_date = dates <= np.datetime64(cmp_date)
+            if not isinstance(value, numbers.Number):
+                return by_date
+            is_num, vals = self.numeric(col)
+            with np.errstate(invalid="ignore"):
+                by_num = vals >= value if op == "gte" else vals <= value
+            return np.where(is_num, by_num, by_date)
+
+        # unknown op → do not filter out
+        return np.ones(n, dtype=bool)
+
+    def _cached_mask(self, col: str, op: str, value: Any) -> np.ndarray:
+        key = (col, op, str(value) if op in {"eq", "neq"} else repr(value))
+        hit = self._facets.get(key)
+        if hit is None:
+            hit = self._masks.get(key)
+        if hit is None:
+            count("filter", masks_built=1)
+            hit = self._mask_one(col, op, value)
+            hit.flags.writeable = False
+            with self._lock:
+                if len(self._masks) >= MASK_CACHE:
+                    self._masks.pop(next(iter(self._masks)), None)
+                self._masks[key] = hit
+        else:
+            count("filter", cache_hits=1)
+        return hit
+
+    @traced("filter")
+    def mask(self, filters: Sequence[Dict[str, Any]] | None) -> np.ndarray:
+        """Boolean row mask for rows passing ALL filters."""
+        out = np.ones(len(self.df), dtype=bool)
+        for f in filters or []:
+            out &= self._cached_mask(f["column"], f["op"], f["value"])
+        return out
+
+    def filter(self, filters: Sequence[Dict[str, Any]] | None) -> pd.DataFrame:
+        """Subset of the DataFrame passing all filters."""
+        if not filters:
+            return self.df
+        return self.df.loc[self.mask(filters)]
@@ -0,0 +1,298 @@
+"""
+Inverted index over the patent text columns, next to the FAISS index.
+
+Every column in LEXICAL_COLS (data_ingest.TEXT_COLS + ipc_technologies)
+is tokenised once into lower-case word tokens (\\w+) and stored as
+postings: for each term the sorted rows holding it and the term
+frequency (CSR: indptr + rows + tf). The sorted vocabulary is kept as
+one UTF-8 blob plus offsets (Vocab). A combined field "*" over all the
+columns carries the BM25 statistics.
+
+It serves three callers:
+
+    bm25(query)                  top rows for a keyword query; fused with
+                                 the vector hits (reciprocal rank fusion)
+    contains_mask(col, value)    FilterEngine's `contains` op
+    term_mask(col, word)         the column-priority bonus in search()
+
+A query word made only of word characters occurs in a cell exactly when
+it is a substring of one of the cell's tokens, so these masks are the
+union of the postings of the matching vocabulary terms. Values with
+punctuation or spaces are narrowed that way, and only the candidate rows
+are checked with a substring test. Either way the result is the same as
+`value in str(cell).lower()`.
+
+Persisted as <EMB_DIR>/lexical.npz by embed_build together with
+patents.parquet, and rebuilt on load if the table has changed since:
+the text is hashed when the index is built, so loading the saved table
+only checks the row ids.
+"""
+from __future__ import annotations
+import hashlib, re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .data_ingest import TEXT_COLS
+from .patent_store import KEY_COL
+
+LEXICAL_NAME = "lexical.npz"
+LEXICAL_FORMAT = 3                   # 3: UTF-8 vocabulary blob, row_key
+LEXICAL_COLS = tuple(TEXT_COLS) + ("ipc_technologies",)
+ALL          = "*"                 # combined field used for BM25
+BM25_K1, BM25_B = 1.2, 0.75
+RRF_K        = 60
+
+_TOKEN = re.compile(r"\w+")
+_WORD  = re.compile(r"\w+")            # fullmatch: a single token
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _row_key(df: pd.DataFrame) -> str:
+    # row count + ids, in order: cheap enough for every start-up
+    h = hashlib.sha1(str(len(df)).encode())
+    h.update(pd.util.hash_pandas_object(df[KEY_COL].astype(str), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def _fingerprint(df: pd.DataFrame, cols: Sequence[str]) -> str:
+    # ids + cell contents: any edit, even one keeping the length, rebuilds
+    h = hashlib.sha1(_row_key(df).encode())
+    for c in cols:
+        h.update(c.encode())
+        h.update(pd.util.hash_pandas_object(df[c].astype(str), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+class Vocab:
+    """
+    Sorted terms of one field as a UTF-8 blob, each term followed by "\n",
+    plus start offsets (n + 1, last = blob size), as ChunkStore keeps its
+    text: no fixed-width padding on disk or in memory.
+    """
+
+    def __init__(self, blob: np.ndarray, off: np.ndarray):
+        self.blob = blob                   # uint8
+        self.off  = off                    # int64
+        self._bytes = None
+
+    @classmethod
+    def from_terms(cls, terms: Sequence[str]) -> "Vocab":
+        raw = [(t + "\n").encode("utf-8") for t in terms]
+        off = np.zeros(len(raw) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in raw], out=off[1:])
+        return cls(np.frombuffer(b"".join(raw), dtype=np.uint8), off)
+
+    def __len__(self) -> int:
+        return len(self.off) - 1
+
+    def tolist(self) -> List[str]:
+        return self.blob.tobytes().decode("utf-8").split("\n")[:-1]
+
+    def find(self, word: str) -> np.ndarray:
+        """Ids of the terms containing <word> (no newline in it)."""
+        if self._bytes is None:
+            self._bytes = self.blob.tobytes()
+        pos = [m.start() for m in re.finditer(re.escape(word.encode("utf-8")), self._bytes)]
+        return np.unique(np.searchsorted(self.off, pos, side="right") - 1)
+
+
+def _field(rows_tokens: List[List[str]]):
+    """(vocab, indptr, rows, tf, doc_len) postings for one field."""
+    counts = [Counter(toks) for toks in rows_tokens]
+    terms  = sorted({t for c in counts for t in c})
+    vocab  = Vocab.from_terms(terms)
+    if not terms:
+        return (vocab, np.zeros(1, np.int64), np.zeros(0, np.int32),
+                np.zeros(0, np.int32), np.zeros(len(counts), np.int32))
+    code   = {t: i for i, t in enumerate(terms)}
+    term, row, tf = [], [], []
+    for r, c in enumerate(counts):
+        for t, n in c.items():
+            term.append(code[t]); row.append(r); tf.append(n)
+    term, row, tf = (np.array(a, dtype=np.int64) for a in (term, row, tf))
+    order  = np.lexsort((row, term))
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(term, minlength=len(terms)))])
+    doc_len = np.array([sum(c.values()) for c in counts], dtype=np.int32)
+    return vocab, indptr, row[order].astype(np.int32), tf[order].astype(np.int32), doc_len
+
+
+class LexicalIndex:
+    def __init__(self, df: pd.DataFrame, fields: Dict[str, tuple], fingerprint: str = "",
+                 row_key: str = ""):
+        self.df          = df
+        self.n_rows      = len(df)
+        self.fields      = fields          # col → (vocab, indptr, rows, tf, doc_len)
+        self.fingerprint = fingerprint     # ids + text, computed at build time
+        self.row_key     = row_key         # ids only
+        self._code = {col: None for col in fields}         # term → id, on first use
+        self._masks = LRUCache(4096)                        # (col, word) → row mask
+        _, _, _, _, dl = fields[ALL]
+        self._avgdl = float(dl.mean()) if len(dl) else 0.0
+
+    def __contains__(self, col: str) -> bool:
+        return col in self.fields and col != ALL
+
+    # ---- construction ----------------------------------------------------
+    @classmethod
+    def build(cls, df: pd.DataFrame, cols: Sequence[str] = LEXICAL_COLS) -> "LexicalIndex":
+        cols = [c for c in cols if c in df.columns]
+        # str(cell), as the filters and the priority bonus see it (NaN → "nan")
+        per_col = {c: [tokenize(str(v)) for v in df[c].tolist()] for c in cols}
+        fields  = {c: _field(toks) for c, toks in per_col.items()}
+        merged  = [sum((per_col[c][r] for c in cols), []) for r in range(len(df))]
+        fields[ALL] = _field(merged)
+        return cls(df, fields, _fingerprint(df, cols), _row_key(df))
+
+    def save(self, emb_dir: Path) -> Path:
+        path   = Path(emb_dir) / LEXICAL_NAME
+        arrays = {}
+        for c, (vocab, *postings) in self.fields.items():
+            arrays[f"{c}|vocab_blob"], arrays[f"{c}|vocab_off"] = vocab.blob, vocab.off
+            arrays.update({f"{c}|{part}": arr for part, arr in
+                           zip(("indptr", "rows", "tf", "doc_len"), postings)})
+        np.savez(path, format=np.array(LEXICAL_FORMAT), fingerprint=np.array(self.fingerprint),
+                 row_key=np.array(self.row_key), **arrays)
+        return path
+
+    @classmethod
+    def load(cls, emb_dir: Path, df: pd.DataFrame) -> "LexicalIndex | None":
+        """The persisted index, or None if it was written in an older format."""
+        with np.load(Path(emb_dir) / LEXICAL_NAME) as z:
+            if "format" not in z.files or int(z["format"]) != LEXICAL_FORMAT:
+                return None
+            cols = sorted({k.split("|")[0] for k in z.files if "|" in k})
+            fields = {c: (Vocab(z[f"{c}|vocab_blob"], z[f"{c}|vocab_off"]),
+                          *(z[f"{c}|{p}"] for p in ("indptr", "rows", "tf", "doc_len")))
+                      for c in cols}
+            return cls(df, fields, str(z["fingerprint"]), str(z["row_key"]))
+
+    # ---- term lookups ----------------------------------------------------
+    def _term_id(self, col: str, term: str) -> int | None:
+        code = self._code[col]
+        if code is None:
+            code = self._code[col] = {t: i for i, t in enumerate(self.fields[col][0].tolist())}
+        return code.get(term)
+
+    def term_mask(self, col: str, word: str) -> np.ndarray:
+        """Rows whose <col> has a token containing <word> (a \\w+ string),
+        i.e. `word in str(cell).lower()`."""
+        word = word.lower()
+
+        def compute():
+            vocab, indptr, rows, _, _ = self.fields[col]
+            hit = vocab.find(word)
+            mask = np.zeros(self.n_rows, dtype=bool)
+            for t in hit:
+                mask[rows[indptr[t]:indptr[t + 1]]] = True
+            mask.flags.writeable = False
+            return mask
+        return self._masks.get_or_compute((col, word), compute)
+
+    def contains_mask(self, col: str, value) -> np.ndarray:
+        """Same rows as FilterEngine's substring `contains`, via postings."""
+        value = str(value).lower()
+        if _WORD.fullmatch(value):
+            return self.term_mask(col, value)
+        words = tokenize(value)
+        if not words:                      # punctuation only: plain scan
+            cand = np.arange(self.n_rows)
+        else:
+            mask = np.ones(self.n_rows, dtype=bool)
+            for w in words:
+                mask &= self.term_mask(col, w)
+            cand = np.flatnonzero(mask)
+        cells = self.df[col].to_numpy()
+        out = np.zeros(self.n_rows, dtype=bool)
+        out[cand] = [value in str(cells[r]).lower() for r in cand]
+        return out
+
+    # ---- ranking ---------------------------------------------------------
+    def bm25(self, query: str, k: int = 60,
+             mask: np.ndarray | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the <k> best BM25 matches for <query> over all
+        indexed columns, restricted to rows set in <mask>."""
+        _, indptr, rows, tf, dl = self.fields[ALL]
+        scores = np.zeros(self.n_rows, dtype=np.float64)
+        norm   = BM25_K1 * (1 - BM25_B + BM25_B * dl / max(self._avgdl, 1e-9))
+        for term in set(tokenize(query)):
+            t = self._term_id(ALL, term)
+            if t is None:
+                continue
+            r, f = rows[indptr[t]:indptr[t + 1]], tf[indptr[t]:indptr[t + 1]]
+            idf = np.log(1 + (self.n_rows - len(r) + 0.5) / (len(r) + 0.5))
+            scores[r] += idf * f * (BM25_K1 + 1) / (f + norm[r])
+        if mask is not None:
+            scores[~mask] = 0.0
+        top = np.flatnonzero(scores > 0)
+        top = top[np.argsort(-scores[top], kind="stable")[:k]]
+        return top, scores[top]
+
+    def priority_bonus(self, query: str, column_order: Sequence[str],
+                       rows: np.ndarray) -> np.ndarray:
+        """search()'s column-priority bonus for <rows>: weight of every
+        column (earlier = heavier) whose cell contains a query word."""
+        words = query.lower().split()
+        bonus = np.zeros(len(rows), dtype=np.float64)
+        for i, col in enumerate(column_order):
+            weight = len(column_order) - i
+            if col in self and all(_WORD.fullmatch(w) for w in words):
+                hit = np.zeros(len(rows), dtype=bool)
+                for w in words:
+                    hit |= self.term_mask(col, w)[rows]
+            else:                           # not indexed / punctuation: scan the hits
+                if col not in self.df.columns:
+                    continue
+                cells = self.df[col].to_numpy()
+                hit = np.array([bool(c) and any(w in c for w in words)
+                                for c in (str(cells[r]).lower() for r in rows)], dtype=bool)
+            bonus += weight * hit
+        return bonus
+
+
+def rrf(*rankings: Sequence, k: int = RRF_K) -> Dict:
+    """Reciprocal rank fusion: {item: sum of 1 / (k + rank)} over the
+    rankings (best first)."""
+    out: Dict = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            out[item] = out.get(item, 0.0) + 1.0 / (k + rank)
+    return out
+
+
+def load_lexical(emb_dir: Path, df: pd.DataFrame, save: bool = False,
+                 same_build: bool = False) -> LexicalIndex:
+    """
+    Persisted index if it matches <df>, else a fresh build, saved over the
+    stale one when <save> is set (best-effort). same_build=True means <df> is the table embed_build
+    saved next to the index (patents.parquet), so only its row count and
+    ids are compared; otherwise every indexed cell is hashed.
+    """
+    path = Path(emb_dir) / LEXICAL_NAME
+    cols = [c for c in LEXICAL_COLS if c in df.columns]
+    if path.exists():
+        lex = LexicalIndex.load(emb_dir, df)
+        if lex is not None and (lex.row_key == _row_key(df) if same_build
+                                else lex.fingerprint == _fingerprint(df, cols)):
+            return lex
+    lex = LexicalIndex.build(df, cols)
+    if save:
+        try:
+            lex.save(emb_dir)
+        except OSError as e:              # read-only index dir: rebuilt again next start
+            print(f"⚠️ Could not save the rebuilt lexical index: {e}")
+    return lex
+    lex = LexicalIndex.build(df, cols)
+    if save:
+        try:
+            lex.save(emb_dir)
+        except OSError as e:              # read-only index dir: rebuilt again next start
+            print(f"⚠️ Could not save the rebuilt lexical index: {e}")
+    return lex
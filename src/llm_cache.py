@@ -0,0 +1,113 @@
+"""
+Opt-in persistent response cache for llm_clients.chat (SQLite).
+
+Entries are keyed by a SHA-256 over the canonical JSON of model, messages
+and generation params. Only deterministic calls (temperature == 0) are
+cached unless allow_nonzero_temperature is set; the least recently used
+entries are evicted once max_entries / max_bytes is exceeded.
+"""
+from __future__ import annotations
+import hashlib, json, sqlite3, threading, time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# params that change how a response is delivered, not what it says
+_TRANSPORT_PARAMS = {"stream"}
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    # canonical numbers: temperature=0 and temperature=0.0 share an entry
+    params = {k: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+              for k, v in params.items() if k not in _TRANSPORT_PARAMS}
+    blob = json.dumps({"model": model, "messages": messages, "params": params},
+                      sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str | Path,
+                 max_entries: int = 10_000,
+                 max_bytes: int | None = None,
+                 allow_nonzero_temperature: bool = False):
+        self.path        = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self.allow_nonzero_temperature = allow_nonzero_temperature
+        self.hits = self.misses = self.bypassed = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                              key      TEXT PRIMARY KEY,
+                              model    TEXT,
+                              response TEXT,
+                              size     INTEGER,
+                              created  REAL,
+                              accessed REAL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS by_access ON responses(accessed)")
+        self._db.commit()
+
+    def cacheable(self, params: Dict[str, Any]) -> bool:
+        # the API's default temperature is non-zero, so a missing value counts too
+        return self.allow_nonzero_temperature or params.get("temperature") == 0
+
+    def get(self, model: str, messages, params: Dict[str, Any]) -> str | None:
+        if not self.cacheable(params):
+            self.bypassed += 1
+            return None
+        key = cache_key(model, messages, params)
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key=?",
+                                   (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed=? WHERE key=?",
+                             (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, messages, params: Dict[str, Any], response: str) -> None:
+        if not self.cacheable(params):
+            return
+        key, now = cache_key(model, messages, params), time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?)",
+                (key, model, response, len(response.encode("utf-8")), now, now))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        n, = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = max(0, n - self.max_entries)
+        if excess:
+            self._db.execute("""DELETE FROM responses WHERE key IN (
+                                  SELECT key FROM responses ORDER BY accessed LIMIT ?)""",
+                             (excess,))
+        if self.max_bytes is not None:
+            size, = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+            for key, sz in self._db.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed").fetchall():
+                if size <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key=?", (key,))
+                size -= sz
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        looked_up = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed,
+                "hit_rate": self.hits / looked_up if looked_up else 0.0,
+                "entries": n, "bytes": size}
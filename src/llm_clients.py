@@ -1,23 +1,305 @@
-import requests, time
-from .config import MISTRAL_API_KEY, MISTRAL_ENDPOINT, MIXTRAL_MODEL
+import asyncio, json, random, threading, time
+from collections import deque
+from typing import Iterator
+from .tracing import count
+from .config import (MISTRAL_API_KEY, MISTRAL_ENDPOINT, MIXTRAL_MODEL,
+                     LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES,
+                     LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_ALLOW_NONZERO_TEMP)
 
 HEADERS = {
     "Authorization": f"Bearer {MISTRAL_API_KEY}",
     "Content-Type": "application/json"
 }
 
-def chat(messages, model=MIXTRAL_MODEL, **gen_params):
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class ClientMetrics:
+    """Thread-safe per-call latency / token / retry counters."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)     # seconds, successful calls
+        self.ttfts     = deque(maxlen=window)     # seconds to first streamed token
+        self.calls = self.errors = self.retries = self.rate_limited = 0
+        self.prompt_tokens = self.completion_tokens = 0
+        self.last = {}
+
+    def record(self, latency, attempts, usage=None, error=None, rate_limited=0, ttft=None):
+        usage = usage or {}
+        with self._lock:
+            self.calls        += 1
+            self.retries      += attempts - 1
+            self.rate_limited += rate_limited
+            if error is not None:
+                self.errors += 1
+            else:
+                self.latencies.append(latency)
+                self.prompt_tokens     += usage.get("prompt_tokens", 0)
+                self.completion_tokens += usage.get("completion_tokens", 0)
+            if ttft is not None:
+                self.ttfts.append(ttft)
+            self.last = {"latency": latency, "attempts": attempts, "ttft": ttft,
+                         "prompt_tokens": usage.get("prompt_tokens", 0),
+                         "completion_tokens": usage.get("completion_tokens", 0),
+                         "error": repr(error) if error is not None else None}
+        count(llm_calls=1, retries=attempts - 1, rate_limited=rate_limited,
+              llm_errors=int(error is not None),
+              prompt_tokens=usage.get("prompt_tokens", 0),
+              completion_tokens=usage.get("completion_tokens", 0))
+
+    def summary(self):
+        with self._lock:
+            lat, ttft = sorted(self.latencies), sorted(self.ttfts)
+        pct = lambda q, xs=lat: xs[min(len(xs) - 1, int(q * len(xs)))] if xs else 0.0
+        return {"calls": self.calls, "errors": self.errors, "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "p50_s": pct(0.50), "p95_s": pct(0.95), "p99_s": pct(0.99),
+                "ttft_p50_s": pct(0.50, ttft)}
+
+
+class MistralClient:
+    """
+    Pooled client for the /v1/chat/completions endpoint.
+
+    One keep-alive requests.Session is shared by all threads; at most
+    `max_concurrency` requests are in flight; a call waiting out its
+    backoff holds no slot. 429 / 5xx / timeouts are retried with
+    full-jitter exponential backoff (Retry-After is honoured as a lower
+    bound) until `max_retries` retries after the first attempt or
+    `retry_budget` seconds of sleeping are used up. achat() is not a
+    native async client: it runs the blocking chat() on a worker thread
+    (asyncio.to_thread), so each awaiting call occupies a thread of the
+    default executor.
+    """
+
+    def __init__(self,
+                 endpoint: str        = MISTRAL_ENDPOINT,
+                 headers: dict        = HEADERS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int     = LLM_MAX_RETRIES,
+                 timeout: float       = 60.0,
+                 backoff_base: float  = 1.0,
+                 backoff_cap: float   = 30.0,
+                 retry_budget: float  = 120.0,
+                 verbose: bool        = True):
+        self.endpoint     = endpoint
+        self.headers      = headers
+        self.max_retries  = max_retries
+        self.timeout      = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap  = backoff_cap
+        self.retry_budget = retry_budget
+        self.verbose      = verbose
+        self.metrics      = ClientMetrics()
+        self._pool_size   = max(1, max_concurrency)
+        self._slots       = threading.BoundedSemaphore(self._pool_size)
+        self._session     = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests                  # deferred: keeps CLI start-up fast
+                    from requests.adapters import HTTPAdapter
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+                    s.mount("https://", adapter)
+                    s.mount("http://", adapter)
+                    s.headers.update(self.headers)
+                    self._session = s
+        return self._session
+
+    def _backoff(self, attempt: int, retry_after: str | None) -> float:
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def post(self, payload: dict, stream: bool = False):
+        """POST with bounded concurrency and retries.
+        Returns (response, attempts, n_rate_limited, t_start)."""
+        out = self._request(payload, stream)
+        self._slots.release()
+        return out
+
+    def _request(self, payload: dict, stream: bool = False):
+        """Retry loop; each attempt holds a concurrency slot only while its
+        request is in flight, so backoff sleeps do not starve other calls.
+        On success the slot is still held and the caller releases it."""
+        import requests
+        slept, attempt, limited = 0.0, 0, 0
+        t0 = time.perf_counter()
+        while True:
+            attempt += 1
+            retry_after, error = None, None
+            self._slots.acquire()
+            try:
+                resp = self.session.post(self.endpoint, json=payload,
+                                         timeout=self.timeout, stream=stream)
+                if resp.status_code not in RETRY_STATUS:
+                    resp.raise_for_status()
+                    return resp, attempt, limited, t0
+                limited    += resp.status_code == 429
+                retry_after = resp.headers.get("Retry-After")
+                error = requests.HTTPError(f"{resp.status_code} from {self.endpoint}",
+                                           response=resp)
+                resp.content             # drain the short error body: the
+                resp.close()             # connection goes back to the pool
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = e
+            except requests.HTTPError as e:          # non-retryable 4xx
+                resp.close()
+                self._slots.release()
+                self.metrics.record(time.perf_counter() - t0, attempt,
+                                    error=e, rate_limited=limited)
+                raise
+            except BaseException:
+                self._slots.release()
+                raise
+            self._slots.release()
+
+            delay = self._backoff(attempt - 1, retry_after)
+            if attempt > self.max_retries or slept + delay > self.retry_budget:
+                self.metrics.record(time.perf_counter() - t0, attempt,
+                                    error=error, rate_limited=limited)
+                raise error
+            if self.verbose:
+                print(f"Retrying in {delay:.1f}s after {error}")
+            time.sleep(delay)
+            slept += delay
+
+    def chat(self, messages, model=MIXTRAL_MODEL, **gen_params) -> str:
+        """Thread-safe blocking call; returns the assistant message."""
+        payload = {"model": model, "messages": list(messages), **gen_params}
+        resp, attempts, limited, t0 = self.post(payload)
+        data = resp.json()
+        self.metrics.record(time.perf_counter() - t0, attempts,
+                            usage=data.get("usage"), rate_limited=limited)
+        return data["choices"][0]["message"]["content"]
+
+    async def achat(self, messages, model=MIXTRAL_MODEL, **gen_params) -> str:
+        """chat() on a worker thread (asyncio.to_thread), not native async I/O."""
+        return await asyncio.to_thread(self.chat, messages, model, **gen_params)
+
+    def chat_stream(self, messages, model=MIXTRAL_MODEL, **gen_params) -> Iterator[str]:
+        """
+        Yield content fragments as the server sends them (server-sent
+        events, one `data: {...}` line per delta, ending with [DONE]).
+        The concurrency slot is held until the stream is exhausted/closed.
+        """
+        payload = {"model": model, "messages": list(messages), **gen_params, "stream": True}
+        resp, attempts, limited, t0 = self._request(payload, stream=True)
+        usage, ttft = None, None
+        try:
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or usage
+                for choice in event.get("choices", []):
+                    piece = (choice.get("delta") or {}).get("content")
+                    if piece:
+                        if ttft is None:
+                            ttft = time.perf_counter() - t0
+                        yield piece
+        finally:
+            resp.close()
+            self._slots.release()
+            self.metrics.record(time.perf_counter() - t0, attempts,
+                                usage=usage, rate_limited=limited, ttft=ttft)
+
+
+_client, _client_lock = None, threading.Lock()
+
+def default_client() -> MistralClient:
+    """Process-wide shared client (one connection pool)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MistralClient()
+    return _client
+
+def set_default_client(client: MistralClient | None) -> None:
+    """Swap the shared client (e.g. for one pointed at src.mock_llm);
+    None restores a fresh default on the next call."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+_cache = None
+
+def enable_cache(path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 max_bytes=None, allow_nonzero_temperature=LLM_CACHE_ALLOW_NONZERO_TEMP):
+    """Turn on the persistent response cache (also enabled at import when
+    LLM_CACHE_PATH is set); pass path=None to turn it off again."""
+    global _cache
+    if path is None:
+        _cache = None
+        return None
+    from .llm_cache import ResponseCache
+    _cache = ResponseCache(path, max_entries, max_bytes, allow_nonzero_temperature)
+    return _cache
+
+def cache_stats():
+    """Hit-rate stats of the response cache, or None if it is disabled."""
+    return _cache.stats() if _cache is not None else None
+
+if LLM_CACHE_PATH:
+    enable_cache()
+
+def chat(messages, model=MIXTRAL_MODEL, use_cache=True, **gen_params):
     """
     messages: list[dict] → [{"role":"user", "content":"..."}]
     gen_params: temperature, max_tokens, top_p, etc.
+    use_cache: consult the response cache when enabled (deterministic
+               temperature=0 calls only, unless configured otherwise)
+    """
+    cache = _cache if use_cache else None
+    if cache is not None:
+        hit = cache.get(model, messages, gen_params)
+        if hit is not None:
+            count(llm_cache_hits=1)
+            return hit
+
+    answer = default_client().chat(messages, model, **gen_params)
+    if cache is not None:
+        cache.put(model, messages, gen_params, answer)
+    return answer
+
+async def achat(messages, model=MIXTRAL_MODEL, use_cache=True, **gen_params):
+    """chat() run on a worker thread (asyncio.to_thread) so event loops can
+    await it; not native async I/O. Same cache, shared client limits."""
+    return await asyncio.to_thread(chat, messages, model, use_cache, **gen_params)
+
+def chat_stream(messages, model=MIXTRAL_MODEL, use_cache=True, **gen_params) -> Iterator[str]:
     """
-    payload = {"model": model, "messages": messages, **gen_params}
-    while True:
-        resp = requests.post(MISTRAL_ENDPOINT, headers=HEADERS, json=payload, timeout=60)
-        if resp.status_code == 429:       # rate-limit
-            retry = int(resp.headers.get("Retry-After", "5"))
-            print(f"Rate-limited, sleeping {retry}s")
-            time.sleep(retry)
-            continue
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"]
+    Streaming chat(): yields answer fragments as they arrive. A cached
+    answer is yielded whole; a fully received answer is cached.
+    """
+    cache = _cache if use_cache else None
+    if cache is not None:
+        hit = cache.get(model, messages, gen_params)
+        if hit is not None:
+            count(llm_cache_hits=1)
+            yield hit
+            return
+
+    parts = []
+    for piece in default_client().chat_stream(messages, model, **gen_params):
+        parts.append(piece)
+        yield piece
+    if cache is not None:
+        cache.put(model, messages, gen_params, "".join(parts))
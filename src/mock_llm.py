@@ -0,0 +1,177 @@
+"""
+Local stand-in for the Mistral /v1/chat/completions endpoint.
+
+Echoes the last user message back with a `usage` block, optionally after
+a fixed latency and with injected 429 (Retry-After) / 5xx responses (at
+random, or for the first `fail_first` requests), so
+the client's pooling, limits and backoff can be exercised offline. In
+code, `responder(messages) -> str` replaces the echo (e.g. canned
+rewrite specs for the load test).
+Requests with "stream": true get the answer as server-sent events, one
+word per event:
+
+    python -m src.mock_llm --port 8765 --latency 0.2 --rate-429 0.1
+    MISTRAL_ENDPOINT=http://127.0.0.1:8765/v1/chat/completions python -m src.demo_cli
+"""
+from __future__ import annotations
+import argparse, json, random, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+PATH = "/v1/chat/completions"
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency: float = 0.0, rate_429: float = 0.0,
+                 rate_5xx: float = 0.0, retry_after: float = 0.1, seed: int | None = None,
+                 token_latency: float = 0.0, fail_first: int = 0,
+                 responder: Callable[[List[Dict]], str] | None = None):
+        super().__init__(addr, _Handler)
+        self.latency     = latency
+        self.rate_429    = rate_429
+        self.rate_5xx    = rate_5xx
+        self.retry_after = retry_after
+        self.token_latency = token_latency     # seconds between streamed words
+        self.fail_first  = fail_first          # the first N requests get a 429
+        self.responder   = responder
+        self.rng         = random.Random(seed)
+        self.lock        = threading.Lock()
+        self.counts      = {"requests": 0, "ok": 0, "429": 0, "5xx": 0}
+        self.in_flight = self.max_in_flight = 0
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):   # client closed a stream
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{PATH}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"            # keep-alive, like the real API
+
+    def log_message(self, *args):            # keep test output quiet
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict | None = None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _stream(self, model: str, answer: str, usage: dict):
+        """Server-sent events: one delta per word, then usage and [DONE]."""
+        srv: MockLLMServer = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")     # body ends when the socket closes
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: dict, finish=None, **extra):
+            body = {"id": "mock-stream", "object": "chat.completion.chunk", "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                    **extra}
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for i, word in enumerate(answer.split(" ")):
+            if srv.token_latency:
+                time.sleep(srv.token_latency)
+            event({"content": word if i == 0 else " " + word})
+        event({}, finish="stop", usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        srv: MockLLMServer = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != PATH:
+            return self._send(404, {"error": "not found"})
+
+        with srv.lock:
+            srv.counts["requests"] += 1
+            n = srv.counts["requests"]
+            roll = srv.rng.random()
+            srv.in_flight += 1
+            srv.max_in_flight = max(srv.max_in_flight, srv.in_flight)
+        try:
+            if srv.latency:
+                time.sleep(srv.latency)
+            if n <= srv.fail_first or roll < srv.rate_429:
+                with srv.lock:
+                    srv.counts["429"] += 1
+                return self._send(429, {"message": "Requests rate limit exceeded"},
+                                  {"Retry-After": str(srv.retry_after)})
+            if roll < srv.rate_429 + srv.rate_5xx:
+                with srv.lock:
+                    srv.counts["5xx"] += 1
+                return self._send(503, {"message": "Service unavailable"})
+
+            messages = payload.get("messages", [])
+            prompt   = " ".join(m.get("content", "") for m in messages)
+            last     = next((m["content"] for m in reversed(messages)
+                             if m.get("role") == "user"), "")
+            answer   = srv.responder(messages) if srv.responder else f"[mock] {last[:200]}"
+            with srv.lock:
+                srv.counts["ok"] += 1
+            usage = {"prompt_tokens": len(prompt.split()),
+                     "completion_tokens": len(answer.split()),
+                     "total_tokens": len(prompt.split()) + len(answer.split())}
+            if payload.get("stream"):
+                return self._stream(payload.get("model", "mock"), answer, usage)
+            self._send(200, {
+                "id": f"mock-{srv.counts['requests']}",
+                "object": "chat.completion",
+                "model": payload.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer}}],
+                "usage": usage,
+            })
+        finally:
+            with srv.lock:
+                srv.in_flight -= 1
+
+
+def start_mock_server(port: int = 0, **opts) -> MockLLMServer:
+    """Serve on 127.0.0.1:<port> (0 = any free port) in a daemon thread;
+    call .shutdown() when done."""
+    srv = MockLLMServer(("127.0.0.1", port), **opts)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.mock_llm", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="fraction answered with 429")
+    ap.add_argument("--rate-5xx", type=float, default=0.0, help="fraction answered with 503")
+    ap.add_argument("--retry-after", type=float, default=0.1)
+    ap.add_argument("--token-latency", type=float, default=0.0,
+                    help="seconds between streamed words (stream=true requests)")
+    args = ap.parse_args()
+
+    srv = MockLLMServer(("127.0.0.1", args.port), latency=args.latency,
+                        rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+                        retry_after=args.retry_after, token_latency=args.token_latency)
+    print(f"🧪 Mock LLM listening on {srv.url}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
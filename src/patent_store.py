@@ -0,0 +1,120 @@
+"""
+O(1) publication-number → row lookups over the patent table.
+
+Keys are normalised once at load time (see normalise_pid), so "3739829",
+3739829, "EP 3739829 B1" and "EP03739829" all resolve to the same row.
+Lookups return only the requested columns, read from per-column arrays,
+instead of re-casting and scanning the whole DataFrame per query.
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+KEY_COL = "publication_number"
+
+_DOC_NUM = re.compile(r"^([A-Z]{2})?0*(\d+)(?:[A-Z]\d?)?$")
+_MULTI  = re.compile(r"[;,]")
+
+
+def normalise_pid(pid: Any) -> str:
+    """Canonical key: spaces, kind code and leading zeros are dropped from
+    patent numbers and the EP prefix too (the corpus is EP), so other
+    offices keep theirs ("WO 03097642 A1" → "WO3097642"); anything else is
+    upper-cased as is."""
+    if isinstance(pid, (int, np.integer)):
+        return str(int(pid))
+    if isinstance(pid, (float, np.floating)):
+        return str(int(pid)) if float(pid).is_integer() else str(pid)
+    key = re.sub(r"\s+", "", str(pid)).upper()
+    m = _DOC_NUM.match(key)
+    if not m:
+        return key
+    office, number = m.groups()
+    return number if office in (None, "EP") else office + number
+
+
+class PatentStore:
+    """
+    Read-only view of <df> keyed by publication number.
+
+    row(pid, cols) / rows(pids, cols) return dicts of just <cols> (None for
+    unknown ids); frame(pids) returns the matching DataFrame rows in order.
+    Secondary keys (e.g. parent_publication_number, whose cells may list
+    several ids separated by ";") are indexed on first use by positions_by.
+    """
+
+    def __init__(self, df: pd.DataFrame, key_col: str = KEY_COL):
+        self.df      = df
+        self.key_col = key_col
+        self._pos: Dict[str, int] = {}
+        for i, pid in enumerate(df[key_col].tolist()):
+            self._pos.setdefault(normalise_pid(pid), i)   # first row wins, like .iloc[0]
+        self._cols: Dict[str, np.ndarray] = {}
+        self._by:   Dict[str, Dict[str, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def __contains__(self, pid: Any) -> bool:
+        return normalise_pid(pid) in self._pos
+
+    # ---- positions -------------------------------------------------------
+    def position(self, pid: Any) -> int | None:
+        return self._pos.get(normalise_pid(pid))
+
+    def positions(self, pids: Iterable[Any]) -> List[int | None]:
+        get = self._pos.get
+        return [get(normalise_pid(p)) for p in pids]
+
+    def positions_by(self, col: str, pid: Any) -> List[int]:
+        """Rows whose <col> lists <pid> (multi-valued cells split on ; or ,)."""
+        index = self._by.get(col)
+        if index is None:
+            index = {}
+            for i, cell in enumerate(self.df[col].tolist()):
+                if cell is None or (isinstance(cell, float) and np.isnan(cell)):
+                    continue
+                for part in _MULTI.split(str(cell)):
+                    if part.strip():
+                        index.setdefault(normalise_pid(part), []).append(i)
+            self._by[col] = index
+        return list(index.get(normalise_pid(pid), []))
+
+    # ---- projected rows --------------------------------------------------
+    def _column(self, col: str) -> np.ndarray | None:
+        arr = self._cols.get(col)
+        if arr is None and col in self.df.columns:
+            arr = self._cols[col] = self.df[col].to_numpy()
+        return arr
+
+    def _project(self, pos: int, cols: Sequence[str]) -> Dict[str, Any]:
+        out = {}
+        for c in cols:
+            arr = self._column(c)
+            out[c] = arr[pos] if arr is not None else None
+        return out
+
+    def row(self, pid: Any, cols: Sequence[str] | None = None) -> Dict[str, Any] | None:
+        pos = self.position(pid)
+        if pos is None:
+            return None
+        return self._project(pos, cols or list(self.df.columns))
+
+    def rows(self, pids: Iterable[Any],
+             cols: Sequence[str] | None = None) -> List[Dict[str, Any] | None]:
+        return self.rows_at(self.positions(pids), cols)
+
+    def rows_at(self, positions: Iterable[int | None],
+                cols: Sequence[str] | None = None) -> List[Dict[str, Any] | None]:
+        """Projected rows by DataFrame position (None passes through)."""
+        cols = cols or list(self.df.columns)
+        return [None if p is None else self._project(p, cols) for p in positions]
+
+    def frame(self, pids: Iterable[Any], cols: Sequence[str] | None = None) -> pd.DataFrame:
+        """DataFrame of the known ids among <pids> (unknown ids skipped)."""
+        pos = [p for p in self.positions(pids) if p is not None]
+        sub = self.df.iloc[pos]
+        return sub[list(cols)] if cols else sub
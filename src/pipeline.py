@@ -1,23 +1,36 @@
 # src/pipeline.py
 
-import re
+import re, time
 from collections import deque
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
+import numpy as np
 import pandas as pd
 
-from .query_rewrite    import rewrite
+from .query_router     import QueryRouter, default_router
 from .retrieval        import PassageRetriever
-from .filter_ops       import apply_filter
-from .stats_engine     import top_k_group, group_by_year
-from .summarise        import map_reduce_summarise
-from .llm_clients      import chat
-from .token_utils      import count_tokens
+from .filter_ops       import FilterEngine
+from .summarise        import summarise_context
+from .llm_clients      import chat, chat_stream
+from .token_utils      import count_tokens_batch
+from .tracing          import NullTracer, Tracer, count, default_tracer, isolated, span, traced
 
 MAX_CTX_TOKENS  = 60_000
 PROMPT_OVERHEAD = 2_000
 
 
+def force_sdg_filter(user_msg: str, filters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Put an sdg_number == N filter first when the message names "SDG N"
+    and no SDG filter is set yet (in place; also returned)."""
+    m_sdg = re.search(r"\bsdg\s*(\d+)\b", user_msg, re.I)
+    if m_sdg:
+        sdg_val = int(m_sdg.group(1))
+        f_sdg = {"column":"sdg_number","op":"eq","value":sdg_val}
+        if not any(f["column"]=="sdg_number" for f in filters):
+            filters.insert(0, f_sdg)
+    return filters
+
+
 class RAGPipeline:
     """Conversation-level orchestrator with special-case branches,
     aggregation, and multi-stage passage-RAG fallbacks."""
@@ -25,11 +38,23 @@ class RAGPipeline:
     def __init__(self,
                  retriever: PassageRetriever,
                  max_history: int = 5,
-                 debug: bool     = False):
+                 debug: bool     = False,
+                 router: QueryRouter | None = None,
+                 tracer: Tracer | NullTracer | None = None):
         self.retriever        = retriever
+        self.router           = router or default_router()
+        self.tracer           = tracer or default_tracer()
+        self.patents          = retriever.patents
+        self.graph            = retriever.graph
+        self.facets           = retriever.facets
         self.chat_history     = deque(maxlen=max_history * 2)
         self.debug            = debug
         self._last_ctx_tokens = 0
+        self._t_ask           = 0.0
+        # which branch answered the last turn ("innovate", "whats_new",
+        # "inventor_view", "claims", "citations", "family", "filed_by_year",
+        # "latest", "aggregation", "passages"); None before the first turn
+        self.last_branch      = None
         # for “this category” and multi-turn context
         self._last_filters     = []
         self._last_aggregation = None
@@ -40,16 +65,117 @@ class RAGPipeline:
         """Return the subset of df passing all filters."""
         if not filters:
             return df
-        mask = []
-        for _, row in df.iterrows():
-            ok = True
-            for f in filters:
-                ok &= apply_filter(row.get(f["column"], ""), f["op"], f["value"])
-            mask.append(ok)
-        return df.loc[mask]
+        engine = self.retriever.filters if df is self.retriever.df else FilterEngine(df)
+        return engine.filter(filters)
     
 
+    def _filter_mask(self, filters: List[Dict[str, Any]]) -> np.ndarray:
+        """Row mask over retriever.df for <filters> (all rows if none)."""
+        return self.retriever.filters.mask(filters)
+
+    def _llm(self, messages, stream: bool, **params):
+        """Yield the answer of one chat call (fragment by fragment when
+        streaming); the generator's return value is the full answer."""
+        if not stream:
+            with span("llm"):
+                answer = chat(messages, **params)
+            yield answer
+            return answer
+        parts = []
+        with span("llm"):                     # includes the time the reader takes
+            for piece in chat_stream(messages, **params):
+                if not parts and self.debug:
+                    print(f"[debug] first token after "
+                          f"{(time.perf_counter() - self._t_ask) * 1e3:.0f} ms")
+                parts.append(piece)
+                yield piece
+        return "".join(parts)
+
+    @traced("fit_context")
+    def fit_context(self, passages: List[Dict[str, Any]]):
+        """Dedupe by patent and keep passages in rank order until the token
+        budget is full; returns (passages, their token counts, total)."""
+        # counts stored at build time; only chunks without one are tokenised
+        # (as one batch)
+        missing = [p["text"] for p in passages if p.get("n_tokens") is None]
+        counted = iter(count_tokens_batch(missing))
+        seen, ctx, ctx_tok, tok = set(), [], [], 0
+        budget = MAX_CTX_TOKENS - PROMPT_OVERHEAD
+        for p in passages:
+            t = p.get("n_tokens")
+            if t is None:
+                t = next(counted)
+            pid = p["publication_number"]
+            if pid in seen:
+                continue
+            if tok + t > budget:
+                break
+            seen.add(pid)
+            ctx.append(p)
+            ctx_tok.append(t)
+            tok += t
+        count("fit_context", chunks_in=len(passages), chunks_kept=len(ctx),
+              tokenised=len(missing), ctx_tokens=tok)
+        if self.debug:
+            print(f"[debug] picked {len(ctx)} chunks, {tok} tokens")
+        return ctx, ctx_tok, tok
+
+    def answer_messages(self, user_msg: str, rq: str,
+                        passages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Chat messages answering <user_msg> from retrieved <passages>:
+        budget fit, summarised context and the citation whitelist."""
+        ctx, ctx_tok, _ = self.fit_context(passages)
+        raw_ctx = [
+            f"[{p['publication_number']}] \"{p['title']}\" || {p['text']}"
+            for p in ctx
+        ]
+        # token counts from the budget loop are reused, not recounted
+        context, self._last_ctx_tokens = summarise_context(rq, raw_ctx, body_tokens=ctx_tok)
+
+        include_app = "applicant" in user_msg.lower() or "country" in user_msg.lower()
+        allowed     = ", ".join(p["publication_number"] for p in ctx) or "NONE"
+        fields      = ["publication_number", "title_en", "publication_date"]
+        if include_app:
+            fields.append("applicant_countries")
+
+        system_prompt = (
+            f"You may cite ONLY these publication numbers: {allowed}. "
+            "If none answer, reply: 'I don’t have enough information.'\n"
+            "Format bullets as: (" + ", ".join(fields) + ") — short note."
+        )
+        return (
+            [{"role":"system","content":system_prompt}] +
+            list(self.chat_history) +
+            [{"role":"user","content":f"QUESTION: {user_msg}\n\nCONTEXT:\n{context}"}]
+        )
+
     def ask(self, user_msg: str) -> str:
+        """Answer one turn; the full answer as a single string."""
+        return "".join(self._ask_iter(user_msg, stream=False))
+
+    def ask_stream(self, user_msg: str) -> Iterator[str]:
+        """Answer one turn as it is generated: yields text fragments (LLM
+        answers token by token, direct lookups in one piece). chat_history
+        is updated once the answer is complete."""
+        return self._ask_iter(user_msg, stream=True)
+
+    def _ask_iter(self, user_msg: str, stream: bool) -> Iterator[str]:
+        """One traced turn (see tracing) in a context of its own, so the
+        turn does not leak into the consumer's context between fragments."""
+        return isolated(self._traced_iter(user_msg, stream))
+
+    def _traced_iter(self, user_msg: str, stream: bool) -> Iterator[str]:
+        """The branch is recorded at the end of the turn."""
+        with self.tracer.turn(user_msg) as trace:
+            try:
+                yield from self._answer_iter(user_msg, stream)
+            finally:
+                trace.set(branch=self.last_branch)
+
+    def _answer_iter(self, user_msg: str, stream: bool) -> Iterator[str]:
+        self._t_ask = time.perf_counter()
+        self.last_branch = None
+        self.router.turn()
 
         # ─── 0. Innovate-on-patent branch ────────────────────────────────
         m_imp = re.search(
@@ -57,16 +183,18 @@ class RAGPipeline:
             user_msg, re.I
         )
         if m_imp:
+            self.last_branch = "innovate"
             patent_id = m_imp.group(2)
-            df = self.retriever.df
-            row = df[df["publication_number"].astype(str) == patent_id]
-            if row.empty:
-                return f"Sorry, I don’t have patent {patent_id}."
+            row = self.patents.row(patent_id, ["title_en", "abstract_text",
+                                               "claims", "analysis_explanation"])
+            if row is None:
+                yield f"Sorry, I don’t have patent {patent_id}."
+                return
             # extract context fields
-            title    = row.iloc[0]["title_en"] or ""
-            abstract = row.iloc[0]["abstract_text"] or ""
-            claims   = row.iloc[0]["claims"] or ""
-            analysis = row.iloc[0]["analysis_explanation"] or ""
+            title    = row["title_en"] or ""
+            abstract = row["abstract_text"] or ""
+            claims   = row["claims"] or ""
+            analysis = row["analysis_explanation"] or ""
             # build brainstorming prompt
             system = {
                 "role": "system",
@@ -86,42 +214,25 @@ class RAGPipeline:
                     "Please brainstorm improvements or new applications."
                 )
             }
-            answer = chat([system, user_ctx], temperature=0.7, max_tokens=512)
+            answer = yield from self._llm([system, user_ctx], stream,
+                                          temperature=0.7, max_tokens=512)
             self.chat_history.extend([
                 {"role": "user",      "content": user_msg},
                 {"role": "assistant", "content": answer},
             ])
-            return answer
+            return
+
 
-        
-        # ─── 0. Inherit “this category” filters if referenced
+        # ─── Inherit “this category” filters if referenced. Branches A–E
+        #     answer without the rewrite, so the context they leave for the
+        #     next turn is set here; step 2 below refines it.
         if "this category" in user_msg.lower():
             filters     = list(self._last_filters)
             aggregation = self._last_aggregation
         else:
             filters     = []
             aggregation = None
-
-        # ─── 1. Rewrite NL → structured spec (once per turn)
-        rw = rewrite(list(self.chat_history), user_msg)
-        rq           = rw.get("rewritten_query", user_msg)
-        # merge inherited + new filters
-        for f in rw.get("filters", []):
-            if f not in filters:
-                filters.append(f)
-        col_priority  = rw.get("column_priority", [])
-        aggregation   = aggregation or rw.get("aggregation")
-
-        # ─── 2. Force SDG-N filter if mentioned
-        m_sdg = re.search(r"\bsdg\s*(\d+)\b", user_msg, re.I)
-        if m_sdg:
-            sdg_val = int(m_sdg.group(1))
-            f_sdg = {"column":"sdg_number","op":"eq","value":sdg_val}
-            if not any(f["column"]=="sdg_number" for f in filters):
-                filters.insert(0, f_sdg)
-
-        # persist for multi-turn
-        self._last_filters     = list(filters)
+        self._last_filters     = force_sdg_filter(user_msg, list(filters))
         self._last_aggregation = aggregation
 
         # ─── A. Metadata+“what’s new” branch
@@ -136,14 +247,15 @@ class RAGPipeline:
             )
             pid_m = re.search(r"\((\d+)\)", last) if last else None
             if pid_m:
+                self.last_branch = "whats_new"
                 pid = pid_m.group(1)
-                df  = self.retriever.df
-                row = df[df["publication_number"].astype(str)==pid]
-                if not row.empty:
-                    inv = row.iloc[0].get("inventor_names") or "not provided"
-                    app = row.iloc[0].get("applicant_names") or "not provided"
-                    new = (row.iloc[0].get("analysis_explanation")
-                           or row.iloc[0].get("abstract_text")
+                row = self.patents.row(pid, ["inventor_names", "applicant_names",
+                                             "analysis_explanation", "abstract_text"])
+                if row is not None:
+                    inv = row["inventor_names"] or "not provided"
+                    app = row["applicant_names"] or "not provided"
+                    new = (row["analysis_explanation"]
+                           or row["abstract_text"]
                            or "not provided")
                     answer = (
                         f"({pid}) Inventor(s): {inv}; Applicant(s): {app}.\n"
@@ -155,7 +267,8 @@ class RAGPipeline:
                     {"role":"user",      "content":user_msg},
                     {"role":"assistant", "content":answer},
                 ])
-                return answer
+                yield answer
+                return
 
         # ─── B. Inventor-perspective branch
         if re.search(r"\binventor\b", user_msg, re.I) and "this patent" in user_msg.lower():
@@ -166,11 +279,11 @@ class RAGPipeline:
             )
             pid_m = re.search(r"\((\d+)\)", last) if last else None
             if pid_m:
+                self.last_branch = "inventor_view"
                 pid = pid_m.group(1)
-                df  = self.retriever.df
-                row = df[df["publication_number"].astype(str)==pid]
-                if not row.empty and pd.notna(row.iloc[0].get("analysis_explanation")):
-                    expl = row.iloc[0]["analysis_explanation"]
+                row = self.patents.row(pid, ["analysis_explanation"])
+                if row is not None and pd.notna(row["analysis_explanation"]):
+                    expl = row["analysis_explanation"]
                     answer = f"({pid}) according to the inventor: {expl}"
                 else:
                     answer = "I don’t have enough information from the inventor’s explanation."
@@ -178,88 +291,132 @@ class RAGPipeline:
                     {"role":"user",      "content":user_msg},
                     {"role":"assistant", "content":answer},
                 ])
-                return answer
+                yield answer
+                return
 
         # ─── C. Summarise independent claims
         m_claim = re.search(r"claims (?:of|for)\s+([A-Z0-9]+)", user_msg, re.I)
         if m_claim:
+            self.last_branch = "claims"
             pid = m_claim.group(1)
-            df  = self.retriever.df
-            row = df[df["publication_number"].astype(str)==pid]
-            if row.empty or not row.iloc[0].get("claims"):
-                return "I don’t have enough information to summarize the claims."
-            claims = row.iloc[0]["claims"]
+            row = self.patents.row(pid, ["claims"])
+            if row is None or not row["claims"]:
+                yield "I don’t have enough information to summarize the claims."
+                return
+            claims = row["claims"]
             prompt = [
                 {"role":"system", "content":"Summarise these patent claims in plain English."},
                 {"role":"user",   "content":claims},
             ]
-            ans = chat(prompt, temperature=0.0, max_tokens=512)
+            ans = yield from self._llm(prompt, stream, temperature=0.0, max_tokens=512)
             self.chat_history.extend([
                 {"role":"user",      "content":user_msg},
                 {"role":"assistant", "content":ans},
             ])
-            return ans
-
-        # ─── D. Prior-art lookup
-        m_prior = re.search(r"(?:prior[- ]art|cited by)\s+([A-Z0-9]+)", user_msg, re.I)
-        if m_prior:
-            pid = m_prior.group(1)
-            df  = self.retriever.df
-            row = df[df["publication_number"].astype(str)==pid]
-            if row.empty or not row.iloc[0].get("prior_art"):
-                return "I don’t have enough information on prior art."
-            arts = [a.strip() for a in re.split(r"[;,]", row.iloc[0]["prior_art"]) if a.strip()]
+            return
+
+        # ─── D. Citation lookups on the precomputed graph (“N hops” walks further)
+        m_citing = re.search(r"(?:patents?\s+citing|who\s+cites|citations\s+(?:of|to))\s+([A-Z0-9]+)",
+                             user_msg, re.I)
+        m_prior  = re.search(r"(?:prior[- ]art|cited by)\s+([A-Z0-9]+)", user_msg, re.I)
+        if m_citing or m_prior:
+            self.last_branch = "citations"
+            pid    = (m_citing or m_prior).group(1)
+            m_hops = re.search(r"\b(\d)[- ]?hops?\b", user_msg, re.I)
+            hops   = int(m_hops.group(1)) if m_hops else 1
+            if m_citing:
+                refs = self.graph.cited_by(pid, hops)
+                if not refs:
+                    yield "I don’t have enough information on citing patents."
+                    return
+            else:
+                refs = self.graph.cites(pid, hops) if pid in self.patents else []
+                if not refs:
+                    yield "I don’t have enough information on prior art."
+                    return
+            dist = self.graph.traverse(pid, ("cited_by",) if m_citing else ("cites",), hops)
             bullets = []
-            for a in arts:
-                match = df[df["publication_number"].astype(str)==a]
-                title = f"“{match.iloc[0]['title_en']}”" if not match.empty else ""
-                bullets.append(f"• ({a}) {title}")
+            # one batched lookup for all cited / citing patents
+            for r, match in zip(refs, self.patents.rows([r["key"] for r in refs], ["title_en"])):
+                title = f"“{match['title_en']}”" if match is not None else ""
+                hop   = f" [{dist[r['node']]} hops]" if dist[r["node"]] > 1 else ""
+                bullets.append(f"• ({r['label']}) {title}{hop}".rstrip())
             ans = "\n".join(bullets)
             self.chat_history.extend([
                 {"role":"user",      "content":user_msg},
                 {"role":"assistant", "content":ans},
             ])
-            return ans
+            yield ans
+            return
 
-        # ─── E. Family / parent lookup
+        # ─── E. Family / parent lookup (parents, children and siblings)
         if re.search(r"\b(?:family|parent)\b", user_msg, re.I):
-            pid_match = re.search(r"([A-Z0-9]+)", user_msg)
+            pid_match = re.search(r"\b(\d{4,})\b", user_msg) or re.search(r"([A-Z0-9]+)", user_msg)
             if pid_match:
+                self.last_branch = "family"
                 pid = pid_match.group(1)
-                df  = self.retriever.df
-                fam = df[
-                    (df["parent_publication_number"].astype(str)==pid) |
-                    (df["publication_number"].astype(str)==pid)
-                ]
+                rel = self.graph.family(pid)
+                pos = {r["row"] for r in rel if r["row"] is not None}
+                own = self.patents.position(pid)
+                if own is not None:
+                    pos.add(own)
+                fam = self.retriever.df.iloc[sorted(pos)][
+                    ["publication_number", "title_en", "publication_date"]]
                 if fam.empty:
-                    return "I don’t have enough information on this patent family."
+                    yield "I don’t have enough information on this patent family."
+                    return
                 bullets = [
                     f"• ({r['publication_number']}) {r['title_en']} — filed {r['publication_date']}"
                     for _, r in fam.iterrows()
                 ]
+                bullets += [f"• ({r['label']}) — not in this collection"
+                            for r in rel if r["row"] is None]
                 ans = "\n".join(bullets)
                 self.chat_history.extend([
                     {"role":"user",      "content":user_msg},
                     {"role":"assistant", "content":ans},
                 ])
-                return ans
+                yield ans
+                return
+
+        # ─── 1. Rewrite NL → structured spec (rules first, LLM if needed);
+        #        branches 0 and A–E above never read it
+        with span("rewrite"):
+            rw = self.router.spec(list(self.chat_history), user_msg)
+        rq           = rw.get("rewritten_query", user_msg)
+        # merge inherited + new filters
+        for f in rw.get("filters", []):
+            if f not in filters:
+                filters.append(f)
+        col_priority  = rw.get("column_priority", [])
+        aggregation   = aggregation or rw.get("aggregation")
+
+        # ─── 2. Force SDG-N filter if mentioned
+        force_sdg_filter(user_msg, filters)
+
+        # persist for multi-turn
+        self._last_filters     = list(filters)
+        self._last_aggregation = aggregation
 
         # ─── F. “How … filed” → year-by-year counts
         if re.search(r"\bhow\b.*\bfiled\b", user_msg, re.I):
-            df_sub = self._filter_df(self.retriever.df, filters)
-            freqs  = group_by_year(df_sub, "publication_date")
+            self.last_branch = "filed_by_year"
+            freqs = self.facets.year_counts(self._filter_mask(filters))
             if not freqs:
-                return "I don’t have enough information in the provided patents."
+                yield "I don’t have enough information in the provided patents."
+                return
             bullets = [f"• {yr}: {cnt} patents" for yr, cnt in freqs.items()]
             ans = "\n".join(bullets)
             self.chat_history.extend([
                 {"role":"user",      "content":user_msg},
                 {"role":"assistant", "content":ans},
             ])
-            return ans
+            yield ans
+            return
 
         # ─── G. “Latest/Recent” inventions → date-sorted list
         if re.search(r"\b(latest|recent)\b", user_msg, re.I):
+            self.last_branch = "latest"
             from datetime import datetime
             def ordn(n:int)->str:
                 if 10 <= (n%100) <= 20: s="th"
@@ -285,36 +442,34 @@ class RAGPipeline:
                 {"role":"user",      "content":user_msg},
                 {"role":"assistant", "content":ans},
             ])
-            return ans
+            yield ans
+            return
 
         # ─── H. Aggregation branch (guarded against empty dict)
         if aggregation and isinstance(aggregation, dict) and aggregation.get("group_by"):
-            df_sub = self._filter_df(self.retriever.df, filters)
+            self.last_branch = "aggregation"
+            mask   = self._filter_mask(filters)
             grp    = aggregation.get("group_by", "ipc_technologies")
             top_k  = aggregation.get("top_k", 10)
 
+            # counts and exemplars come from the pre-exploded facet postings
             if grp == "publication_date" or "each year" in user_msg.lower():
-                freqs, is_year = group_by_year(df_sub, "publication_date"), True
+                freqs, is_year = self.facets.year_counts(mask), True
+            elif grp in self.retriever.df.columns:
+                freqs, is_year = self.facets.top_k(grp, top_k, mask), False
             else:
-                freqs, is_year = top_k_group(df_sub, grp, top_k), False
+                freqs = {}
 
             if not freqs:
-                return "I don’t have enough information in the provided patents."
+                yield "I don’t have enough information in the provided patents."
+                return
 
             exemplars = {}
-            for key in freqs:
-                if is_year:
-                    yrs  = pd.to_datetime(df_sub["publication_date"], errors="coerce").dt.year
-                    mask = yrs == int(key)
-                else:
-                    col_ser = df_sub[grp]
-                    if pd.api.types.is_string_dtype(col_ser):
-                        mask = col_ser.fillna("").astype(str) \
-                                     .str.contains(str(key), case=False, na=False)
-                    else:
-                        mask = col_ser == key
-                if mask.any():
-                    r = df_sub.loc[mask].iloc[0]
+            pos = {key: (self.facets.year_exemplar(key, mask) if is_year
+                         else self.facets.exemplar(grp, key, mask)) for key in freqs}
+            for key, r in zip(pos, self.patents.rows_at(pos.values(),
+                                                        ["publication_number", "title_en"])):
+                if r is not None:
                     exemplars[key] = (str(r["publication_number"]), r["title_en"])
 
             lower = user_msg.lower()
@@ -334,73 +489,33 @@ class RAGPipeline:
                 {"role":"user",      "content":user_msg},
                 {"role":"assistant", "content":ans},
             ])
-            return ans
-
-        # ─── I. Passage-RAG with multi-stage fallback
-        def try_search(filt, cols):
-            return self.retriever.search(
+            yield ans
+            return
+
+        # ─── I. Passage-RAG with multi-stage fallback: one encoded query and
+        #        one unfiltered candidate pool; only selective filters cost
+        #        the filtered tier a search of its own
+        self.last_branch = "passages"
+        with span("search"):
+            tiers = self.retriever.search_tiers(
                 rq,
+                filters        = filters,
+                column_order   = col_priority,
                 max_passages   = 400,
-                filters        = filt,
-                column_order   = cols,
                 top_k_return   = 60,
             )
-
-        passages = try_search(filters, col_priority)
-        if not passages and self.debug:
-            print("⚠️ No hits with initial filters+priority → relaxing")
-        if not passages:
-            passages = try_search([], col_priority)
-        if not passages and self.debug:
-            print("⚠️ No hits with priority only → pure semantic")
-        if not passages:
-            passages = try_search([], [])
+        tier, passages = next(((t, p) for t, p in tiers.items() if p), (None, []))
+        count("search", passages=len(passages), relaxed=int(tier != "filtered"))
+        if self.debug and tier != "filtered":
+            print(f"⚠️ No hits with initial filters+priority → relaxed to {tier or 'nothing'}")
         if not passages:
-            return "I don’t have enough information in the provided patents."
-
-        # dedupe + token-budget fit
-        seen, ctx, tok = set(), [], 0
-        budget = MAX_CTX_TOKENS - PROMPT_OVERHEAD
-        for p in passages:
-            pid = p["publication_number"]
-            if pid in seen:
-                continue
-            t = count_tokens(p["text"])
-            if tok + t > budget:
-                break
-            seen.add(pid)
-            ctx.append(p)
-            tok += t
-        if self.debug:
-            print(f"[debug] picked {len(ctx)} chunks, {tok} tokens")
+            yield "I don’t have enough information in the provided patents."
+            return
 
-        raw_ctx = [
-            f"[{p['publication_number']}] \"{p['title']}\" || {p['text']}"
-            for p in ctx
-        ]
-        context = map_reduce_summarise(rq, raw_ctx)
-        self._last_ctx_tokens = count_tokens(context)
-
-        include_app = "applicant" in user_msg.lower() or "country" in user_msg.lower()
-        allowed     = ", ".join(p["publication_number"] for p in ctx) or "NONE"
-        fields      = ["publication_number", "title_en", "publication_date"]
-        if include_app:
-            fields.append("applicant_countries")
-
-        system_prompt = (
-            f"You may cite ONLY these publication numbers: {allowed}. "
-            "If none answer, reply: 'I don’t have enough information.'\n"
-            "Format bullets as: (" + ", ".join(fields) + ") — short note."
-        )
-        messages = (
-            [{"role":"system","content":system_prompt}] +
-            list(self.chat_history) +
-            [{"role":"user","content":f"QUESTION: {user_msg}\n\nCONTEXT:\n{context}"}]
-        )
-        final_ans = chat(messages, temperature=0.0, max_tokens=512)
+        messages = self.answer_messages(user_msg, rq, passages)
+        final_ans = yield from self._llm(messages, stream, temperature=0.0, max_tokens=512)
 
         self.chat_history.extend([
             {"role":"user",      "content":user_msg},
             {"role":"assistant", "content":final_ans},
         ])
-        return final_ans
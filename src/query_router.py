@@ -0,0 +1,204 @@
+"""
+Decides per turn whether the LLM query rewrite is needed.
+
+The direct-lookup branches (innovate, inventor / applicant, claims,
+citations, family) never read the rewritten spec, so the pipeline checks
+them before asking for one. For everything else parse_rules tries to
+fill the same spec as query_rewrite.rewrite from SDG numbers, date
+ranges, publication kinds and countries; only questions the rules cannot
+fully account for (aggregations, negations, references to earlier turns,
+no structured constraint at all) go to the LLM.
+
+    router = default_router()
+    spec   = router.spec(chat_history, "SDG 7 patents filed after 2021")
+    router.stats()   # {"turns", "no_rewrite", "rules", "llm", "llm_avoided"}
+"""
+from __future__ import annotations
+import re, threading
+from typing import Callable, Dict, List, Tuple
+
+from .query_rewrite import rewrite
+from .tracing import count
+
+DATE_COL = "publication_date"
+
+# spellings → ISO codes as stored in applicant_countries / inventor_countries
+COUNTRIES = {
+    "united states": "US", "usa": "US", "u.s.": "US", "japan": "JP",
+    "china": "CN", "korea": "KR", "south korea": "KR", "germany": "DE",
+    "france": "FR", "italy": "IT", "switzerland": "CH",
+    "united kingdom": "GB", "uk": "GB", "britain": "GB", "sweden": "SE",
+    "netherlands": "NL", "spain": "ES", "canada": "CA", "india": "IN",
+    "israel": "IL", "denmark": "DK", "finland": "FI", "austria": "AT",
+    "belgium": "BE", "taiwan": "TW", "australia": "AU",
+}
+# adjectives also describe topics ("Swiss cheese", "German measles"), so a
+# question using one goes to the LLM
+COUNTRY_ADJECTIVES = (
+    "american", "japanese", "chinese", "korean", "german", "french", "italian",
+    "swiss", "british", "swedish", "dutch", "spanish", "canadian", "indian",
+    "israeli", "danish", "finnish", "austrian", "belgian", "taiwanese", "australian",
+)
+
+_YEAR = r"((?:19|20)\d{2})"
+_DATE_RULES: List[Tuple[re.Pattern, Callable]] = [
+    (re.compile(rf"\bbetween\s+{_YEAR}\s+and\s+{_YEAR}\b", re.I),
+     lambda a, b: [("between", [f"{a}-01-01", f"{b}-12-31"])]),
+    (re.compile(rf"\bfrom\s+{_YEAR}\s+(?:to|until|through)\s+{_YEAR}\b", re.I),
+     lambda a, b: [("between", [f"{a}-01-01", f"{b}-12-31"])]),
+    (re.compile(rf"\b{_YEAR}\s*[-–]\s*{_YEAR}\b"),
+     lambda a, b: [("between", [f"{a}-01-01", f"{b}-12-31"])]),
+    (re.compile(rf"\bafter\s+{_YEAR}\b", re.I),
+     lambda a: [("gte", f"{int(a) + 1}-01-01")]),
+    (re.compile(rf"\b(?:since|from|starting(?:\s+in)?)\s+{_YEAR}\b", re.I),
+     lambda a: [("gte", f"{a}-01-01")]),
+    (re.compile(rf"\bbefore\s+{_YEAR}\b", re.I),
+     lambda a: [("lte", f"{int(a) - 1}-12-31")]),
+    (re.compile(rf"\b(?:until|through|up\s+to)\s+{_YEAR}\b", re.I),
+     lambda a: [("lte", f"{a}-12-31")]),
+    (re.compile(rf"\b(?:in|during)\s+{_YEAR}\b", re.I),
+     lambda a: [("between", [f"{a}-01-01", f"{a}-12-31"])]),
+]
+_SDG    = re.compile(r"\bsdg\s*(\d{1,2})\b", re.I)
+_SDG_LIST = re.compile(r"\bsdgs?\s*\d{1,2}\s*(?:,|/|&|\bor\b|\band\b)\s*\d", re.I)
+_KIND   = re.compile(r"\bkind(?:\s+code)?\s+([AB][1-9])\b", re.I)
+_GRANTED = re.compile(r"\bgranted\b", re.I)
+# lookarounds, not \b: "u.s." ends in a non-word character
+_COUNTRY = re.compile(r"(?<!\w)(" + "|".join(sorted(map(re.escape, COUNTRIES), key=len, reverse=True))
+                      + r")(?!\w)", re.I)
+_ADJECTIVE = re.compile(r"\b(?:" + "|".join(COUNTRY_ADJECTIVES) + r")\b", re.I)
+_INVENTOR = re.compile(r"\binventors?\b", re.I)
+# "how … filed" is answered by per-year counts (pipeline branch F), which
+# only need the filters
+_HOW_FILED = re.compile(r"\bhow\b.*\bfiled\b", re.I)
+_HOW_WORDS = re.compile(r"\bhow(?:\s+many)?\b|\b(?:each|per)\s+year\b|\b(?:were|was|have|been)\b", re.I)
+
+# questions the rules cannot express: aggregations, negations, references
+# to earlier turns, comparisons
+_NEEDS_LLM = re.compile(
+    r"\b(?:top|most|least|count|how\s+many|number\s+of|each|per|group(?:ed)?|"
+    r"distribution|breakdown|trend|compare|versus|vs|not|without|except|excluding|"
+    r"this|that|these|those|it|its|they|them|same|above|previous|"
+    r"technolog\w*|fields?|categor\w*|applicants?|assignees?|inventors?|who|why|explain)\b", re.I)
+_FILLER = re.compile(
+    r"\b(?:show|list|give|find|get|me|us|all|any|some|the|a|an|of|for|on|about|"
+    r"related|relating|to|regarding|concerning|with|and|or|please|patents?|"
+    r"filings?|inventions?|documents?|publications?|filed|published|issued|"
+    r"granted|from|by|in|which|what|are|is|there|kind|code|country|countries)\b", re.I)
+
+
+def parse_rules(user_msg: str) -> Dict | None:
+    """The rewrite spec for <user_msg> if the rules account for all of its
+    constraints, else None (ask the LLM)."""
+    text, filters, columns = user_msg, [], []
+
+    def take(m):
+        nonlocal text
+        text = text.replace(m.group(0), " ", 1)
+
+    sdgs = _SDG.findall(text)
+    if len(set(sdgs)) > 1 or _SDG_LIST.search(text):   # "SDG 6 or 7": and / or?
+        return None
+    for m in list(_SDG.finditer(text)):
+        take(m)
+    if sdgs:
+        filters.append({"column": "sdg_number", "op": "eq", "value": int(sdgs[0])})
+        columns.append("sdg_number")
+
+    for pattern, make in _DATE_RULES:
+        for m in list(pattern.finditer(text)):
+            take(m)
+            for op, value in make(*m.groups()):
+                filters.append({"column": DATE_COL, "op": op, "value": value})
+    if any(f["column"] == DATE_COL for f in filters):
+        columns.append(DATE_COL)
+    if re.search(rf"\b{_YEAR}\b", text):        # a year no rule understood
+        return None
+
+    kinds = [m for m in _KIND.finditer(text)]
+    if kinds:
+        for m in kinds:
+            take(m)
+        values = sorted({m.group(1).upper() for m in kinds})
+        filters.append({"column": "publication_kind", "op": "eq", "value": values[0]}
+                       if len(values) == 1 else
+                       {"column": "publication_kind", "op": "in", "value": values})
+    elif _GRANTED.search(text):
+        filters.append({"column": "publication_kind", "op": "startswith", "value": "B"})
+    if any(f["column"] == "publication_kind" for f in filters):
+        columns.append("publication_kind")
+
+    if _ADJECTIVE.search(text):
+        return None
+    countries = [m for m in _COUNTRY.finditer(text)]
+    if countries:
+        col = "inventor_countries" if _INVENTOR.search(text) else "applicant_countries"
+        for m in countries:
+            take(m)
+        codes = sorted({COUNTRIES[m.group(1).lower()] for m in countries})
+        if len(codes) > 1:
+            return None
+        text = _INVENTOR.sub(" ", text)
+        filters.append({"column": col, "op": "contains", "value": codes[0]})
+        columns.append(col)
+
+    if _HOW_FILED.search(user_msg):
+        text = _HOW_WORDS.sub(" ", text)
+    if not filters or _NEEDS_LLM.search(text):
+        return None
+    topic = " ".join(_FILLER.sub(" ", re.sub(r"[^\w\s\-]", " ", text)).split())
+    if topic:
+        columns += ["title_en", "abstract_text"]
+    return {"rewritten_query": topic or user_msg,
+            "column_priority": columns,
+            "filters": filters}
+
+
+class QueryRouter:
+    """Rule-based spec when it suffices, LLM rewrite otherwise; counts
+    which path each turn took (thread-safe, shared across sessions)."""
+
+    def __init__(self, rewrite_fn: Callable = rewrite, use_rules: bool = True):
+        self.rewrite_fn = rewrite_fn
+        self.use_rules  = use_rules
+        self._lock  = threading.Lock()
+        self.counts = {"turns": 0, "rules": 0, "llm": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def turn(self):
+        """Call once per user turn, before any branch answers it."""
+        self._count("turns")
+
+    def spec(self, chat_hist: List[Dict[str, str]], user_msg: str) -> Dict:
+        spec = parse_rules(user_msg) if self.use_rules else None
+        if spec is not None:
+            self._count("rules")
+            count("rewrite", rules=1)
+            return spec
+        self._count("llm")
+        count("rewrite", llm=1)
+        return self.rewrite_fn(chat_hist, user_msg)
+
+    def stats(self) -> Dict[str, int | float]:
+        with self._lock:
+            c = dict(self.counts)
+        c["no_rewrite"]  = c["turns"] - c["rules"] - c["llm"]
+        c["llm_avoided"] = c["turns"] - c["llm"]
+        c["avoided_rate"] = c["llm_avoided"] / c["turns"] if c["turns"] else 0.0
+        return c
+
+
+_default: QueryRouter | None = None
+_default_lock = threading.Lock()
+
+
+def default_router() -> QueryRouter:
+    """Process-wide router shared by every pipeline that is not given one."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = QueryRouter()
+        return _default
@@ -1,19 +1,68 @@
+import json, threading, time
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 from typing import Any, Dict, List, Sequence
-from .config import EMB_MODEL_NAME, EMB_DIR
-from .filter_ops import apply_filter
+from .cache import LRUCache
+from .config import EMB_MODEL_NAME, EMB_DIR, HYBRID_SEARCH
+from .chunk_store import open_store
+from .filter_ops import apply_filter, FilterEngine, FACET_COLS
+from .patent_store import PatentStore
+from .citation_graph import load_graph
+from .stats_engine import FacetIndex
+from .lexical import load_lexical, rrf
+from .tracing import count, span, traced
+from .vector_store import RERANK_FACTOR, open_vectors, rerank
+
+# search_tiers: FAISS depth starts here and grows geometrically up to
+# max_passages until enough distinct patents pass the filters
+DEPTH_START  = 128
+DEPTH_GROWTH = 2
 
 
 class PassageRetriever:
     def __init__(self,
                  df: pd.DataFrame | None = None,
-                 index_name: str = "faiss_chunks.idx"):
+                 index_name: str = "faiss_chunks.idx",
+                 nprobe: int | None = None,
+                 ef_search: int | None = None,
+                 background: bool = False,
+                 cache_size: int = 1024,
+                 cache_ttl: float | None = 3600.0,
+                 hybrid: bool = HYBRID_SEARCH,
+                 emb_dir: Path = EMB_DIR,
+                 encoder=None,
+                 rerank: int = RERANK_FACTOR):
+        """
+        background=True is the fast-start mode: the FAISS index is memory
+        mapped and the encoder + tokenizer load on a daemon thread, so the
+        retriever is usable (filters, lookups) before the model is ready;
+        the first encode waits for it. Per-phase seconds → timings().
+
+        Query vectors and raw FAISS results are kept in LRU caches of
+        `cache_size` entries expiring after `cache_ttl` seconds (see
+        cache_stats); cache_size=0 disables them.
+
+        hybrid=True fuses BM25 matches from the lexical index into the
+        vector hits with reciprocal rank fusion.
+
+        With a compressed index (sq8 / pq / ivfpq) and its float16 vector
+        store, each FAISS search fetches `rerank` times more candidates
+        and re-scores them exactly from the memory-mapped vectors;
+        rerank=0 uses the compressed distances as they are. `emb_dir` and a ready
+        `encoder` (instead of loading EMB_MODEL_NAME) are for benchmarks
+        and tests.
+        """
+        self.query_cache  = LRUCache(cache_size, cache_ttl)
+        self.search_cache = LRUCache(cache_size, cache_ttl)
+        self.load_timings: Dict[str, float] = {}
+        self._timings_lock = threading.Lock()    # the warm-up thread adds phases
+        t0 = time.perf_counter()
         # 1) load metadata table (DataFrame) if not provided
+        saved_df = df is None              # the table embed_build wrote with the indexes
         if df is None:
-            pq = EMB_DIR / "patents.parquet"
-            pk = EMB_DIR / "patents.pkl"
+            pq = emb_dir / "patents.parquet"
+            pk = emb_dir / "patents.pkl"
             if pq.exists():
                 try:
                     df = pd.read_parquet(pq)
@@ -27,31 +76,232 @@ class PassageRetriever:
                     f"Neither {pq} nor {pk} found – please run embed_build.py"
                 )
         self.df = df
+        self.hybrid = hybrid
+        t0 = self._lap("dataframe", t0)
+        # inverted index over the text columns, persisted by embed_build
+        self.lexical = load_lexical(emb_dir, df, save=saved_df, same_build=saved_df)
+        t0 = self._lap("lexical index", t0)
+        # vectorised filters; parses date columns once, up front
+        self.filters = FilterEngine(df, facet_cols=FACET_COLS, lexical=self.lexical)
+        t0 = self._lap("filters", t0)
+        # hashed publication_number → row lookups for the pipeline branches
+        self.patents = PatentStore(df)
+        t0 = self._lap("patent store", t0)
+        # CSR citation / family graph persisted by embed_build
+        self.graph = load_graph(emb_dir, df)
+        t0 = self._lap("citation graph", t0)
+        # exploded value → row postings + year histogram for aggregations
+        self.facets = FacetIndex(df)
+        t0 = self._lap("facets", t0)
 
         # 2) load FAISS index & chunk meta
-        idx_path = EMB_DIR / index_name
+        idx_path = emb_dir / index_name
         if not idx_path.exists():
             raise FileNotFoundError(f"FAISS index not found: {idx_path}")
 
-        import faiss, pickle
-        self.index = faiss.read_index(str(idx_path))
-        with open(EMB_DIR / "meta.pkl", "rb") as f:
-            self.meta = pickle.load(f)
+        import faiss
+        t0 = self._lap("import faiss", t0)
+        self.index = self._read_index(idx_path, mmap=background)
+        t0 = self._lap("faiss index", t0)
+        # columnar, memory-mapped chunk metadata (migrates meta.pkl once)
+        self.meta = open_store(emb_dir)
+        # chunk id → DataFrame row (-1 for ids tombstoned by update_index)
+        self.chunk_rows = self.meta.row_idx
+        # float16 vectors of a compressed index, for exact re-ranking
+        self.rerank  = max(0, rerank)
+        self.vectors = open_vectors(emb_dir, self.index.d) if self.rerank else None
+        if self.vectors is not None and len(self.vectors) != len(self.chunk_rows):
+            print(f"⚠️ {len(self.vectors)} float16 vectors for {len(self.chunk_rows)} chunks "
+                  "– re-ranking disabled, rebuild the index")
+            self.vectors = None
+        self._row_chunk = None           # first chunk per row, for BM25-only hits
+        self.set_search_params(nprobe=nprobe, ef_search=ef_search)
+        t0 = self._lap("chunk store", t0)
+
+        # 3) init encoder (+ tokenizer) for on-the-fly queries
+        self._model, self._model_error = None, None
+        self._encoder = encoder
+        self._warmup = threading.Thread(target=self._load_models, daemon=True,
+                                        name="retriever-warmup")
+        self._warmup.start()
+        if not background:
+            self._warmup.join()
+            if self._model_error is not None:
+                raise self._model_error
+
+    # ------------- loading ------------------------------------------------
+    def _lap(self, phase: str, t0: float) -> float:
+        now = time.perf_counter()
+        with self._timings_lock:
+            self.load_timings[phase] = now - t0
+        return now
 
-        # 3) init encoder for on-the-fly queries
+    def timings(self) -> Dict[str, float]:
+        """Snapshot of load_timings, safe while the warm-up is running."""
+        with self._timings_lock:
+            return dict(self.load_timings)
 
-        self.model = SentenceTransformer(EMB_MODEL_NAME)
+    @staticmethod
+    def _read_index(path: Path, mmap: bool = False):
+        """Read the FAISS index, memory-mapping its storage when asked and
+        supported by this faiss build / index type."""
+        import faiss
+        if mmap:
+            flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            try:
+                return faiss.read_index(str(path), flags)
+            except RuntimeError:
+                pass
+        return faiss.read_index(str(path))
+
+    def _load_models(self):
+        try:
+            t0 = time.perf_counter()
+            if self._encoder is not None:
+                self._model = self._encoder
+            else:
+                from sentence_transformers import SentenceTransformer
+                t0 = self._lap("import sentence_transformers", t0)
+                self._model = SentenceTransformer(EMB_MODEL_NAME)
+                t0 = self._lap("encoder", t0)
+            from .token_utils import warm_up
+            warm_up()
+            self._lap("tokenizer", t0)
+        except BaseException as e:           # surfaced on first use
+            self._model_error = e
+
+    @property
+    def model(self):
+        """The query encoder; blocks until the background warm-up is done."""
+        if self._model is None:
+            self._warmup.join()
+            if self._model_error is not None:
+                raise self._model_error
+        return self._model
+
+    @property
+    def ready(self) -> bool:
+        return not self._warmup.is_alive()
+
+    def set_search_params(self, nprobe: int | None = None,
+                          ef_search: int | None = None):
+        """Tune recall vs latency of an IVF (nprobe) or HNSW (efSearch)
+        index; knobs that do not apply to the loaded index are ignored."""
+        import faiss
+        ps = faiss.ParameterSpace()
+        for name, val in (("nprobe", nprobe), ("efSearch", ef_search)):
+            if val is None:
+                continue
+            try:
+                ps.set_index_parameter(self.index, name, val)
+            except RuntimeError:
+                pass
+            self.search_cache.clear()          # cached hits depend on knobs
 
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit / miss / eviction counters of the query and search caches."""
+        return {"query_vectors":  self.query_cache.stats(),
+                "search_results": self.search_cache.stats()}
 
     # ------------- helpers ------------------------------------------------
-    def _row_matches(self, row: pd.Series, chunk: str,
-                     filters: Sequence[Dict[str, Any]]) -> bool:
-        for f in filters:
-            col, op, val = f["column"], f["op"], f["value"]
-            target = chunk if col == "_chunk_text" else row.get(col, "")
-            if not apply_filter(target, op, val):
-                return False
-        return True
+    def chunk_mask(self, filters: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Boolean mask over chunk ids whose patent row passes <filters>."""
+        row_mask = self.filters.mask(filters)
+        return np.append(row_mask, False)[self.chunk_rows]   # -1 → False
+
+    def _search_params(self, chunk_mask: np.ndarray, k: int):
+        """
+        FAISS SearchParameters restricting the scan to ids set in
+        <chunk_mask>, keeping the current nprobe / efSearch. Returns the
+        params plus the bitmap, which must outlive the search call.
+        """
+        import faiss
+        bits  = np.packbits(chunk_mask, bitorder="little")
+        sel   = faiss.IDSelectorBitmap(len(chunk_mask), faiss.swig_ptr(bits))
+        inner = (faiss.downcast_index(self.index.index)
+                 if isinstance(self.index, faiss.IndexIDMap) else self.index)
+        if isinstance(inner, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(sel=sel, nprobe=inner.nprobe)
+        elif isinstance(inner, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(
+                sel=sel, efSearch=max(inner.hnsw.efSearch, k))
+        else:
+            params = faiss.SearchParameters(sel=sel)
+        return params, (bits, sel)
+
+    def encode(self, query: str) -> np.ndarray:
+        """(1, dim) float32 query vector, memoised by query text."""
+        computed = []
+
+        def compute():
+            computed.append(True)
+            with span("encode"):
+                vec = self.model.encode([query], convert_to_numpy=True).astype("float32")
+            vec.flags.writeable = False
+            return vec
+        vec = self.query_cache.get_or_compute(query, compute)
+        if not computed:
+            count("encode", cache_hits=1)
+        return vec
+
+    def encode_many(self, queries: Sequence[str]) -> np.ndarray:
+        """(n, dim) query vectors; the ones not cached yet are encoded in a
+        single batched model call (and cached)."""
+        vecs = {q: self.query_cache.get(q) for q in dict.fromkeys(queries)}
+        todo = [q for q, v in vecs.items() if v is None]
+        count("encode", cache_hits=len(vecs) - len(todo))
+        if todo:
+            with span("encode"):
+                out = self.model.encode(todo, convert_to_numpy=True).astype("float32")
+            for q, row in zip(todo, out):
+                vec = row[None, :]
+                vec.flags.writeable = False
+                self.query_cache.put(q, vec)
+                vecs[q] = vec
+        return np.vstack([vecs[q] for q in queries])
+
+    @staticmethod
+    def _search_key(query: str, depth: int, row_filt: Sequence[Dict[str, Any]]):
+        return (query, depth, json.dumps(row_filt, sort_keys=True, default=str))
+
+    def _index_search(self, Q: np.ndarray, depth: int,
+                      row_filt: Sequence[Dict[str, Any]]):
+        """index.search for the rows of <Q>, restricted to chunks passing
+        the row-level filters."""
+        # compressed index: a deeper coarse search, re-scored exactly below
+        k = depth if self.vectors is None else min(depth * self.rerank, self.index.ntotal)
+        params, keep = None, None
+        if row_filt:
+            chunk_mask = self.chunk_mask(row_filt)
+            if not chunk_mask.any():
+                return (np.empty((len(Q), 0), dtype="float32"),
+                        np.empty((len(Q), 0), dtype="int64"))
+            params, keep = self._search_params(chunk_mask, k)
+        count("faiss", queries=len(Q))
+        with span("faiss"):
+            D, I = self.index.search(Q, max(k, depth), params=params)
+        if self.vectors is None:
+            return D, I
+        count("rerank", candidates=int((I >= 0).sum()))
+        with span("rerank"):
+            return rerank(self.vectors, Q, I, depth)
+
+    def _faiss_search(self, query: str, depth: int,
+                      row_filt: Sequence[Dict[str, Any]]):
+        """(distances, ids) of the <depth> nearest chunks passing the
+        row-level filters, memoised by (query, depth, filters)."""
+        computed = []
+
+        def compute():
+            computed.append(True)
+            D, I = self._index_search(self.encode(query), depth, row_filt)
+            D.flags.writeable = I.flags.writeable = False
+            return D, I
+        out = self.search_cache.get_or_compute(self._search_key(query, depth, row_filt),
+                                               compute)
+        if not computed:
+            count("faiss", cache_hits=1)
+        return out
 
     # ------------- public search -----------------------------------------
     def search(self, query: str,
@@ -60,51 +310,214 @@ class PassageRetriever:
                column_order: List[str] | None = None,
                top_k_return: int = 60) -> List[Dict[str, Any]]:
 
-        q_emb = self.model.encode([query], convert_to_numpy=True)
-        D, I  = self.index.search(q_emb, max_passages)
+        row_filt, text_filt = self._split_filters(filters)
+        D, I = self._faiss_search(query, max_passages, row_filt)
+        return self._rank(query, D[0], I[0], row_filt, text_filt, column_order, top_k_return)
 
-        hits = []
-        for idx, score in zip(I[0], D[0]):
-            meta = self.meta[idx]
-            row  = self.df.iloc[meta["row_idx"]]
-            if filters and not self._row_matches(row, meta["chunk_text"], filters):
-                continue
-            hits.append({
+    def search_tiers(self, query: str,
+                     filters: Sequence[Dict[str, Any]] | None = None,
+                     column_order: List[str] | None = None,
+                     max_passages: int = 400,
+                     top_k_return: int = 60,
+                     all_tiers: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        The pipeline's relaxation chain in one call:
+
+            "filtered"  <filters> + <column_order>
+            "priority"  no filters, <column_order>
+            "semantic"  no filters, no column priority
+
+        Tiers are computed in that order, stopping at the first one with
+        hits unless <all_tiers>. The query is encoded once and searched
+        without filters; that pool starts DEPTH_START deep and grows by
+        DEPTH_GROWTH up to <max_passages> until it holds <top_k_return>
+        distinct patents. "priority" and "semantic" rank it as it is;
+        "filtered" ranks the chunks of it that pass the filters. Only when
+        fewer than <top_k_return> patents pass does the filtered tier run
+        searches of its own: restricted to matching chunks (IDSelector,
+        from DEPTH_START) for row filters, or deeper for chunk-text ones.
+        """
+        row_filt, text_filt = self._split_filters(filters)
+        self.encode(query)                       # one encoder call, cached
+
+        tiers = {}
+        D, I = self._deepen(query, [], [], top_k_return, max_passages)
+        fD, fI = D, I
+        if row_filt or text_filt:
+            keep = self.chunk_mask(row_filt) if row_filt else None
+            if keep is not None:
+                sel = (I[0] >= 0) & keep[I[0]]
+                fD, fI = D[:, sel], I[:, sel]
+            depth     = I.shape[1]
+            exhausted = int((I[0] >= 0).sum()) < depth        # the whole index
+            if not exhausted and self._n_patents(fI[0], text_filt) < top_k_return:
+                if row_filt:
+                    fD, fI = self._deepen(query, row_filt, text_filt, top_k_return,
+                                          max_passages)
+                elif depth < max_passages:
+                    fD, fI = self._deepen(query, [], text_filt, top_k_return, max_passages,
+                                          start=depth * DEPTH_GROWTH)
+        tiers["filtered"] = self._rank(query, fD[0], fI[0], row_filt, text_filt,
+                                       column_order, top_k_return)
+        if tiers["filtered"] and not all_tiers:
+            return tiers
+
+        for name, order in (("priority", column_order), ("semantic", None)):
+            if name == "priority" and not (row_filt or text_filt):
+                tiers[name] = tiers["filtered"]          # same filters, same order
+            else:
+                tiers[name] = self._rank(query, D[0], I[0], [], [], order, top_k_return)
+            if tiers[name] and not all_tiers:
+                break
+        return tiers
+
+    def _deepen(self, query: str, row_filt, text_filt, need: int, cap: int,
+                start: int = DEPTH_START):
+        """(D, I) of the shallowest search from depth <start> holding <need>
+        distinct patents that pass the filters (or everything up to <cap>)."""
+        k = min(start, cap)
+        while True:
+            D, I = self._faiss_search(query, k, row_filt)
+            ids = I[0][I[0] >= 0]
+            if k >= cap or len(ids) < k or self._n_patents(ids, text_filt) >= need:
+                return D, I
+            k = min(k * DEPTH_GROWTH, cap)
+
+    def _n_patents(self, ids: np.ndarray, text_filt) -> int:
+        ids = ids[ids >= 0]
+        if text_filt:
+            ids = [i for i in ids.tolist()
+                   if all(apply_filter(self.meta[i]["chunk_text"], f["op"], f["value"])
+                          for f in text_filt)]
+        return len(np.unique(self.chunk_rows[np.asarray(ids, dtype=np.int64)]))
+
+    def search_many(self, queries: Sequence[str],
+                    max_passages: int = 400,
+                    filters: Sequence[Sequence[Dict[str, Any]] | None] | None = None,
+                    column_orders: Sequence[List[str] | None] | None = None,
+                    top_k_return: int = 60) -> List[List[Dict[str, Any]]]:
+        """
+        search() for many queries at once: all query vectors come from one
+        encode_many call and queries sharing the same row-level filters
+        go through a single FAISS search. Results (and cache entries) are
+        the same as calling search() per query.
+        """
+        n       = len(queries)
+        filters = list(filters or [None] * n)
+        orders  = list(column_orders or [None] * n)
+        split   = [self._split_filters(f) for f in filters]
+
+        results: Dict[int, tuple] = {}
+        groups:  Dict[str, List[int]] = {}
+        for i, (q, (row_filt, _)) in enumerate(zip(queries, split)):
+            key = self._search_key(q, max_passages, row_filt)
+            hit = self.search_cache.get(key)
+            if hit is not None:
+                results[i] = hit
+            else:
+                groups.setdefault(key[2], []).append(i)
+
+        if groups:
+            vecs = self.encode_many([queries[i] for idx in groups.values() for i in idx])
+            start = 0
+            for members in groups.values():
+                Q = vecs[start:start + len(members)]
+                start += len(members)
+                D, I = self._index_search(Q, max_passages, split[members[0]][0])
+                for j, i in enumerate(members):
+                    d, ids = D[j:j + 1].copy(), I[j:j + 1].copy()
+                    d.flags.writeable = ids.flags.writeable = False
+                    results[i] = (d, ids)
+                    self.search_cache.put(self._search_key(queries[i], max_passages,
+                                                           split[i][0]), (d, ids))
+
+        return [self._rank(q, results[i][0][0], results[i][1][0], *split[i],
+                           orders[i], top_k_return)
+                for i, q in enumerate(queries)]
+
+    @staticmethod
+    def _split_filters(filters):
+        # row-level filters are pushed into FAISS as an id selector, so the
+        # hits are the true nearest chunks among matching patents
+        row_filt  = [f for f in filters or [] if f["column"] != "_chunk_text"]
+        text_filt = [f for f in filters or [] if f["column"] == "_chunk_text"]
+        return row_filt, text_filt
+
+    def row_chunk(self, row: int) -> int:
+        """First live chunk id of DataFrame row <row> (-1 if none)."""
+        if self._row_chunk is None:
+            first = np.full(len(self.df), -1, dtype=np.int64)
+            live  = np.flatnonzero(self.chunk_rows >= 0)[::-1]
+            first[self.chunk_rows[live]] = live          # lowest id written last
+            self._row_chunk = first
+        return int(self._row_chunk[row])
+
+    @traced("rank")
+    def _rank(self, query: str, D: np.ndarray, I: np.ndarray,
+              row_filt: Sequence[Dict[str, Any]],
+              text_filt: Sequence[Dict[str, Any]],
+              column_order: List[str] | None,
+              top_k_return: int) -> List[Dict[str, Any]]:
+        """Chunk-text filters, one chunk per patent, BM25 fusion and the
+        column-priority bonus."""
+        titles = self.df["title_en"].to_numpy() if "title_en" in self.df.columns else None
+
+        def hit(chunk_id, score):
+            meta = self.meta[chunk_id]
+            if not all(apply_filter(meta["chunk_text"], f["op"], f["value"])
+                       for f in text_filt):
+                return None
+            return {
                 "publication_number": str(meta["publication_number"]),
-                "title": str(row.get("title_en", "")),
+                "title": str(titles[meta["row_idx"]]) if titles is not None else "",
                 "text":  meta["chunk_text"],
-                "row":   row,
-                "vec_score": float(score)
-            })
+                "n_tokens": meta.get("n_tokens"),
+                "row":   meta["row_idx"],
+                "vec_score": score,
+            }
 
         # keep only 1st chunk per patent to diversify
-        seen = set()
-        uniq = []
-        for h in hits:
-            pid = h["publication_number"]
-            if pid not in seen:
-                seen.add(pid)
-                uniq.append(h)
-        hits = uniq
+        hits, seen = [], set()
+        for idx, score in zip(I, D):
+            if idx < 0:          # fewer than max_passages vectors match
+                continue
+            h = hit(idx, float(score))
+            if h is not None and h["publication_number"] not in seen:
+                seen.add(h["publication_number"])
+                hits.append(h)
+
+        # keyword matches the vectors missed join with their first chunk;
+        # both rankings are fused by reciprocal rank
+        if self.hybrid:
+            mask = self.filters.mask(row_filt) if row_filt else None
+            lex_rows, _ = self.lexical.bm25(query, top_k_return, mask)
+            by_row = {h["row"]: h for h in hits}
+            for r in lex_rows.tolist():
+                if r not in by_row and self.row_chunk(r) >= 0:
+                    h = hit(self.row_chunk(r), float("inf"))
+                    if h is not None and h["publication_number"] not in seen:
+                        seen.add(h["publication_number"])
+                        hits.append(h)
+                        by_row[r] = h
+            fused = rrf([h["row"] for h in hits if h["vec_score"] != float("inf")],
+                        [r for r in lex_rows.tolist() if r in by_row])
+            for h in hits:
+                h["base"] = fused.get(h["row"], 0.0)
+        else:
+            for h in hits:
+                h["base"] = -h["vec_score"]
 
         # simple re-rank bonus for earlier column_priority matches
         if column_order:
-            weight = {c: (len(column_order) - i) for i, c in enumerate(column_order)}
-
-            def bonus(hit):
-                b = 0.0
-                row = hit["row"]
-                for col in column_order:
-                    cell = str(row.get(col, "")).lower()
-                    if cell and any(t in cell for t in query.lower().split()):
-                        b += weight[col]
-                return b
-
-            for h in hits:
-                h["score"] = -h["vec_score"] + bonus(h)
-            hits.sort(key=lambda x: x["score"], reverse=True)
+            bonus = self.lexical.priority_bonus(
+                query, column_order, np.array([h["row"] for h in hits], dtype=np.int64))
+            for h, b in zip(hits, bonus):
+                h["score"] = h["base"] + b
         else:
-            hits.sort(key=lambda x: x["vec_score"])
+            for h in hits:
+                h["score"] = h["base"]
+        hits.sort(key=lambda x: x["score"], reverse=True)
+        count("rank", candidates=int((I >= 0).sum()), patents=len(hits))
 
-        return [{k: h[k] for k in ("publication_number", "title", "text")}
+        return [{k: h[k] for k in ("publication_number", "title", "text", "n_tokens")}
                 for h in hits[:top_k_return]]
@@ -0,0 +1,262 @@
+"""
+Multi-session HTTP server: one shared PassageRetriever, many conversations.
+
+The retriever (DataFrame, FAISS index, encoder, lookup structures) is
+loaded once and only read afterwards. Each session gets its own
+RAGPipeline (chat_history, "this category" filters) from a SessionStore
+that evicts idle sessions. Encoding, FAISS search and filter masks run
+on a bounded thread pool, so a burst of heavy requests queues there
+instead of oversubscribing the CPU, while lookups and LLM waits proceed.
+
+    python -m src.server --port 8000 --workers 4
+
+    POST /chat   {"message": "...", "session_id": "...", "stream": false}
+                 → {"session_id": "...", "answer": "..."}
+                 (stream=true answers with server-sent events)
+    DELETE /sessions/<id>      forget a conversation
+    GET  /health               sessions, readiness, cache and rewrite stats
+    GET  /metrics              per-branch / per-stage metrics, Prometheus text format
+    GET  /traces?n=50          the last n turn traces (see tracing)
+"""
+from __future__ import annotations
+import argparse, contextvars, json, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable
+from urllib.parse import parse_qs, urlsplit
+
+from .retrieval import PassageRetriever
+from .pipeline  import RAGPipeline
+from .query_router import default_router
+from .tracing   import PrometheusSink, RingBufferSink, Tracer, default_tracer
+
+SESSION_TTL  = 1800.0     # seconds a conversation may sit idle
+MAX_SESSIONS = 1000
+CPU_WORKERS  = 4          # concurrent encode / search / filter calls
+
+
+class Offloaded:
+    """
+    Proxy running the named methods of <obj> on <pool> (the caller waits
+    for the result) in a copy of the caller's context, so the work is
+    traced on the caller's turn; every other attribute is passed through
+    unchanged.
+    """
+
+    def __init__(self, obj, pool: ThreadPoolExecutor, methods: Iterable[str], **overrides):
+        self._obj, self._pool, self._methods = obj, pool, set(methods)
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if name in self._methods:
+            return lambda *a, **kw: self._pool.submit(
+                contextvars.copy_context().run, attr, *a, **kw).result()
+        return attr
+
+
+def shared_retriever(retriever: PassageRetriever, workers: int = CPU_WORKERS) -> Offloaded:
+    """The retriever as sessions see it: search / encode and filter masks
+    go through one bounded executor."""
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retriever")
+    filters = Offloaded(retriever.filters, pool, ("mask", "filter"))
+    return Offloaded(retriever, pool, ("search", "search_tiers", "encode"), filters=filters)
+
+
+class SessionStore:
+    """session id → RAGPipeline, created on first use and evicted after
+    <ttl> idle seconds (or least recently used beyond <max_sessions>)."""
+
+    def __init__(self, factory: Callable[[], RAGPipeline],
+                 ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        self.factory      = factory
+        self.ttl          = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, list] = {}   # id → [pipeline, lock, last_used]
+        self.created = self.evicted = 0
+
+    def get(self, sid: str | None):
+        """(session id, pipeline, per-session lock); one turn at a time per
+        session, so hold the lock while answering."""
+        now = time.monotonic()
+        with self._lock:
+            sid = sid or uuid.uuid4().hex
+            entry = self._sessions.get(sid)
+            if entry is None:
+                entry = self._sessions[sid] = [self.factory(), threading.Lock(), now]
+                self.created += 1
+                self._evict(now)
+            entry[2] = now
+            return sid, entry[0], entry[1]
+
+    def drop(self, sid: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(sid, None) is not None
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            return self._evict(time.monotonic())
+
+    def _evict(self, now: float) -> int:
+        stale = [s for s, e in self._sessions.items()
+                 if now - e[2] > self.ttl and not e[1].locked()]
+        overflow = len(self._sessions) - len(stale) - self.max_sessions
+        if overflow > 0:
+            lru = sorted((e[2], s) for s, e in self._sessions.items()
+                         if s not in stale and not e[1].locked())
+            stale += [s for _, s in lru[:overflow]]
+        for s in stale:
+            del self._sessions[s]
+        self.evicted += len(stale)
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class ChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, retriever: PassageRetriever,
+                 workers: int = CPU_WORKERS, ttl: float = SESSION_TTL,
+                 max_sessions: int = MAX_SESSIONS, tracer: Tracer | None = None):
+        super().__init__(addr, _Handler)
+        self.retriever = retriever
+        # /metrics and /traces read these sinks; TRACING sinks are kept too
+        self.tracer = tracer or Tracer([RingBufferSink(), PrometheusSink()]
+                                       + list(default_tracer().sinks))
+        shared = shared_retriever(retriever, workers)
+        self.sessions = SessionStore(lambda: RAGPipeline(shared, tracer=self.tracer),
+                                     ttl, max_sessions)
+        self._reaper = threading.Thread(target=self._reap, daemon=True, name="session-reaper")
+        self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(1.0, min(60.0, self.sessions.ttl / 4)))
+            self.sessions.evict_idle()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _stream(self, sid: str, pieces: Iterable[str]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        send = lambda body: (self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8")),
+                             self.wfile.flush())
+        pieces = iter(pieces)
+        try:
+            send({"session_id": sid})
+            try:
+                for piece in pieces:
+                    send({"delta": piece})
+            except ConnectionError:
+                raise
+            except Exception as e:            # headers are out; report in-band
+                send({"error": repr(e)})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except ConnectionError:               # the client went away mid-stream
+            pass
+        finally:                              # ... which ends (aborts) the turn now
+            if hasattr(pieces, "close"):
+                pieces.close()
+
+    def _send_text(self, status: int, text: str):
+        raw = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        srv: ChatServer = self.server
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            prom = srv.tracer.sink(PrometheusSink)
+            return self._send_text(200, prom.render() if prom else "")
+        if url.path == "/traces":
+            ring = srv.tracer.sink(RingBufferSink)
+            try:
+                n = int(parse_qs(url.query).get("n", ["50"])[0])
+            except ValueError:
+                return self._send(400, {"error": "n must be an integer"})
+            return self._send(200, {"traces": ring.recent(n) if ring else []})
+        if url.path != "/health":
+            return self._send(404, {"error": "not found"})
+        self._send(200, {"sessions": len(srv.sessions), "ready": srv.retriever.ready,
+                         "created": srv.sessions.created, "evicted": srv.sessions.evicted,
+                         "cache": srv.retriever.cache_stats(),
+                         "rewrite": default_router().stats()})
+
+    def do_DELETE(self):
+        srv: ChatServer = self.server
+        if not self.path.startswith("/sessions/"):
+            return self._send(404, {"error": "not found"})
+        sid = self.path[len("/sessions/"):]
+        self._send(200 if srv.sessions.drop(sid) else 404, {"session_id": sid})
+
+    def do_POST(self):
+        srv: ChatServer = self.server
+        if self.path != "/chat":
+            return self._send(404, {"error": "not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            message = str(body["message"]).strip()
+        except (ValueError, KeyError):
+            return self._send(400, {"error": 'expected JSON {"message": ...}'})
+
+        sid, pipeline, lock = srv.sessions.get(body.get("session_id"))
+        with lock:
+            try:
+                if body.get("stream"):
+                    return self._stream(sid, pipeline.ask_stream(message))
+                answer = pipeline.ask(message)
+            except Exception as e:            # keep serving other sessions
+                return self._send(500, {"session_id": sid, "error": repr(e)})
+        self._send(200, {"session_id": sid, "answer": answer})
+
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.server", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=CPU_WORKERS,
+                    help="threads for encoding / FAISS search / filtering")
+    ap.add_argument("--session-ttl", type=float, default=SESSION_TTL,
+                    help="seconds before an idle session is dropped")
+    ap.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    args = ap.parse_args()
+
+    retriever = PassageRetriever(background=True)
+    srv = ChatServer((args.host, args.port), retriever, args.workers,
+                     args.session_ttl, args.max_sessions)
+    print(f"🔎 RAG server on http://{args.host}:{srv.server_address[1]}/chat "
+          f"({args.workers} search workers)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
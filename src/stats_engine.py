@@ -1,6 +1,14 @@
+import numpy as np
 import pandas as pd
 from collections import Counter
-from typing import Dict
+from typing import Dict, Sequence
+
+from .filter_ops import _to_date
+
+SPLIT_RE = r"[;,|]"
+# multi-valued columns exploded at load time; others are indexed on first use
+FACET_GROUP_COLS = ("ipc_technologies", "ipc_tech_field", "applicant_countries",
+                    "inventor_countries", "sdg_number")
 
 def top_k_group(df: pd.DataFrame, column: str, k: int = 10) -> Dict[str,int]:
     """
@@ -11,7 +19,7 @@ def top_k_group(df: pd.DataFrame, column: str, k: int = 10) -> Dict[str,int]:
         df[column]
         .dropna()
         .astype(str)
-        .str.split(r"[;,|]")
+        .str.split(SPLIT_RE)
         .explode()
         .str.strip()
         .value_counts()
@@ -19,10 +27,113 @@ def top_k_group(df: pd.DataFrame, column: str, k: int = 10) -> Dict[str,int]:
     )
     return series.to_dict()
 
+def parse_years(ser: pd.Series) -> np.ndarray:
+    """Year of each cell (YYYYMMDD ints, ISO strings, …) or -1 if unparseable;
+    each distinct value is parsed once."""
+    lookup = {}
+    for v in pd.unique(ser):
+        d = _to_date(v)
+        lookup[v] = d.year if d else -1
+    return ser.map(lookup).fillna(-1).to_numpy(np.int64)
+
 def group_by_year(df: pd.DataFrame, date_col: str) -> Dict[int,int]:
     """
     Group df by the year of <date_col>, return {year:count}, sorted ascending.
     """
-    years = pd.to_datetime(df[date_col], errors="coerce").dt.year.dropna().astype(int)
-    counts = years.value_counts().sort_index()
+    years  = parse_years(df[date_col])
+    counts = pd.Series(years[years >= 0]).value_counts().sort_index()
     return counts.to_dict()
+
+
+def _postings(codes: np.ndarray, rows: np.ndarray, n_values: int):
+    """CSR (indptr, rows) grouping <rows> by value code, rows ascending."""
+    order  = np.lexsort((rows, codes))
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n_values))])
+    return indptr, rows[order]
+
+
+class FacetIndex:
+    """
+    Pre-materialised facets over one DataFrame.
+
+    Every multi-valued column is exploded once into postings: for each
+    distinct value the sorted row ids holding it (CSR: indptr + rows).
+    Counts under any boolean row mask are then one gather + segment sum
+    over the postings, and a value's exemplar is its first posting inside
+    the mask. Publication years are parsed once into a code per row, so
+    year histograms are a bincount.
+    """
+
+    def __init__(self, df: pd.DataFrame,
+                 columns: Sequence[str] = FACET_GROUP_COLS,
+                 date_col: str = "publication_date"):
+        self.df = df
+        self._facets: Dict[str, tuple] = {}
+        for col in columns:
+            if col in df.columns:
+                self._build(col)
+        years = parse_years(df[date_col]) if date_col in df.columns \
+            else np.full(len(df), -1, dtype=np.int64)
+        self.years      = np.unique(years[years >= 0])
+        self._year_code = np.where(years >= 0, np.searchsorted(self.years, years), -1)
+        known = np.flatnonzero(self._year_code >= 0)
+        self._year_ptr, self._year_rows = _postings(self._year_code[known], known,
+                                                    len(self.years))
+        self.year_hist  = self.year_counts()
+
+    # ---- construction ----------------------------------------------------
+    def _build(self, col: str) -> tuple:
+        # same explode / strip as top_k_group, keeping the source row
+        parts = (self.df[col].reset_index(drop=True).dropna().astype(str)
+                 .str.split(SPLIT_RE).explode().str.strip())
+        values, codes = np.unique(parts.to_numpy(str), return_inverse=True)
+        indptr, rows  = _postings(codes, parts.index.to_numpy(np.int64), len(values))
+        facet  = (values, {v: i for i, v in enumerate(values.tolist())}, indptr, rows)
+        self._facets[col] = facet
+        return facet
+
+    def facet(self, col: str) -> tuple:
+        return self._facets.get(col) or self._build(col)
+
+    # ---- queries ---------------------------------------------------------
+    def counts(self, col: str, mask: np.ndarray | None = None) -> np.ndarray:
+        """Occurrences of every value of <col> among rows in <mask>."""
+        values, _, indptr, rows = self.facet(col)
+        if mask is None:
+            return np.diff(indptr)
+        hits = mask[rows].astype(np.int64)
+        return np.add.reduceat(hits, indptr[:-1]) if len(hits) else np.zeros(len(values), np.int64)
+
+    def top_k(self, col: str, k: int = 10, mask: np.ndarray | None = None) -> Dict[str, int]:
+        """top_k_group(df[mask], col, k) without re-splitting the column."""
+        values = self.facet(col)[0]
+        cnt    = self.counts(col, mask)
+        top    = np.argsort(-cnt, kind="stable")[:k]
+        return {str(values[i]): int(cnt[i]) for i in top if cnt[i] > 0}
+
+    def rows_with(self, col: str, value: str) -> np.ndarray:
+        _, lookup, indptr, rows = self.facet(col)
+        i = lookup.get(str(value))
+        return rows[indptr[i]:indptr[i + 1]] if i is not None else rows[:0]
+
+    def exemplar(self, col: str, value: str, mask: np.ndarray | None = None) -> int | None:
+        """First row (DataFrame position) holding <value> inside <mask>."""
+        rows = self.rows_with(col, value)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        return int(rows[0]) if len(rows) else None
+
+    def year_counts(self, mask: np.ndarray | None = None) -> Dict[int, int]:
+        """{year: count} ascending, like group_by_year(df[mask])."""
+        code = self._year_code if mask is None else self._year_code[mask]
+        hist = np.bincount(code[code >= 0], minlength=len(self.years))
+        return {int(y): int(c) for y, c in zip(self.years, hist) if c}
+
+    def year_exemplar(self, year: int, mask: np.ndarray | None = None) -> int | None:
+        i = np.searchsorted(self.years, year)
+        if i >= len(self.years) or self.years[i] != year:
+            return None
+        rows = self._year_rows[self._year_ptr[i]:self._year_ptr[i + 1]]
+        if mask is not None:
+            rows = rows[mask[rows]]
+        return int(rows[0]) if len(rows) else None
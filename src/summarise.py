@@ -1,62 +1,112 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import SUMMARY_PARALLELISM
 from .llm_clients import chat
-from .token_utils import count_tokens
+from .token_utils import count_tokens, count_tokens_batch
+from .tracing import count, traced
 
 MAX_CTX = 60_000    # safe Mixtral window
 CHUNK   = 4_096     # tokens per map chunk
 
 
-def map_reduce_summarise(query: str, passages: list[str]) -> str:
-    """
-    Summarise passages only if they exceed MAX_CTX.
-    Preserve the leading “[ID] "title" ||” header of each passage.
-    """
-    # total tokens
-    total = sum(count_tokens(p) for p in passages)
-    if total < MAX_CTX:
-        return "\n\n".join(passages)
-
-    # split headers & bodies
-    headers, bodies = [], []
-    for p in passages:
-        if "||" in p:
-            head, body = p.split("||", 1)
-        else:
-            head, body = p, ""
-        headers.append(head.strip())
-        bodies.append(body.strip())
-
-    # MAP phase: chunk bodies into ~CHUNK-token pieces
-    maps, buf, buf_tok = [], [], 0
-    for body in bodies:
-        t = count_tokens(body)
-        if buf_tok + t > CHUNK:
-            maps.append("\n\n".join(buf))
+def _split(passage: str) -> tuple[str, str]:
+    if "||" in passage:
+        head, body = passage.split("||", 1)
+    else:
+        head, body = passage, ""
+    return head.strip(), body.strip()
+
+
+def _pack(texts: list[str], tokens: list[int], limit: int, min_items: int = 1) -> list[list[str]]:
+    """Greedily group texts into runs of at most <limit> tokens (each group
+    holds at least <min_items>, so packing always makes progress)."""
+    groups, buf, buf_tok = [], [], 0
+    for text, t in zip(texts, tokens):
+        if buf and len(buf) >= min_items and buf_tok + t > limit:
+            groups.append(buf)
             buf, buf_tok = [], 0
-        buf.append(body)
+        buf.append(text)
         buf_tok += t
     if buf:
-        maps.append("\n\n".join(buf))
+        groups.append(buf)
+    return groups
+
+
+def _run(fn, items, parallelism: int) -> list:
+    if parallelism <= 1 or len(items) <= 1:
+        return [fn(i, x) for i, x in enumerate(items)]
+    # each call runs in a copy of the caller's context (keeps the turn's trace)
+    ctxs = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=min(parallelism, len(items))) as ex:
+        return list(ex.map(lambda c, i, x: c.run(fn, i, x), ctxs, range(len(items)), items))
 
-    # summarise each map-chunk
-    partials = []
-    for i, chunk in enumerate(maps):
+
+@traced("summarise")
+def summarise_context(query: str,
+                      passages: list[str],
+                      body_tokens: list[int] | None = None,
+                      parallelism: int = SUMMARY_PARALLELISM,
+                      max_ctx: int = MAX_CTX,
+                      chunk: int = CHUNK) -> tuple[str, int]:
+    """
+    map_reduce_summarise() that also returns the token count of the context.
+    body_tokens: token counts of each passage's text after “||”, if the
+    caller already has them (they are reused instead of re-counted).
+    """
+    heads, bodies = zip(*map(_split, passages)) if passages else ((), ())
+    if body_tokens is None:
+        body_tokens = count_tokens_batch(bodies)
+    head_tokens = count_tokens_batch(heads)
+    # +1 per passage for the “||” separator
+    total = sum(body_tokens) + sum(head_tokens) + len(passages)
+    count("summarise", passages=len(passages), tokens_in=total)
+    if total < max_ctx:
+        return "\n\n".join(passages), total
+
+    # MAP phase: chunk bodies into ~CHUNK-token pieces, summarised concurrently
+    maps = ["\n\n".join(g) for g in _pack(list(bodies), list(body_tokens), chunk)]
+    count("summarise", map_chunks=len(maps))
+
+    def summarise_map(i, text):
         prompt = [
             {"role": "system",
              "content": f"Summarise chunk {i+1}/{len(maps)} relevant to: '{query}'."},
-            {"role": "user", "content": chunk},
+            {"role": "user", "content": text},
         ]
-        partials.append(chat(prompt, temperature=0.2, max_tokens=512))
+        return chat(prompt, temperature=0.2, max_tokens=512)
 
-    # REDUCE phase: combine partial summaries
-    final_summary = chat(
-        [
-            {"role": "system",
-             "content": "Combine the following partial summaries into one coherent passage."},
-            {"role": "user", "content": "\n\n".join(partials)},
-        ],
-        temperature=0.2,
-        max_tokens=768,
-    )
+    partials = _run(summarise_map, maps, parallelism)
+
+    # REDUCE phase: combine partial summaries, tree-wise while they still
+    # exceed the window
+    def combine(_, group):
+        return chat(
+            [
+                {"role": "system",
+                 "content": "Combine the following partial summaries into one coherent passage."},
+                {"role": "user", "content": "\n\n".join(group)},
+            ],
+            temperature=0.2,
+            max_tokens=768,
+        )
+
+    part_tokens = count_tokens_batch(partials)
+    while len(partials) > 1 and sum(part_tokens) > max_ctx:
+        groups   = _pack(partials, part_tokens, max_ctx, min_items=2)
+        partials = _run(combine, groups, parallelism)
+        part_tokens = count_tokens_batch(partials)
+    final_summary = combine(0, partials)
 
     # reattach headers
-    return "\n\n".join(f"{h} || {final_summary}" for h in headers)
+    summary_tokens = count_tokens(final_summary)
+    context = "\n\n".join(f"{h} || {final_summary}" for h in heads)
+    return context, sum(head_tokens) + len(heads) * (summary_tokens + 1)
+
+
+def map_reduce_summarise(query: str, passages: list[str], **kwargs) -> str:
+    """
+    Summarise passages only if they exceed MAX_CTX.
+    Preserve the leading “[ID] "title" ||” header of each passage.
+    """
+    return summarise_context(query, passages, **kwargs)[0]
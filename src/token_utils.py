@@ -1,9 +1,69 @@
-import re
-import tiktoken
+import math, re, threading
+from typing import Iterable, List
 
-_enc = tiktoken.get_encoding("cl100k_base")  # reasonably close for Mixtral
-def count_tokens(text: str) -> int:
-    return len(_enc.encode(text))
+from .cache import LRUCache
+
+APPROX_CHARS_PER_TOKEN = 4.0    # typical for English prose with cl100k
+TOKEN_THREADS          = 8      # tiktoken batch-encoding threads
+
+_enc, _enc_lock = None, threading.Lock()
+_counts = LRUCache(maxsize=4096)   # text → token count, for texts seen across turns
+_approx_only = False               # set_approx(): never load tiktoken
+
+def _get_enc():
+    """tiktoken is imported and its BPE table loaded on first use."""
+    global _enc
+    if _enc is None:
+        with _enc_lock:
+            if _enc is None:
+                import tiktoken
+                _enc = tiktoken.get_encoding("cl100k_base")  # reasonably close for Mixtral
+    return _enc
+
+def set_approx(on: bool = True) -> None:
+    """Count every text with the character estimate, so nothing needs
+    tiktoken's BPE table (offline benchmarks, tests); False restores it."""
+    global _approx_only
+    _approx_only = on
+
+def warm_up():
+    """Load the tokenizer ahead of the first count (e.g. on a background thread)."""
+    if not _approx_only:
+        _get_enc()
+
+def approx_tokens(text: str) -> int:
+    """Character-based estimate for budget checks; no tokenizer needed."""
+    return math.ceil(len(text) / APPROX_CHARS_PER_TOKEN)
+
+def count_tokens(text: str, approx: bool = False) -> int:
+    if approx or _approx_only:
+        return approx_tokens(text)
+    n = _counts.get(text)
+    if n is None:
+        n = len(_get_enc().encode_ordinary(text))
+        _counts.put(text, n)
+    return n
+
+def count_tokens_batch(texts: Iterable[str], approx: bool = False,
+                       memo: bool = True) -> List[int]:
+    """
+    Token counts for many texts at once. Memoised texts are answered from
+    the cache; the rest go through tiktoken's multi-threaded batch encoder.
+    Pass memo=False for one-off corpus scans so they don't flush the cache.
+    """
+    texts = list(texts)
+    if approx or _approx_only:
+        return [approx_tokens(t) for t in texts]
+    counts = [_counts.get(t) for t in texts] if memo else [None] * len(texts)
+    todo   = [i for i, n in enumerate(counts) if n is None]
+    if todo:
+        encoded = _get_enc().encode_ordinary_batch([texts[i] for i in todo],
+                                                   num_threads=TOKEN_THREADS)
+        for i, toks in zip(todo, encoded):
+            counts[i] = len(toks)
+            if memo:
+                _counts.put(texts[i], counts[i])
+    return counts
 
 def count_words(text: str) -> int:
     return len(re.findall(r"\w+", text))
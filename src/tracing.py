@@ -0,0 +1,335 @@
+"""
+Per-turn traces for RAGPipeline: which branch answered, plus wall time
+and counters for every stage the turn went through.
+
+    tracer   = Tracer([JsonlSink("traces.jsonl"), RingBufferSink(), PrometheusSink()])
+    pipeline = RAGPipeline(retriever, tracer=tracer)
+
+A trace is one dict per turn:
+
+    {"turn_id", "query", "branch", "started", "ms", "error",
+     "stages": {"rewrite": {"ms", "calls", "rules" | "llm", ...},
+                "search":  {"ms", "calls", "passages", "relaxed"},
+                "encode":  {"ms", "calls", "cache_hits"},
+                "faiss":   {"ms", "calls", "queries", "cache_hits"},
+                "rerank":  {"ms", "calls", "candidates"},   (compressed index)
+                "filter":  {"ms", "calls", "masks_built", "cache_hits"},
+                "rank":    {"ms", "calls", "candidates", "patents"},
+                "fit_context", "summarise", "llm": {"ms", "calls", "llm_calls",
+                 "prompt_tokens", "completion_tokens", "retries", "rate_limited",
+                 "llm_cache_hits", ...}}}
+
+"search" wraps encode / faiss / rerank / filter / rank, so their times overlap;
+LLM counters land on the stage that made the call (rewrite, summarise or
+llm). Instrumented code calls the module-level span() / count() /
+@traced, which look up the turn running in the current context
+(contextvars) and do nothing when there is none: with the default
+NullTracer a stage costs one ContextVar lookup. Work submitted to thread
+pools through contextvars.copy_context() (server.Offloaded, the
+summarise map phase) stays on its turn. A streamed turn runs in a context
+of its own (isolated), so the consumer's code between fragments is not
+traced; a stream closed before its end is recorded with error "aborted".
+
+TRACING=jsonl,ring,prometheus (TRACE_PATH for the JSONL file) traces
+every pipeline that is not given a tracer. The HTTP server always keeps
+a ring buffer and a Prometheus sink for GET /traces and GET /metrics.
+"""
+from __future__ import annotations
+import contextvars, functools, itertools, json, threading, time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .config import TRACING, TRACE_PATH
+
+_trace = contextvars.ContextVar("rag_trace", default=None)   # Trace of the running turn
+_stage = contextvars.ContextVar("rag_stage", default=None)   # innermost open span
+
+
+class Trace:
+    def __init__(self, turn_id: int, query: str):
+        self.turn_id = turn_id
+        self.query   = query
+        self.branch  = None
+        self.error   = None
+        self.started = time.time()
+        self.ms      = 0.0
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock   = threading.Lock()      # pool threads add to the same turn
+
+    def add(self, stage: str, **counters):
+        with self._lock:
+            s = self.stages.setdefault(stage, {})
+            for k, v in counters.items():
+                s[k] = s.get(k, 0) + v
+
+    def set(self, **attrs):
+        for k, v in attrs.items():
+            setattr(self, k, v)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: {k: round(v, 3) if isinstance(v, float) else v
+                             for k, v in s.items()} for name, s in self.stages.items()}
+        return {"turn_id": self.turn_id, "query": self.query, "branch": self.branch,
+                "started": round(self.started, 3), "ms": round(self.ms, 3),
+                "error": self.error, "stages": stages}
+
+
+class _Span:
+    __slots__ = ("trace", "stage", "t0", "prev")
+
+    def __init__(self, trace: Trace, stage: str):
+        self.trace, self.stage = trace, stage
+
+    def __enter__(self):
+        self.prev = _stage.get()
+        _stage.set(self.stage)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.stage, ms=(time.perf_counter() - self.t0) * 1e3, calls=1)
+        _stage.set(self.prev)
+        return False
+
+
+class _Null:
+    """No-op span and trace (tracing disabled)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, stage: str, **counters):
+        pass
+
+
+_NULL = _Null()
+
+
+def span(stage: str):
+    """Context manager timing <stage> of the current turn (no-op outside one)."""
+    trace = _trace.get()
+    return _NULL if trace is None else _Span(trace, stage)
+
+
+def count(stage: str | None = None, **counters):
+    """Add <counters> to <stage> of the current turn; stage=None means the
+    innermost open span."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(stage or _stage.get() or "turn", **counters)
+
+
+def isolated(gen: Iterator) -> Iterator:
+    """Drive generator <gen> in a context of its own, so a turn it opens
+    stays out of the consumer's context between yields; closing the
+    wrapper closes <gen> (in that context) too."""
+    ctx = contextvars.copy_context()
+    try:
+        while True:
+            try:
+                item = ctx.run(next, gen)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        ctx.run(gen.close)
+
+
+def traced(stage: str):
+    """Decorator: run the function inside span(<stage>)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# ---- sinks ---------------------------------------------------------------
+class JsonlSink:
+    """One JSON line per turn, appended and flushed as the turn ends."""
+
+    def __init__(self, path: str | Path = TRACE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def emit(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._fh.write(line + "\n")
+            self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+class RingBufferSink:
+    """The last <maxlen> traces in memory."""
+
+    def __init__(self, maxlen: int = 1000):
+        self._buf = deque(maxlen=maxlen)
+
+    def emit(self, trace: Trace):
+        self._buf.append(trace.to_dict())
+
+    def recent(self, n: int | None = None) -> List[Dict[str, Any]]:
+        items = list(self._buf)
+        return items[-n:] if n else items
+
+
+class PrometheusSink:
+    """Aggregates traces into Prometheus text-format metrics (render())."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, prefix: str = "rag", buckets: Iterable[float] = BUCKETS):
+        self.prefix  = prefix
+        self.buckets = tuple(buckets)
+        self._lock   = threading.Lock()
+        self._turns: Dict[str, list] = {}             # branch → [bucket counts…, sum, n]
+        self._errors: Dict[str, int] = {}
+        self._stages: Dict[str, list] = {}            # stage → [seconds, calls]
+        self._counters: Dict[tuple, float] = {}       # (stage, counter) → total
+
+    def emit(self, trace: Trace):
+        branch, secs = trace.branch or "none", trace.ms / 1e3
+        t = trace.to_dict()
+        with self._lock:
+            h = self._turns.setdefault(branch, [0] * (len(self.buckets) + 2))
+            for i, le in enumerate(self.buckets):
+                h[i] += secs <= le
+            h[-2] += secs
+            h[-1] += 1
+            if trace.error:
+                self._errors[branch] = self._errors.get(branch, 0) + 1
+            for stage, s in t["stages"].items():
+                st = self._stages.setdefault(stage, [0.0, 0])
+                st[0] += s.get("ms", 0.0) / 1e3
+                st[1] += s.get("calls", 0)
+                for k, v in s.items():
+                    if k not in ("ms", "calls"):
+                        self._counters[(stage, k)] = self._counters.get((stage, k), 0) + v
+
+    def render(self) -> str:
+        p, out = self.prefix, []
+        with self._lock:
+            out += [f"# HELP {p}_turn_seconds Turn wall time by answering branch.",
+                    f"# TYPE {p}_turn_seconds histogram"]
+            for branch, h in sorted(self._turns.items()):
+                for le, n in zip(self.buckets, h):
+                    out.append(f'{p}_turn_seconds_bucket{{branch="{branch}",le="{le:g}"}} {n}')
+                out.append(f'{p}_turn_seconds_bucket{{branch="{branch}",le="+Inf"}} {h[-1]}')
+                out.append(f'{p}_turn_seconds_sum{{branch="{branch}"}} {h[-2]:.6f}')
+                out.append(f'{p}_turn_seconds_count{{branch="{branch}"}} {h[-1]}')
+            out += [f"# HELP {p}_turn_errors_total Turns that raised, by branch.",
+                    f"# TYPE {p}_turn_errors_total counter"]
+            out += [f'{p}_turn_errors_total{{branch="{b}"}} {n}'
+                    for b, n in sorted(self._errors.items())]
+            out += [f"# HELP {p}_stage_seconds_total Wall time spent per stage.",
+                    f"# TYPE {p}_stage_seconds_total counter"]
+            out += [f'{p}_stage_seconds_total{{stage="{s}"}} {v[0]:.6f}'
+                    for s, v in sorted(self._stages.items())]
+            out += [f"# HELP {p}_stage_calls_total Times each stage ran.",
+                    f"# TYPE {p}_stage_calls_total counter"]
+            out += [f'{p}_stage_calls_total{{stage="{s}"}} {v[1]}'
+                    for s, v in sorted(self._stages.items())]
+            out += [f"# HELP {p}_stage_events_total Per-stage counters (tokens, cache hits, retries, ...).",
+                    f"# TYPE {p}_stage_events_total counter"]
+            out += [f'{p}_stage_events_total{{stage="{s}",event="{k}"}} {v:g}'
+                    for (s, k), v in sorted(self._counters.items())]
+        return "\n".join(out) + "\n"
+
+
+# ---- tracers -------------------------------------------------------------
+class Tracer:
+    enabled = True
+
+    def __init__(self, sinks: Iterable = ()):
+        self.sinks = list(sinks)
+        self._ids  = itertools.count(1)
+
+    def sink(self, kind: type):
+        """The first sink of type <kind>, or None."""
+        return next((s for s in self.sinks if isinstance(s, kind)), None)
+
+    @contextmanager
+    def turn(self, query: str):
+        """Trace one turn: code running inside (in this context) records to it."""
+        trace = Trace(next(self._ids), query)
+        prev, prev_stage = _trace.get(), _stage.get()
+        _trace.set(trace)
+        _stage.set(None)
+        t0 = time.perf_counter()
+        try:
+            yield trace
+        except GeneratorExit:                 # a stream closed by its consumer
+            trace.error = "aborted"
+            raise
+        except Exception as e:
+            trace.error = repr(e)
+            raise
+        finally:
+            trace.ms = (time.perf_counter() - t0) * 1e3
+            _trace.set(prev)
+            _stage.set(prev_stage)
+            for s in self.sinks:
+                try:
+                    s.emit(trace)
+                except Exception as e:        # a broken sink must not fail the turn
+                    print(f"⚠️ trace sink {type(s).__name__} failed: {e!r}")
+
+
+class NullTracer:
+    """Tracing off: turn() records nothing."""
+    enabled = False
+    sinks: list = []
+
+    def sink(self, kind: type):
+        return None
+
+    def turn(self, query: str):
+        return _NULL
+
+
+def tracer_from_env(spec: str = TRACING) -> Tracer | NullTracer:
+    """Tracer with the sinks named in <spec> ("jsonl,ring,prometheus")."""
+    make = {"jsonl": JsonlSink, "ring": RingBufferSink, "prometheus": PrometheusSink}
+    names = [n.strip().lower() for n in spec.split(",") if n.strip()]
+    unknown = [n for n in names if n not in make]
+    if unknown:
+        raise ValueError(f"unknown TRACING sink(s) {unknown}; expected {sorted(make)}")
+    return Tracer([make[n]() for n in names]) if names else NullTracer()
+
+
+_default: Tracer | NullTracer | None = None
+_default_lock = threading.Lock()
+
+
+def default_tracer() -> Tracer | NullTracer:
+    """Process-wide tracer for pipelines that are not given one (TRACING)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = tracer_from_env()
+        return _default
+
+
+def set_default_tracer(tracer: Tracer | NullTracer | None) -> None:
+    """Swap the shared tracer; None re-reads TRACING on the next call."""
+    global _default
+    with _default_lock:
+        _default = tracer
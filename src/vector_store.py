@@ -0,0 +1,72 @@
+"""
+Float16 copy of the chunk embeddings, memory-mapped for exact re-ranking.
+
+Written by embed_build next to a compressed index (sq8, pq, ivfpq) as
+
+    <EMB_DIR>/vectors.f16    raw float16, row i = embedding of FAISS id i,
+                             width = index.d
+
+The compressed index answers a coarse search RERANK_FACTOR times deeper
+than asked; rerank() then re-scores that shortlist with exact L2
+distances from these rows. Only the shortlisted rows are paged in, so
+the full-precision vectors cost disk, not RAM, and half the bytes of
+float32. Ids removed by update_index keep their (unused) rows; new ids
+are appended in id order.
+"""
+from __future__ import annotations
+from pathlib import Path
+
+import numpy as np
+
+VECTORS_NAME  = "vectors.f16"
+RERANK_FACTOR = 4                # coarse candidates per requested neighbour
+
+
+def write_vectors(emb_dir: Path, embs: np.ndarray) -> Path:
+    """(Re)write the store with <embs> as ids 0..n-1."""
+    path = Path(emb_dir) / VECTORS_NAME
+    np.ascontiguousarray(embs, dtype=np.float16).tofile(path)
+    return path
+
+
+def append_vectors(emb_dir: Path, embs: np.ndarray, first_id: int) -> None:
+    """Add rows for ids first_id.. (must directly follow the stored ones)."""
+    path = Path(emb_dir) / VECTORS_NAME
+    dim  = embs.shape[1]
+    have = path.stat().st_size // (2 * dim) if path.exists() else 0
+    if have != first_id:
+        raise ValueError(f"{path} holds {have} vectors, cannot append id {first_id}")
+    with open(path, "ab") as fh:
+        fh.write(np.ascontiguousarray(embs, dtype=np.float16).tobytes())
+
+
+def n_vectors(emb_dir: Path, dim: int) -> int:
+    path = Path(emb_dir) / VECTORS_NAME
+    return path.stat().st_size // (2 * dim) if path.exists() else 0
+
+
+def open_vectors(emb_dir: Path, dim: int) -> np.memmap | None:
+    """(n, dim) read-only float16 memmap, or None if there is no store."""
+    path = Path(emb_dir) / VECTORS_NAME
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+    return np.memmap(path, dtype=np.float16, mode="r").reshape(-1, dim)
+
+
+def rerank(vectors: np.ndarray, Q: np.ndarray, I: np.ndarray, k: int):
+    """(D, I) of the <k> candidates in each row of <I> (-1 = none) nearest
+    to the matching query in <Q>, by exact squared L2 as in IndexFlatL2."""
+    D_out = np.full((len(Q), k), np.inf, dtype="float32")
+    I_out = np.full((len(Q), k), -1, dtype="int64")
+    for j, (q, ids) in enumerate(zip(Q, I)):
+        ids = ids[ids >= 0]
+        if not len(ids):
+            continue
+        order = np.argsort(ids)                      # sequential page access
+        vecs  = np.empty((len(ids), vectors.shape[1]), dtype="float32")
+        vecs[order] = vectors[ids[order]]
+        dist  = ((vecs - q) ** 2).sum(axis=1)
+        top   = np.argsort(dist, kind="stable")[:k]
+        D_out[j, :len(top)] = dist[top]
+        I_out[j, :len(top)] = ids[top]
+    return D_out, I_out
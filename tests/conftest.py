@@ -0,0 +1,57 @@
+import contextlib, io
+
+import pytest
+
+from src import token_utils
+from src.bench.synth import HashEncoder, make_corpus
+from src.embed_build import build_index
+from src.llm_clients import MistralClient, enable_cache, set_default_client
+from src.mock_llm import start_mock_server
+from src.retrieval import PassageRetriever
+
+
+@pytest.fixture(scope="session", autouse=True)
+def approx_tokens():
+    """Estimated token counts throughout: the suite never downloads tiktoken."""
+    token_utils.set_approx(True)
+    yield
+    token_utils.set_approx(False)
+
+
+@pytest.fixture(scope="session")
+def retriever(tmp_path_factory):
+    """A small synthetic index (hashing encoder)."""
+    df, enc = make_corpus(0.4), HashEncoder()
+    emb_dir = tmp_path_factory.mktemp("emb")
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        build_index(df, encoder=enc, emb_dir=emb_dir)
+    return PassageRetriever(df=df, emb_dir=emb_dir, encoder=enc, cache_size=0)
+
+
+@pytest.fixture
+def mock_llm():
+    """start(**opts) → a running mock server; all are shut down afterwards."""
+    servers = []
+
+    def start(**opts):
+        srv = start_mock_server(**opts)
+        servers.append(srv)
+        return srv
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+@pytest.fixture
+def client_for():
+    """client_for(srv, **opts) → a quiet MistralClient on <srv>, also made
+    the default client (restored afterwards) with the response cache off."""
+    def make(srv, **opts):
+        opts = {"backoff_base": 0.001, "verbose": False, **opts}
+        client = MistralClient(endpoint=srv.url, headers={}, **opts)
+        set_default_client(client)
+        return client
+    enable_cache(None)
+    yield make
+    set_default_client(None)
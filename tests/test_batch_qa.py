@@ -0,0 +1,44 @@
+import json
+
+from src.batch_qa import BatchRunner, compact_checkpoint
+from src.query_router import QueryRouter
+
+QUESTIONS = ["SDG 6 patents on membranes", "SDG 7 patents on solar cells",
+             "SDG 3 patents on vaccines"]
+
+
+def record(qid, **extra):
+    return json.dumps({"id": qid, "question": "?", **extra}) + "\n"
+
+
+def test_compact_checkpoint(tmp_path):
+    out = tmp_path / "answers.jsonl"
+    out.write_text(record("1", answer="old") + record("2", error="Timeout()")
+                   + record("1", answer="new") + record("3", answer="ok")
+                   + '{"id": "4", "answ', encoding="utf-8")
+
+    assert compact_checkpoint(out) == {"1", "3"}
+    lines = out.read_text(encoding="utf-8").splitlines(keepends=True)
+    assert [json.loads(l)["answer"] for l in lines] == ["new", "ok"]
+    assert all(l.endswith("\n") for l in lines)
+    assert compact_checkpoint(tmp_path / "missing.jsonl") == set()
+
+
+def test_resume_answers_only_what_is_missing(retriever, mock_llm, client_for, tmp_path):
+    srv = mock_llm()
+    client_for(srv)
+    questions, out = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    questions.write_text("".join(json.dumps({"id": str(i), "question": q}) + "\n"
+                                 for i, q in enumerate(QUESTIONS, 1)), encoding="utf-8")
+    out.write_text(record("1", answer="kept") + record("2", error="HTTPError()")
+                   + '{"id": "3"', encoding="utf-8")
+
+    runner = BatchRunner(retriever, concurrency=2, router=QueryRouter(use_rules=True))
+    stats  = runner.run(questions, out, resume=True)
+    assert stats == {"answered": 2, "errors": 0}
+    recs = {r["id"]: r for r in map(json.loads, out.read_text(encoding="utf-8").splitlines())}
+    assert sorted(recs) == ["1", "2", "3"] and recs["1"]["answer"] == "kept"
+    assert all("error" not in r for r in recs.values())
+    assert srv.counts["requests"] == 2
+
+    assert runner.run(questions, out, resume=True) == {"answered": 0, "errors": 0}
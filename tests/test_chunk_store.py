@@ -0,0 +1,39 @@
+import pickle
+
+import numpy as np
+
+from src.chunk_store import ChunkStore, open_store
+
+META = [
+    {"row_idx": 0, "chunk_id": 0, "publication_number": "123", "chunk_text": "solar cell"},
+    None,                                                   # deleted id
+    {"row_idx": 1, "chunk_id": 1, "publication_number": "4567", "chunk_text": "célula ☀",
+     "n_tokens": 3},
+    {"row_idx": 2, "chunk_id": 0, "publication_number": "89", "chunk_text": ""},
+]
+
+
+def test_write_and_open_roundtrip(tmp_path):
+    ChunkStore.write(tmp_path, META)
+    store = ChunkStore.open(tmp_path)
+    assert len(store) == 4 and list(store) == META
+    assert store[-2] == META[2] and store.text(2) == "célula ☀"
+    assert list(ChunkStore.from_records(META)) == META
+
+
+def test_append_keeps_old_text_and_updates_rows(tmp_path):
+    ChunkStore.write(tmp_path, META)
+    new = [{"row_idx": 0, "chunk_id": 1, "publication_number": "123", "chunk_text": "wind"}]
+    ChunkStore.append(tmp_path, np.array([1, -1, -1, 0, 0]), new)
+    store = ChunkStore.open(tmp_path)
+    assert list(store) == [{**META[0], "row_idx": 1}, None, None, {**META[3], "row_idx": 0},
+                           new[0]]
+
+
+def test_open_store_migrates_meta_pkl(tmp_path, capsys):
+    with open(tmp_path / "meta.pkl", "wb") as f:
+        pickle.dump(META, f)
+    assert list(open_store(tmp_path)) == META
+    assert "Migrated 4 chunks" in capsys.readouterr().out
+    (tmp_path / "meta.pkl").unlink()                  # the store is used from now on
+    assert list(open_store(tmp_path)) == META
@@ -0,0 +1,60 @@
+import contextlib, io
+
+import faiss
+import pandas as pd
+import pytest
+
+from src.bench.synth import HashEncoder, make_corpus
+from src.chunk_store import open_store
+from src.embed_build import build_index, iter_corpus_chunks, update_index
+
+
+def quiet(fn, *args, **kw):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        return fn(*args, **kw)
+
+
+@pytest.fixture
+def built(tmp_path):
+    df = make_corpus(0.1)
+    quiet(build_index, df, encoder=HashEncoder(), emb_dir=tmp_path)
+    return df, tmp_path
+
+
+def edited(df):
+    """Patent 0 deleted, patent 1's claims changed, one new patent."""
+    new = df.iloc[[2]].assign(publication_number=9_999_999, title_en="a brand new title")
+    out = df.drop(index=0).copy()
+    out.loc[1, "claims"] = "a rewritten claim"
+    return pd.concat([out, new], ignore_index=True)
+
+
+def live_chunks(emb_dir):
+    store = open_store(emb_dir)
+    return {i: m for i, m in enumerate(store) if m is not None}
+
+
+def test_update_index_add_change_delete(built):
+    df, emb_dir = built
+    df2   = edited(df)
+    stats = quiet(update_index, df2, encoder=HashEncoder(), emb_dir=emb_dir)
+    assert stats["encoded"] >= 2 and stats["removed"] >= 2
+
+    live = live_chunks(emb_dir)
+    expected = {(str(pid), cid): (row, chunk) for row, cid, pid, chunk in iter_corpus_chunks(df2)}
+    assert {(m["publication_number"], m["chunk_id"]): (m["row_idx"], m["chunk_text"])
+            for m in live.values()} == expected
+
+    index = faiss.read_index(str(emb_dir / "faiss_chunks.idx"))
+    assert set(faiss.vector_to_array(index.id_map).tolist()) == set(live)
+
+    again = quiet(update_index, df2, encoder=HashEncoder(), emb_dir=emb_dir)
+    assert (again["encoded"], again["removed"]) == (0, 0)
+
+
+def test_update_index_keeps_the_index_type(built):
+    df, emb_dir = built
+    with pytest.raises(ValueError, match="full build"):
+        quiet(update_index, df, encoder=HashEncoder(), emb_dir=emb_dir, index_type="sq8")
+    assert quiet(update_index, df, encoder=HashEncoder(), emb_dir=emb_dir,
+                 index_type="flat")["encoded"] == 0
@@ -0,0 +1,19 @@
+from datetime import datetime
+
+import pytest
+
+from src.filter_ops import _to_date
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("20211231", datetime(2021, 12, 31)),
+    (20211231.0, datetime(2021, 12, 31)),
+    ("202112", datetime(2021, 12, 1)),
+    ("2021-12", datetime(2021, 12, 1)),
+    ("2021/12/31", datetime(2021, 12, 31)),
+    (2021, datetime(2021, 1, 1)),
+    ("20211", None),
+    ("n/a", None),
+])
+def test_to_date(value, expected):
+    assert _to_date(value) == expected
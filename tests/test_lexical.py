@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.bench.synth import make_corpus
+from src.lexical import LexicalIndex, Vocab, load_lexical
+
+VALUES = ["hydro", "cell", "a", "zzz", "solar cell", "-", "ion"]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return make_corpus(0.4)
+
+
+def test_vocab_find_and_roundtrip():
+    vocab = Vocab.from_terms(["battery", "cell", "célula", "solar"])
+    assert len(vocab) == 4
+    assert vocab.tolist() == ["battery", "cell", "célula", "solar"]
+    assert vocab.find("l").tolist() == [1, 2, 3]
+    assert vocab.find("é").tolist() == [2]
+    assert vocab.find("yc").tolist() == []            # never across two terms
+    assert len(Vocab.from_terms([])) == 0
+
+
+@pytest.mark.parametrize("col", ["title_en", "claims", "ipc_technologies"])
+def test_contains_mask_matches_scan(corpus, tmp_path, col):
+    built = LexicalIndex.build(corpus)
+    built.save(tmp_path)
+    loaded = load_lexical(tmp_path, corpus)
+    for value in VALUES:
+        expected = corpus[col].map(lambda c: value in str(c).lower()).to_numpy()
+        assert np.array_equal(built.contains_mask(col, value), expected)
+        assert np.array_equal(loaded.contains_mask(col, value), expected)
+
+
+def test_vocabulary_saved_without_padding(corpus, tmp_path):
+    lex = LexicalIndex.build(corpus)
+    lex.save(tmp_path)
+    terms = lex.fields["*"][0].tolist()
+    with np.load(tmp_path / "lexical.npz") as z:
+        blob = z["*|vocab_blob"]
+        assert blob.dtype == np.uint8
+        assert blob.size == sum(len(t.encode("utf-8")) + 1 for t in terms)
+
+
+def test_stale_index_is_rebuilt(corpus, tmp_path):
+    LexicalIndex.build(corpus).save(tmp_path)
+    saved = load_lexical(tmp_path, corpus, same_build=True)
+    assert saved.row_key and saved.fingerprint == LexicalIndex.build(corpus).fingerprint
+
+    edited = corpus.copy()
+    edited.loc[0, "title_en"] = "zzzunique"
+    assert load_lexical(tmp_path, edited).contains_mask("title_en", "zzzunique")[0]
+    assert load_lexical(tmp_path, corpus.iloc[1:], same_build=True).n_rows == len(corpus) - 1
+
+
+def test_rebuilt_index_is_saved_best_effort(corpus, tmp_path, monkeypatch, capsys):
+    LexicalIndex.build(corpus.iloc[1:]).save(tmp_path)
+    rebuilt = load_lexical(tmp_path, corpus, save=True, same_build=True)
+    assert LexicalIndex.load(tmp_path, corpus).row_key == rebuilt.row_key
+
+    def read_only(self, emb_dir):
+        raise PermissionError("read-only")
+    monkeypatch.setattr(LexicalIndex, "save", read_only)
+    lex = load_lexical(tmp_path, corpus.iloc[2:], save=True, same_build=True)
+    assert lex.n_rows == len(corpus) - 2 and "Could not save" in capsys.readouterr().out
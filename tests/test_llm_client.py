@@ -0,0 +1,79 @@
+import threading, time
+
+import pytest
+import requests
+
+MESSAGES = [{"role": "user", "content": "hello there"}]
+
+
+def test_chat_retries_429_then_succeeds(mock_llm, client_for):
+    srv    = mock_llm(fail_first=2, retry_after=0.01)
+    client = client_for(srv)
+
+    assert client.chat(MESSAGES) == "[mock] hello there"
+    assert srv.counts == {"requests": 3, "ok": 1, "429": 2, "5xx": 0}
+    m = client.metrics.summary()
+    assert (m["calls"], m["errors"], m["retries"], m["rate_limited"]) == (1, 0, 2, 2)
+    assert m["prompt_tokens"] == 2 and m["completion_tokens"] == 3
+
+
+def test_retry_after_is_a_lower_bound(mock_llm, client_for):
+    srv    = mock_llm(fail_first=1, retry_after=0.3)
+    client = client_for(srv, backoff_base=0.0001)
+
+    t0 = time.perf_counter()
+    client.chat(MESSAGES)
+    assert time.perf_counter() - t0 >= 0.3
+
+
+def test_max_retries(mock_llm, client_for):
+    srv    = mock_llm(rate_429=1.0, retry_after=0.01)
+    client = client_for(srv, max_retries=3)
+
+    with pytest.raises(requests.HTTPError):
+        client.chat(MESSAGES)
+    assert srv.counts["requests"] == 4                 # first attempt + 3 retries
+    m = client.metrics.summary()
+    assert (m["calls"], m["errors"], m["retries"], m["rate_limited"]) == (1, 1, 3, 4)
+
+
+def test_retry_budget_exhausted(mock_llm, client_for):
+    # each backoff sleeps Retry-After = 0.2 s; a third would exceed the 0.5 s budget
+    srv    = mock_llm(rate_429=1.0, retry_after=0.2)
+    client = client_for(srv, max_retries=10, retry_budget=0.5)
+
+    with pytest.raises(requests.HTTPError):
+        client.chat(MESSAGES)
+    assert srv.counts["requests"] == 3
+    assert client.metrics.summary()["errors"] == 1
+
+
+def test_backoff_does_not_hold_a_slot(mock_llm, client_for):
+    # one slot: the second call must finish while the first waits out its 429
+    srv    = mock_llm(fail_first=1, retry_after=0.5)
+    client = client_for(srv, max_concurrency=1)
+    done   = {}
+
+    def call(name):
+        client.chat(MESSAGES)
+        done[name] = time.perf_counter()
+
+    first = threading.Thread(target=call, args=("first",))
+    first.start()
+    time.sleep(0.1)
+    call("second")
+    first.join()
+    assert done["second"] < done["first"]
+    assert srv.max_in_flight == 1
+
+
+def test_non_retryable_status_raises_at_once(mock_llm, client_for):
+    srv    = mock_llm()
+    client = client_for(srv)
+    client.endpoint = srv.url.replace("/chat/completions", "/nope")
+
+    with pytest.raises(requests.HTTPError):
+        client.chat(MESSAGES)
+    assert client.metrics.summary()["retries"] == 0
+    client.endpoint = srv.url
+    assert client.chat(MESSAGES) == "[mock] hello there"     # the slot was released
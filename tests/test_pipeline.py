@@ -0,0 +1,21 @@
+from src.pipeline import RAGPipeline
+
+SDG3 = {"column": "sdg_number", "op": "eq", "value": 3}
+DE   = {"column": "applicant_countries", "op": "contains", "value": "DE"}
+
+
+def test_early_branches_reset_multi_turn_filters(retriever):
+    pipeline = RAGPipeline(retriever)
+    pid = retriever.df["publication_number"].iloc[0]
+    pipeline._last_filters, pipeline._last_aggregation = [SDG3, DE], {"group_by": "x"}
+
+    pipeline.ask(f"prior art {pid} in this category")
+    assert pipeline.last_branch == "citations"
+    assert pipeline._last_filters == [SDG3, DE]
+
+    pipeline.ask(f"prior art {pid}")
+    assert pipeline.last_branch == "citations"
+    assert (pipeline._last_filters, pipeline._last_aggregation) == ([], None)
+
+    pipeline.ask(f"SDG 3 prior art {pid}")
+    assert pipeline._last_filters == [SDG3]
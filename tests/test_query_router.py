@@ -0,0 +1,34 @@
+import pytest
+
+from src.query_router import parse_rules
+
+
+@pytest.mark.parametrize("question, code", [
+    ("U.S. patents on batteries", "US"),
+    ("patents from the u.s. on solar cells", "US"),
+    ("Show patents from Germany about hydrogen", "DE"),
+])
+def test_country_filter(question, code):
+    spec = parse_rules(question)
+    assert spec is not None
+    assert {"column": "applicant_countries", "op": "contains", "value": code} in spec["filters"]
+
+
+def test_country_must_be_a_whole_word():
+    assert not any(f["column"] == "applicant_countries"
+                   for f in (parse_rules("usability of batteries") or {}).get("filters", []))
+
+
+def test_country_adjective_goes_to_the_llm():
+    assert parse_rules("SDG 3 patents on Swiss cheese") is None
+
+
+@pytest.mark.parametrize("question, kind", [
+    ("patents on vitamin B1 synthesis in SDG 3", None),
+    ("SDG 3 patents of kind B1", "B1"),
+    ("SDG 3 patents with kind code A2", "A2"),
+])
+def test_kind_needs_its_prefix(question, kind):
+    spec = parse_rules(question) or {"filters": []}
+    kinds = [f["value"] for f in spec["filters"] if f["column"] == "publication_kind"]
+    assert kinds == ([kind] if kind else [])
@@ -0,0 +1,51 @@
+import pytest
+
+from src.retrieval import DEPTH_GROWTH, DEPTH_START
+
+QUERY = "membrane water purification"
+
+
+def sdg(value):
+    return [{"column": "sdg_number", "op": "eq", "value": value}]
+
+
+@pytest.fixture
+def searches(retriever, monkeypatch):
+    """(k, restricted) of every FAISS search the retriever runs."""
+    calls, search = [], retriever._faiss_search
+
+    def spy(query, k, row_filt):
+        calls.append((k, bool(row_filt)))
+        return search(query, k, row_filt)
+    monkeypatch.setattr(retriever, "_faiss_search", spy)
+    return calls
+
+
+def sdg_of(retriever, hits):
+    df = retriever.df
+    return set(df.loc[df["publication_number"].astype(str).isin(
+        {h["publication_number"] for h in hits}), "sdg_number"])
+
+
+def test_shallow_search_is_enough(retriever, searches):
+    tiers = retriever.search_tiers(QUERY, top_k_return=5)
+    assert searches == [(DEPTH_START, False)]
+    assert list(tiers) == ["filtered"] and len(tiers["filtered"]) == 5
+
+
+def test_pool_deepens_until_it_holds_enough_patents(retriever, searches):
+    tiers = retriever.search_tiers(QUERY, top_k_return=100, max_passages=4000)
+    assert searches == [(DEPTH_START, False), (DEPTH_START * DEPTH_GROWTH, False)]
+    assert len({h["publication_number"] for h in tiers["filtered"]}) == 100
+
+
+def test_common_filter_is_served_from_the_pool(retriever, searches):
+    tiers = retriever.search_tiers(QUERY, filters=sdg("3"), top_k_return=5)
+    assert searches == [(DEPTH_START, False)]
+    assert len(tiers["filtered"]) == 5 and sdg_of(retriever, tiers["filtered"]) == {"3"}
+
+
+def test_rare_filter_searches_matching_chunks_only(retriever, searches):
+    tiers = retriever.search_tiers(QUERY, filters=sdg("9"), top_k_return=60)
+    assert searches == [(DEPTH_START, False), (DEPTH_START, True)]
+    assert len(tiers["filtered"]) == 1 and sdg_of(retriever, tiers["filtered"]) == {"9"}
@@ -0,0 +1,45 @@
+import pytest
+
+from src.pipeline import RAGPipeline
+from src.query_router import QueryRouter
+
+MESSAGES = [{"role": "user", "content": "one two three four"}]
+QUESTION = "Which membrane technologies purify drinking water?"    # passage-RAG branch
+
+
+@pytest.mark.parametrize("fail_first", [0, 2])
+def test_chat_stream_yields_words_in_order(mock_llm, client_for, fail_first):
+    srv    = mock_llm(fail_first=fail_first, retry_after=0.01, token_latency=0.01)
+    client = client_for(srv)
+
+    pieces = list(client.chat_stream(MESSAGES))
+    assert pieces == ["[mock]", " one", " two", " three", " four"]
+    m = client.metrics.summary()
+    assert (m["calls"], m["errors"], m["retries"], m["rate_limited"]) == (1, 0, fail_first,
+                                                                          fail_first)
+    assert m["completion_tokens"] == 5
+    ttft = client.metrics.last["ttft"]
+    assert ttft is not None and 0 < ttft <= client.metrics.last["latency"]
+
+
+@pytest.mark.parametrize("fail_first", [0, 2])
+def test_ask_stream_passage_answer(retriever, mock_llm, client_for, fail_first):
+    srv      = mock_llm(fail_first=fail_first, retry_after=0.01)
+    client   = client_for(srv)
+    pipeline = RAGPipeline(retriever, router=QueryRouter(use_rules=True))
+
+    pieces = list(pipeline.ask_stream(QUESTION))
+    assert pipeline.last_branch == "passages"
+    assert len(pieces) > 1 and pieces[0] == "[mock]"
+    assert list(pipeline.chat_history)[-2:] == [
+        {"role": "user",      "content": QUESTION},
+        {"role": "assistant", "content": "".join(pieces)},
+    ]
+    assert client.metrics.last["ttft"] is not None
+    assert srv.counts["429"] == fail_first
+
+
+def test_ask_stream_matches_ask(retriever, mock_llm, client_for):
+    client_for(mock_llm())
+    streamed = "".join(RAGPipeline(retriever).ask_stream(QUESTION))
+    assert streamed == RAGPipeline(retriever).ask(QUESTION)
@@ -0,0 +1,51 @@
+from src import tracing
+from src.pipeline import RAGPipeline
+from src.tracing import RingBufferSink, Tracer
+
+QUESTION = "Which membrane technologies purify drinking water?"    # passage-RAG branch
+
+
+def traced_pipeline(retriever):
+    ring = RingBufferSink()
+    return RAGPipeline(retriever, tracer=Tracer([ring])), ring
+
+
+def test_stream_turn_stays_out_of_consumer_context(retriever, mock_llm, client_for):
+    client_for(mock_llm())
+    pipeline, ring = traced_pipeline(retriever)
+
+    stream = pipeline.ask_stream(QUESTION)
+    next(stream)
+    assert tracing._trace.get() is None and tracing._stage.get() is None
+    with tracing.span("consumer"):               # no turn here: a no-op
+        pass
+    rest = list(stream)
+    assert rest and tracing._trace.get() is None
+
+    (trace,) = ring.recent()
+    assert trace["branch"] == "passages" and trace["error"] is None
+    assert "consumer" not in trace["stages"]
+    assert trace["stages"]["llm"]["llm_calls"] == 1
+
+
+def test_closed_stream_is_recorded_as_aborted(retriever, mock_llm, client_for):
+    client_for(mock_llm(token_latency=0.01))
+    pipeline, ring = traced_pipeline(retriever)
+
+    stream = pipeline.ask_stream(QUESTION)
+    next(stream)
+    stream.close()
+    (trace,) = ring.recent()
+    assert trace["branch"] == "passages" and trace["error"] == "aborted"
+    assert tracing._trace.get() is None
+
+
+def test_ask_records_one_trace(retriever, mock_llm, client_for):
+    client_for(mock_llm())
+    pipeline, ring = traced_pipeline(retriever)
+
+    pipeline.ask(QUESTION)
+    pipeline.ask(QUESTION)
+    traces = ring.recent()
+    assert [t["turn_id"] for t in traces] == [1, 2]
+    assert all(t["error"] is None and "search" in t["stages"] for t in traces)
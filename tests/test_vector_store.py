@@ -0,0 +1,88 @@
+import contextlib, io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.bench.synth import HashEncoder, make_corpus
+from src.chunk_store import open_store
+from src.embed_build import build_index, update_index
+from src.retrieval import PassageRetriever
+from src.vector_store import append_vectors, open_vectors, rerank, write_vectors
+
+QUERIES = ["membrane water purification", "solar cell efficiency", "battery anode"]
+
+
+def quiet(fn, *args, **kw):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        return fn(*args, **kw)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return make_corpus(0.4)
+
+
+def built(corpus, tmp_path_factory, index_type):
+    emb_dir = tmp_path_factory.mktemp(index_type)
+    quiet(build_index, corpus, encoder=HashEncoder(), emb_dir=emb_dir, index_type=index_type)
+    return emb_dir
+
+
+def retriever(corpus, emb_dir, **opts):
+    return PassageRetriever(df=corpus, emb_dir=emb_dir, encoder=HashEncoder(),
+                            cache_size=0, **opts)
+
+
+def test_rerank_orders_candidates_by_exact_distance():
+    rng  = np.random.default_rng(0)
+    vecs = rng.normal(size=(50, 8)).astype(np.float16)
+    Q    = rng.normal(size=(2, 8)).astype("float32")
+    I    = np.array([[3, 7, 11, 40, -1], [-1, -1, -1, -1, -1]])
+
+    D, top = rerank(vecs, Q, I, 3)
+    dist = ((vecs[[3, 7, 11, 40]].astype("float32") - Q[0]) ** 2).sum(axis=1)
+    assert top[0].tolist() == np.array([3, 7, 11, 40])[np.argsort(dist)[:3]].tolist()
+    assert np.allclose(D[0], np.sort(dist)[:3])
+    assert top[1].tolist() == [-1, -1, -1] and np.isinf(D[1]).all()
+
+
+def test_append_must_follow_the_stored_ids(tmp_path):
+    write_vectors(tmp_path, np.ones((3, 4)))
+    append_vectors(tmp_path, np.zeros((2, 4)), 3)
+    assert open_vectors(tmp_path, 4).tolist() == [[1] * 4] * 3 + [[0] * 4] * 2
+    with pytest.raises(ValueError):
+        append_vectors(tmp_path, np.zeros((1, 4)), 7)
+
+
+def test_compressed_index_reranks_to_exact_neighbours(corpus, tmp_path_factory):
+    flat   = retriever(corpus, built(corpus, tmp_path_factory, "flat"))
+    sq8    = retriever(corpus, built(corpus, tmp_path_factory, "sq8"))
+    pq_dir = built(corpus, tmp_path_factory, "pq")
+    pq, pq_raw = retriever(corpus, pq_dir), retriever(corpus, pq_dir, rerank=0)
+    assert flat.vectors is None and pq_raw.vectors is None
+    assert len(sq8.vectors) == len(sq8.chunk_rows)
+
+    recall = {"pq": 0, "pq_raw": 0}
+    for q in QUERIES:
+        D, I = flat._faiss_search(q, 10, [])
+        sD, sI = sq8._faiss_search(q, 10, [])
+        assert set(sI[0]) == set(I[0]) and np.allclose(sD, D, atol=1e-2)
+        for name, r in (("pq", pq), ("pq_raw", pq_raw)):
+            recall[name] += len(set(r._faiss_search(q, 10, [])[1][0]) & set(I[0]))
+    assert recall["pq"] > recall["pq_raw"]
+
+
+def test_update_index_appends_vectors(corpus, tmp_path):
+    quiet(build_index, corpus, encoder=HashEncoder(), emb_dir=tmp_path, index_type="sq8")
+    new = corpus.iloc[[0]].assign(publication_number=9_999_999, title_en="a brand new title")
+    df2 = pd.concat([corpus.iloc[1:], new], ignore_index=True)
+    quiet(update_index, df2, encoder=HashEncoder(), emb_dir=tmp_path)
+
+    store = open_store(tmp_path)
+    vecs  = open_vectors(tmp_path, HashEncoder().encode(["x"]).shape[1])
+    assert len(vecs) == len(store)
+    added = [i for i, m in enumerate(store) if m and m["publication_number"] == "9999999"]
+    exact = HashEncoder().encode([store.text(i) for i in added])
+    assert added and np.allclose(vecs[added], exact, atol=1e-2)
+    assert retriever(df2, tmp_path).vectors is not None